@@ -3,53 +3,55 @@ from dash import dcc, html
 from dash.dependencies import Output, Input
 import plotly.graph_objects as go
 import random
+import time
 from collections import deque
+import numpy as np
 import pandas as pd
 
+import src_path  # noqa: F401  (crack meter modules in src/)
+
+from crack_anomaly import CrackAnomalyDetector
+from crack_calibration import ESTIMATED_CRACK_SIZE, predict_crack_size
+from crack_meter import read_crack_meter_csv, scale_crack_meter_frame
+from tile_pyramid import TilePyramid
+
 # Initialize Dash app
 app = dash.Dash(__name__)
 
-def Scale_current(current) -> float:
-    """Scale current to mA using linear polynomial approximation"""
-    if current is None:
-        return None
-    elif current < 150:
-        return 0
-    elif current > 2000:
-        return (147.48 + 0.0118 * current)
-    else:
-        return (101.97 + 0.0283 * current) # values between 150 and 2000
+#define the path to the dataset
+PATH = "datasets/crack_meter/CalibData-30kHz-0-12--.csv"
 
-def Scale_voltage(voltage) -> float:
-    """Scale voltage to mV"""
-    if voltage is None:
-        return None
-    else:
-        return (((2.048/(65535/2))*1000)* voltage) # AD1114 was used with 2.048V range
+_dataset = None
 
 
-#define the path to the dataset
-PATH = "datasets/crack_meter/CalibData-30kHz-0-12--.csv"
+def load_dataset() -> pd.DataFrame:
+    """Crack meter dataset, loaded and calibrated on first use (not at import)"""
+    global _dataset
+    if _dataset is None:
+        # Load the Concrete dataset (compact dtypes); ; is used as column delimiter
+        data = read_crack_meter_csv(PATH, sep=';')
+        # Scale currents and voltage into float32, rename columns for easier access
+        _dataset = scale_crack_meter_frame(data, np.float32)
+        # Crack size estimated by the calibration model (cached, see src/crack_calibration.py)
+        _dataset[ESTIMATED_CRACK_SIZE] = predict_crack_size(
+            _dataset["RSM voltage drop [mV]"], _dataset["Real current [mA]"]
+        ).astype(np.float32)
+    return _dataset
+
+
+# Points drawn in the history graph, at any zoom
+HISTORY_POINTS = 1000
+
+_pyramid = None
+
+
+def load_pyramid() -> TilePyramid:
+    """Min/max/mean tiles of the dataset (built once, cached next to the CSV)"""
+    global _pyramid
+    if _pyramid is None:
+        _pyramid = TilePyramid.from_csv(PATH)
+    return _pyramid
 
-# Load the Concrete dataset
-dataset = pd.read_csv(PATH, delimiter=';') # ; is used as column delimiter
-
-# Apply Scale_current function to current columns
-dataset["CurrentSet"] = dataset["CurrentSet"].apply(Scale_current)
-dataset["Current"] = dataset["Current"].apply(Scale_current)
-dataset["Voltage Drop"] = dataset["Voltage Drop"].apply(Scale_voltage)
-
-# Rename columns for easier access
-dataset.rename(
-    columns={
-        "Frequency": "Frequency [kHz]",
-        "CurrentSet": "Set current [mA]",
-        "Current": "Real current [mA]",
-        "Voltage Drop": "RSM voltage drop [mV]",
-        "Crack size": "Crack size [mm]",
-    },
-    inplace=True,
-)
 
 # Set variables for plotting
 x_axis = "RSM voltage drop [mV]"
@@ -61,6 +63,20 @@ max_length = 200
 x_data = deque(maxlen=max_length)
 y_data = deque(maxlen=max_length)
 z_data = deque(maxlen=max_length)
+estimate_data = deque(maxlen=max_length)
+
+# The feed shows FEED_POINTS new samples every FEED_INTERVAL_MS
+FEED_POINTS = 20
+FEED_INTERVAL_MS = 200
+FEED_RATE = FEED_POINTS * 1000 / FEED_INTERVAL_MS  # samples per second
+
+# Online anomaly detection on the fed crack size (EWMA, rolling z-score, rate).
+# The detector defaults are sized for 30 kHz sensors; at the feed's 100 Hz the
+# window covers the plotted 2 s and z-scores start after two ticks
+detector = CrackAnomalyDetector(
+    "dash-feed", window=max_length, alpha=1 / FEED_POINTS, min_samples=2 * FEED_POINTS
+)
+alert_count = 0
 
 # Initialize empty figure with one scatter trace
 fig = go.Figure()
@@ -74,8 +90,10 @@ app.layout = html.Div(
         html.H1("Crack Meter Live Data Visualization"),
         dcc.Graph(id="live-graph", figure=fig),
         dcc.Interval(
-            id="interval-component", interval=200, n_intervals=0  # 200ms = 0.2 second
+            id="interval-component", interval=FEED_INTERVAL_MS, n_intervals=0
         ),
+        # Whole capture; zooming re-reads the pyramid level that fits the visible range
+        dcc.Graph(id="history-graph"),
     ]
 )
 
@@ -84,19 +102,39 @@ app.layout = html.Div(
     Output("live-graph", "figure"), Input("interval-component", "n_intervals")
 )
 def update_graph(n):
-    # Add 20 new data points at once from dataset
-    start_index = (n * 20) % len(dataset)
+    global alert_count
+    dataset = load_dataset()
+    # Add FEED_POINTS new data points at once from dataset
+    start_index = (n * FEED_POINTS) % len(dataset)
     
-    # Clear existing data and add 20 new points
+    # Clear existing data and add FEED_POINTS new points
     x_data.clear()
     y_data.clear()
     z_data.clear()
+    estimate_data.clear()
     
-    for i in range(20):
+    new_y = []
+    for i in range(FEED_POINTS):
         data_index = (start_index + i) % len(dataset)
         x_data.append(dataset.iloc[data_index][x_axis])
         y_data.append(dataset.iloc[data_index][y_axis])
         z_data.append(dataset.iloc[data_index][z_axis])
+        estimate_data.append(dataset.iloc[data_index][ESTIMATED_CRACK_SIZE])
+        new_y.append(y_data[-1])
+
+    # Only the new points are fed to the detector, with wall clock times
+    # FEED_RATE apart that end now (and never go back behind the last tick)
+    new_y = np.array(new_y, dtype=np.float64)
+    start = time.time() - (len(new_y) - 1) / FEED_RATE
+    if detector.last_time is not None:
+        start = max(start, detector.last_time + 1 / FEED_RATE)
+    detection = detector.update(new_y, times=start + np.arange(len(new_y)) / FEED_RATE)
+    alert_count += len(detection["alerts"])
+    # The detector skips NaN samples; its flags belong to the last points of the deque
+    new_flagged = np.zeros(len(new_y), dtype=bool)
+    new_flagged[~np.isnan(new_y)] = detection["flagged"]
+    flagged = np.zeros(len(y_data), dtype=bool)
+    flagged[len(y_data) - len(new_y):] = new_flagged
     
     # Create new figure with updated data and color mapping
     fig = go.Figure()
@@ -112,7 +150,59 @@ def update_graph(n):
             size=8
         )
     )
-    fig.update_layout(xaxis_title="Voltage Drop [mV]", yaxis_title="Crack Size [mm]")
+    fig.add_scatter(
+        x=list(x_data),
+        y=list(estimate_data),
+        mode="markers",
+        name="Model estimate",
+        marker=dict(symbol="x", color="red", size=6)
+    )
+    fig.add_scatter(
+        x=np.array(x_data)[flagged],
+        y=np.array(y_data)[flagged],
+        mode="markers",
+        name="Anomaly",
+        marker=dict(symbol="circle-open", color="orange", size=14, line=dict(width=2))
+    )
+    fig.update_layout(
+        xaxis_title="Voltage Drop [mV]",
+        yaxis_title="Crack Size [mm]",
+        title=f"Anomaly alerts: {alert_count}",
+    )
+    return fig
+
+
+# Callback to redraw the history graph when it is zoomed or panned
+@app.callback(
+    Output("history-graph", "figure"), Input("history-graph", "relayoutData")
+)
+def update_history(relayout):
+    dataset = load_dataset()
+    start, stop = 0, len(dataset)
+    if relayout and "xaxis.range[0]" in relayout:
+        start = max(0, int(relayout["xaxis.range[0]"]))
+        stop = min(len(dataset), int(np.ceil(relayout["xaxis.range[1]"])) + 1)
+
+    level, tiles = load_pyramid().query(y_axis, start, stop, HISTORY_POINTS)
+    fig = go.Figure()
+    if tiles is None:
+        # Short range: the raw samples
+        fig.add_scatter(x=np.arange(start, stop), y=dataset[y_axis].iloc[start:stop],
+                        mode="lines", name=y_axis)
+    else:
+        x = tiles["sample"] + (load_pyramid().tile_size(level) - 1) / 2
+        fig.add_scatter(x=x, y=tiles["max"], mode="lines", line=dict(width=0), showlegend=False)
+        fig.add_scatter(x=x, y=tiles["min"], mode="lines", line=dict(width=0), fill="tonexty",
+                        fillcolor="rgba(31, 119, 180, 0.3)", name="min/max")
+        fig.add_scatter(x=x, y=tiles["mean"], mode="lines", name="mean")
+    fig.update_layout(
+        xaxis_title="Sample #",
+        yaxis_title="Crack Size [mm]",
+        title=f"Crack size history (level {level})" if level >= 0 else "Crack size history (raw)",
+        uirevision="history",  # keep the zoom when the figure is replaced
+    )
+    if start > 0 or stop < len(dataset):
+        fig.update_xaxes(range=[relayout["xaxis.range[0]"], relayout["xaxis.range[1]"]])
     return fig
 
 
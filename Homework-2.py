@@ -3,21 +3,15 @@
 # https://open-meteo.com/en/docs?hourly=rain&forecast_days=16
 
 from http.client import responses
-import requests
-import json
 from pprint import pprint
+import os
 from os import getenv
-import openmeteo_requests
 import pandas as pd
-import requests_cache
-from retry_requests import retry
-import seaborn as sns
-import matplotlib.pyplot as plt
-
-# Setup the Open-Meteo API client with cache and retry on error
-cache_session = requests_cache.CachedSession('.cache', expire_after = 3600)
-retry_session = retry(cache_session, retries = 5, backoff_factor = 0.2)
-openmeteo = openmeteo_requests.Client(session = retry_session)
+import asyncio
+import weather_api
+from async_weather import fetch_location_and_weather, get_ip, get_location
+from location_cache import get_cached_location
+from forecast_store import ForecastStore
 
 # Load environment variables from .env file
 try:
@@ -29,77 +23,25 @@ except ImportError:
 # Get API key from environment variable for security
 API_KEY = getenv("API_KEY")
 
-def get_ip():
-    """Get public IP address using ipify.org API."""
-    url = "https://api.ipify.org/"
-    try:
-        response = requests.get(url, timeout=5)
-        if response.status_code == 200:
-            return response.text
-        else:
-            print(f"Error: HTTP {response.status_code}")
-            return None
-    except requests.exceptions.RequestException as e:
-        print(f"Request failed: {e}")
-        return None
-    
-def get_location(ip: str, format: str):
-    """Get location information for an IP address in specified format."""
-    try:
-        response = requests.get(f"http://ip-api.com/{format}/{ip}", timeout=5)
-        if response.status_code == 200:
-            data = response.text
-            return data
-        else:
-            print(f"Error: HTTP {response.status_code}")
-            return None
-    except requests.exceptions.RequestException as e:
-        print(f"Request failed: {e}")
-        return None
-    except json.JSONDecodeError as e:
-        print(f"JSON parsing failed: {e}")
-        return None
-    
-def create_weather_dataframe(weather_json):
+def create_weather_dataframe(weather_response):
     """
-    Convert Open-Meteo JSON response to a pandas DataFrame.
+    Convert Open-Meteo response to a pandas DataFrame.
     
     Args:
-        weather_json (dict): JSON response from get_weather_data function
+        weather_response: FlatBuffers response from get_weather_data function
         
     Returns:
         pandas.DataFrame: DataFrame with time as index and weather variables as columns
     """
-    if not weather_json or 'hourly' not in weather_json:
-        print("Invalid weather data")
+    # Hourly values are decoded straight into NumPy arrays
+    df = weather_api.create_weather_dataframe(weather_response, "rain")
+    if df is None:
         return None
     
-    # Extract hourly data
-    hourly_data = weather_json['hourly']
-    
-    # Create DataFrame from hourly data
-    df = pd.DataFrame(hourly_data)
-    
-    # Convert time column to datetime
-    df['time'] = pd.to_datetime(df['time'])
-    
-    # Set time as index for time series analysis
-    df.set_index('time', inplace=True)
-    
-        # Rename rain column to rain_forecast
+    # Rename rain column to rain_forecast
     if 'rain' in df.columns:
         df.rename(columns={'rain': 'rain_forecast'}, inplace=True)
-
-    # Store metadata as DataFrame attributes
-    df.attrs['elevation'] = weather_json.get('elevation', None)
-    df.attrs['latitude'] = weather_json.get('latitude', None)
-    df.attrs['longitude'] = weather_json.get('longitude', None)
-    df.attrs['timezone'] = weather_json.get('timezone', None)
-    df.attrs['generation_time_ms'] = weather_json.get('generationtime_ms', None)
-    
-    # Store units information
-    if 'hourly_units' in weather_json:
-        df.attrs['units'] = weather_json['hourly_units']
+        df.attrs['units']['rain_forecast'] = df.attrs['units'].pop('rain')
     
     return df
 
@@ -114,7 +56,11 @@ def plot_weather_dataframe(df, city: str):
     if 'rain_forecast' not in df.columns:
         print("No rain data to plot")
         return
-    
+
+    # The plotting stack is only imported when something is plotted
+    import seaborn as sns
+    import matplotlib.pyplot as plt
+
     # Seaborn plot
     plt.figure(figsize=(12, 6))
     sns.lineplot(data=df, x=df.index, y='rain_forecast', marker='o', markersize=4)
@@ -126,29 +72,7 @@ def plot_weather_dataframe(df, city: str):
     plt.tight_layout()
     plt.show()
     
-def get_weather_data(lat: float, lon: float, WeatherVariable: str, forecastDays: int):
-    """Fetch weather data using Open-Meteo API for given latitude and longitude."""
-    url = "https://api.open-meteo.com/v1/forecast"
-    params = {
-        "latitude": lat,
-        "longitude": lon,
-        "hourly": WeatherVariable,
-        "forecast_days": forecastDays,
-    }
-    try:
-        response = requests.get(url, params=params, timeout=5)
-        if response.status_code == 200:
-            data = response.json()
-            return data
-        else:
-            print(f"Error: HTTP {response.status_code}")
-            return None
-    except requests.exceptions.RequestException as e:
-        print(f"Request failed: {e}")
-        return None
-    except json.JSONDecodeError as e:
-        print(f"JSON parsing failed: {e}")
-        return None
+
 def save_dataframe_to_csv(df, city: str):
     """
     Save the weather DataFrame to a CSV file.
@@ -177,19 +101,47 @@ def save_dataframe_to_csv(df, city: str):
     except Exception as e:
         print(f"Error saving to CSV: {e}")
 
-def main():
-        # Get public IP address
-    ip = get_ip()
+def save_dataframe_to_store(df, city: str):
+    """
+    Append the weather DataFrame to the incremental forecast store.
+
+    Only forecast hours that changed since the previous run are written.
+
+    Args:
+        df (pandas.DataFrame): Weather DataFrame
+        city (str): Name of the city
+    """
+    try:
+        store = ForecastStore()
+        written = store.append(df, city)
+        print(f"\nForecast stored in: {store.path}")
+        print(f"Rows received: {df.size}, rows written (changed): {written}")
+        print(f"Store size: {os.path.getsize(store.path)} bytes")
+
+    except Exception as e:
+        print(f"Error saving to forecast store: {e}")
+
+def fetch_forecast():
+    """
+    Fetch the rain forecast for the current location.
+
+    Returns:
+        tuple: (weather DataFrame or None, city), or (None, None) if the
+        public IP is unknown
+    """
+    # Last known location from the cache (the IP is rechecked in the background),
+    # then the forecast through the cached, retrying Open-Meteo client
+    location = get_cached_location(get_ip, get_location) or None
+    result = asyncio.run(fetch_location_and_weather("rain", 16, location=location))
+    ip = result["ip"]
     if not ip:
         print("Failed to get public IP")
-        return
+        return None, None
 
-    # Get location data in JSON format
-    loc = get_location(ip, "json")  # format possibilities: json, csv, xml
+    # Location data in JSON format
     print("\nJSON:")
-    location_json = json.loads(loc if loc else "{}")
-    pprint(location_json)
-    location_data = location_json            
+    location_data = result["location"] or {}
+    pprint(location_data)
     # Check if the request was successful
     if location_data.get("status") != "success":
         raise Exception("Location API request failed")
@@ -202,20 +154,25 @@ def main():
 
     print(f"\nLocation: {city}, {country} (lat: {lat}, lon: {lon})")
 
-    # Fetch weather data
-    response = get_weather_data(lat, lon, "rain", 16)
+    # Weather data fetched in the chain above
+    response = result["forecast"]
     if response:
         print("\nWeather Data (Open-Meteo) read.")
     else:
         print("\nWeather Data (Open-Meteo):")
 
-    weather_df = create_weather_dataframe(response)
+    return create_weather_dataframe(response), city
+
+def main():
+    weather_df, city = fetch_forecast()
+    if city is None:
+        return
         
     if weather_df is not None:
             # Create visualizations
             plot_weather_dataframe(weather_df, city)
-            # Save DataFrame to CSV
-            save_dataframe_to_csv(weather_df, city)
+            # Save only the changed forecast hours
+            save_dataframe_to_store(weather_df, city)
             
     else:
             print("Failed to create DataFrame from weather data")
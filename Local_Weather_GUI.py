@@ -4,10 +4,15 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import numpy as np
+import random
 import requests
 import json
+import queue
+import threading
 from pprint import pprint
+from datetime import datetime
 from os import getenv
+from location_cache import LocationCache, get_cached_location
 
 # Load environment variables from .env file
 try:
@@ -19,6 +24,41 @@ except ImportError:
 # Get API key from environment variable for security
 API_KEY = getenv("API_KEY")
 
+# How often the main thread checks for results of the worker thread
+POLL_INTERVAL_MS = 100
+
+# Auto-refresh interval in seconds and its random jitter (fraction of the interval),
+# so several displays do not hit the API at the same moment
+AUTO_REFRESH_SECONDS = float(getenv("AUTO_REFRESH_SECONDS", 600))
+AUTO_REFRESH_JITTER = 0.1
+
+REALTIME_URL = "https://api.tomorrow.io/v4/weather/realtime"
+
+_realtime_session = None
+
+
+def get_realtime_session():
+    """
+    Cached session for the realtime API, created on first use.
+
+    Realtime responses are kept in the requests cache, but revalidated on every
+    request: with an ETag / Last-Modified the API can answer 304 Not Modified
+    instead of sending the payload again. Cache-Control headers from the API
+    (e.g. max-age) take precedence, so fresh responses are not requested at all.
+    The session (cache file and maintenance thread) is only opened here, not
+    when this module is imported.
+    """
+    global _realtime_session
+    if _realtime_session is None:
+        import requests_cache
+
+        import http_cache
+
+        _realtime_session = http_cache.get_session(
+            expire_after=requests_cache.EXPIRE_IMMEDIATELY, cache_control=True
+        )
+    return _realtime_session
+
 def get_ip():
     """Get public IP address using ipify.org API."""
     url = "https://api.ipify.org/"
@@ -54,7 +94,7 @@ def get_real_time_weather(lat: float, lon: float):
     """Get real-time weather data for given latitude and longitude."""
     # Construct API URL with location and parameters
     url = (
-        f"https://api.tomorrow.io/v4/weather/realtime?"
+        f"{REALTIME_URL}?"
         f"location={lat},{lon}"
         f"&apikey={API_KEY}"
         "&units=metric"  # Use metric units (Celsius, km/h, etc.)
@@ -63,8 +103,8 @@ def get_real_time_weather(lat: float, lon: float):
     # Set request headers for optimal response
     headers = {"accept": "application/json", "accept-encoding": "deflate, gzip, br"}
     try:
-        # Make GET request to the weather API
-        response = requests.get(url, headers=headers, timeout=5)
+        # Make GET request to the weather API (conditional if a cached copy exists)
+        response = get_realtime_session().get(url, headers=headers, timeout=5)
         if response.status_code == 200:
             data = response.json()
             return data
@@ -84,6 +124,12 @@ class WeatherApp:
         self.root.title("Weather Application")
         self.root.geometry("500x400")
         self.root.configure(bg='#f0f0f0')
+        self.location_cache = LocationCache()
+        self.fetch_thread = None  # worker thread of the running fetch
+        self.fetch_results = queue.Queue()  # worker thread -> main thread messages
+        self.quiet_errors = False  # auto-refresh errors only go to the status line
+        self.rendered = None  # (values, location) currently shown in the label
+        self.refresh_job = None  # pending root.after job of the auto-refresh
         
         # Create the GUI elements
         self.create_widgets()
@@ -121,6 +167,16 @@ class WeatherApp:
         )
         self.get_position_btn.pack(pady=10)
         
+        # Auto-refresh toggle
+        self.auto_refresh_var = tk.BooleanVar(value=False)
+        auto_refresh_check = ttk.Checkbutton(
+            main_frame,
+            text=f"Auto-refresh every {AUTO_REFRESH_SECONDS / 60:g} min",
+            variable=self.auto_refresh_var,
+            command=self.toggle_auto_refresh
+        )
+        auto_refresh_check.pack()
+        
         # Weather Data Label (with frame for better styling)
         data_frame = ttk.LabelFrame(main_frame, text="Weather Data", padding="10")
         data_frame.pack(fill=tk.BOTH, expand=True, pady=(20, 0))
@@ -149,27 +205,58 @@ class WeatherApp:
             fg='#7f8c8d'
         )
         self.status_label.pack(pady=(10, 0))
-    def get_position_and_weather(self):
-        """Get user position and fetch weather data"""
+    def toggle_auto_refresh(self):
+        """Start or stop the periodic refresh"""
+        if self.refresh_job is not None:
+            self.root.after_cancel(self.refresh_job)
+            self.refresh_job = None
+        if self.auto_refresh_var.get():
+            self.auto_refresh()
+
+    def schedule_refresh(self):
+        """Schedule the next auto-refresh after the interval with random jitter"""
+        jitter = random.uniform(-AUTO_REFRESH_JITTER, AUTO_REFRESH_JITTER)
+        delay_ms = int(AUTO_REFRESH_SECONDS * (1 + jitter) * 1000)
+        self.refresh_job = self.root.after(delay_ms, self.auto_refresh)
+
+    def auto_refresh(self):
+        """Refresh the weather data and schedule the next refresh"""
+        self.refresh_job = None
+        if not self.auto_refresh_var.get():
+            return
+        self.get_position_and_weather(quiet=True)
+        self.schedule_refresh()
+
+    def get_position_and_weather(self, quiet: bool = False):
+        """Start fetching position and weather data on a worker thread"""
+        # Repeated clicks while a fetch is running are ignored
+        if self.fetch_thread is not None and self.fetch_thread.is_alive():
+            if not quiet:
+                self.status_label.config(text="Already fetching weather data...")
+            return
+
+        self.quiet_errors = quiet
+
+        self.get_position_btn.config(state=tk.DISABLED)
+        self.status_label.config(text="Getting position...")
+        self.fetch_thread = threading.Thread(target=self.fetch_position_and_weather, daemon=True)
+        self.fetch_thread.start()
+        self.root.after(POLL_INTERVAL_MS, self.process_fetch_results)
+
+    def fetch_position_and_weather(self):
+        """
+        Get user position and fetch weather data (runs on the worker thread).
+
+        Tk widgets must only be touched from the main thread, so progress and
+        results are put on self.fetch_results and handled there.
+        """
         try:
-            # Update status
-            self.status_label.config(text="Getting position...")
-            self.root.update()
-            
-            # Get position using IP geolocation
-            ip = get_ip()
-            print(f"DEBUG - Got IP: {ip}")
-            if not ip:
-                raise Exception("Failed to get IP address")
-            
-            # Get location data as JSON string
-            location_json = get_location(ip, "json")
-            if not location_json:
+            # Get position using IP geolocation (cached; a changed IP is
+            # picked up in the background and used on the next click)
+            location_data = get_cached_location(get_ip, get_location, self.location_cache)
+            if not location_data:
                 raise Exception("Failed to get location data")
             
-            # Parse the JSON string to extract lat and lon
-            location_data = json.loads(location_json)
-            
             # Check if the request was successful
             if location_data.get("status") != "success":
                 raise Exception("Location API request failed")
@@ -184,30 +271,58 @@ class WeatherApp:
                 raise Exception("Could not extract coordinates from location data")
             
             # Update status
-            self.status_label.config(text=f"Getting weather for {city}, {country}...")
-            self.root.update()
+            self.fetch_results.put(("status", f"Getting weather for {city}, {country}..."))
             
             # Get weather data using extracted coordinates
             weather_data = get_real_time_weather(lat, lon)
             
-            # This is line 184 where it crashes
             if not weather_data:
                 raise Exception("Failed to get weather data - API returned no data")
             
-            # Format and display the weather information
-            self.display_weather_data(weather_data, location_data)
-            self.status_label.config(text="Weather data updated successfully")
+            self.fetch_results.put(("done", weather_data, location_data))
             
         except json.JSONDecodeError as e:
-            error_message = f"JSON parsing error: {str(e)}"
-            self.weather_label.config(text=error_message)
-            self.status_label.config(text="JSON parsing failed")
-            messagebox.showerror("JSON Error", error_message)
+            self.fetch_results.put(("error", "JSON Error", "JSON parsing failed",
+                                    f"JSON parsing error: {str(e)}"))
         except Exception as e:
-            error_message = f"Error: {str(e)}"
-            self.weather_label.config(text=error_message)
-            self.status_label.config(text="Error occurred")
-            messagebox.showerror("Error", error_message)
+            self.fetch_results.put(("error", "Error", "Error occurred", f"Error: {str(e)}"))
+
+    def process_fetch_results(self):
+        """Apply messages from the worker thread to the GUI (main thread)"""
+        finished = False
+        while not self.fetch_results.empty():
+            message = self.fetch_results.get_nowait()
+            if message[0] == "status":
+                self.status_label.config(text=message[1])
+            elif message[0] == "done":
+                weather_data, location_data = message[1], message[2]
+                # Only re-render the label when the values changed
+                values = weather_data.get("data", {}).get("values")
+                rendered = (values, location_data.get("city"), location_data.get("country"))
+                checked = datetime.now().strftime("%H:%M:%S")
+                if rendered != self.rendered:
+                    # Format and display the weather information
+                    self.display_weather_data(weather_data, location_data)
+                    self.rendered = rendered
+                    self.status_label.config(text=f"Weather data updated successfully ({checked})")
+                else:
+                    self.status_label.config(text=f"No change in weather data (checked {checked})")
+                finished = True
+            else:
+                _, title, status, error_message = message
+                if self.quiet_errors:
+                    status = f"Auto-refresh failed: {error_message}"
+                self.status_label.config(text=status)
+                if not self.quiet_errors:
+                    self.weather_label.config(text=error_message)
+                    self.rendered = None
+                    messagebox.showerror(title, error_message)
+                finished = True
+
+        if finished or not self.fetch_thread.is_alive() and self.fetch_results.empty():
+            self.get_position_btn.config(state=tk.NORMAL)
+        else:
+            self.root.after(POLL_INTERVAL_MS, self.process_fetch_results)
 
     def display_weather_data(self, weather_data, location_data):
         """Format and display weather data in the label"""
@@ -0,0 +1,201 @@
+# async_weather.py
+# Asyncio weather client: IP -> location -> (forecast + realtime) chain
+# over persistent, pooled httpx connections; the forecast itself goes
+# through the cached, retrying Open-Meteo client of weather_api
+
+import asyncio
+import json
+from os import getenv
+
+import httpx
+
+import weather_api
+from weather_api import FORECAST_URL, hourly_variable_names
+
+IP_URL = "https://api.ipify.org/"
+LOCATION_URL = "http://ip-api.com"
+REALTIME_URL = "https://api.tomorrow.io/v4/weather/realtime"
+
+try:
+    import h2  # noqa: F401  (HTTP/2 support for httpx)
+
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class AsyncWeatherClient:
+    """
+    Async client for the weather APIs used by the Homework-2 scripts.
+
+    One httpx.AsyncClient keeps a keep-alive connection pool per host (HTTP/2
+    when the h2 package is installed and the server supports it). Identical
+    requests that are already in flight are coalesced: later callers await
+    the same task instead of sending the request again.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 5,
+        max_connections: int = 10,
+        ip_url: str = IP_URL,
+        location_url: str = LOCATION_URL,
+        forecast_url: str = FORECAST_URL,
+        realtime_url: str = REALTIME_URL,
+        api_key: str = None,
+    ):
+        self.ip_url = ip_url
+        self.location_url = location_url.rstrip("/")
+        self.forecast_url = forecast_url
+        self.realtime_url = realtime_url
+        self.api_key = api_key if api_key is not None else getenv("API_KEY")
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+        self._in_flight = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def _coalesce(self, key, request):
+        """Await request() once per key: identical in-flight calls share its task."""
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(request())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _get(self, url: str, params: dict = None, headers: dict = None):
+        """GET with coalescing of identical in-flight requests; None on error."""
+        key = (url, tuple(sorted((params or {}).items())))
+        return await self._coalesce(key, lambda: self._send(url, params, headers))
+
+    async def _send(self, url: str, params: dict = None, headers: dict = None):
+        try:
+            response = await self._client.get(url, params=params, headers=headers)
+            if response.status_code == 200:
+                return response
+            print(f"Error: HTTP {response.status_code}")
+            return None
+        except httpx.HTTPError as e:
+            print(f"Request failed: {e}")
+            return None
+
+    async def get_ip(self):
+        """Get public IP address using ipify.org API."""
+        response = await self._get(self.ip_url)
+        return response.text if response is not None else None
+
+    async def get_location(self, ip: str, format: str = "json"):
+        """Get location information for an IP address in specified format."""
+        response = await self._get(f"{self.location_url}/{format}/{ip}")
+        return response.text if response is not None else None
+
+    async def get_weather_data(self, lat: float, lon: float, WeatherVariable, forecastDays: int):
+        """
+        Fetch an Open-Meteo forecast as a FlatBuffers WeatherApiResponse.
+
+        The request is sent by weather_api.get_weather_data on a worker
+        thread, so it uses the managed HTTP cache and the retry policy;
+        identical in-flight calls are coalesced.
+        """
+        variables = ",".join(hourly_variable_names(WeatherVariable))
+        key = (self.forecast_url, lat, lon, variables, forecastDays)
+        return await self._coalesce(key, lambda: asyncio.to_thread(
+            weather_api.get_weather_data, lat, lon, variables, forecastDays, self.forecast_url
+        ))
+
+    async def get_real_time_weather(self, lat: float, lon: float):
+        """Get real-time weather data from Tomorrow.io for given latitude and longitude."""
+        params = {"location": f"{lat},{lon}", "apikey": self.api_key, "units": "metric"}
+        headers = {"accept": "application/json", "accept-encoding": "deflate, gzip, br"}
+        response = await self._get(self.realtime_url, params=params, headers=headers)
+        if response is None:
+            return None
+        try:
+            return response.json()
+        except json.JSONDecodeError as e:
+            print(f"JSON parsing failed: {e}")
+            return None
+
+    async def get_location_and_weather(
+        self,
+        WeatherVariable="rain",
+        forecastDays: int = 16,
+        realtime: bool = False,
+        location: dict = None,
+    ) -> dict:
+        """
+        Run the IP -> location -> weather chain.
+
+        The forecast and (optionally) the realtime request only depend on the
+        location, so they are sent concurrently. A known location (e.g. from
+        location_cache) skips the IP and location requests.
+
+        Returns:
+            dict with ip, location (parsed JSON), forecast (WeatherApiResponse)
+            and realtime (dict) entries; missing parts are None
+        """
+        result = {"ip": None, "location": None, "forecast": None, "realtime": None}
+        if location is None:
+            result["ip"] = await self.get_ip()
+            if not result["ip"]:
+                return result
+            location_json = await self.get_location(result["ip"], "json")
+            location = json.loads(location_json) if location_json else {}
+        else:
+            result["ip"] = location.get("query")
+        result["location"] = location
+        if location.get("status") != "success":
+            return result
+
+        lat, lon = location.get("lat"), location.get("lon")
+        fetches = [self.get_weather_data(lat, lon, WeatherVariable, forecastDays)]
+        if realtime:
+            fetches.append(self.get_real_time_weather(lat, lon))
+        responses = await asyncio.gather(*fetches)
+        result["forecast"] = responses[0]
+        if realtime:
+            result["realtime"] = responses[1]
+        return result
+
+
+async def fetch_location_and_weather(
+    WeatherVariable="rain",
+    forecastDays: int = 16,
+    realtime: bool = False,
+    location: dict = None,
+    **client_options,
+):
+    """Convenience wrapper: open a client, run the chain and close the client."""
+    async with AsyncWeatherClient(**client_options) as client:
+        return await client.get_location_and_weather(
+            WeatherVariable, forecastDays, realtime, location
+        )
+
+
+async def _call(method: str, *args, **client_options):
+    async with AsyncWeatherClient(**client_options) as client:
+        return await getattr(client, method)(*args)
+
+
+def get_ip(**client_options):
+    """Blocking get_ip for callers without an event loop (location_cache)."""
+    return asyncio.run(_call("get_ip", **client_options))
+
+
+def get_location(ip: str, format: str = "json", **client_options):
+    """Blocking get_location for callers without an event loop (location_cache)."""
+    return asyncio.run(_call("get_location", ip, format, **client_options))
@@ -0,0 +1,412 @@
+# benchmark_suite.py
+# End-to-end benchmarks of the hot paths, on synthetic data scaled from the real captures
+#
+# The crack meter capture (CalibData) is tiled to --scale times its length,
+# with +-1 count noise on the ADC columns, and the hourly Prague rain CSVs are
+# resampled day by day into an --hours long series. Every case runs --repeat
+# times and the best time is kept. Groups (select with --only):
+#   csv      read_crack_meter_csv (compact dtypes) vs. pandas defaults, weather CSV
+#   scale    Scale_current/Scale_voltage per value (Homework-1) vs. scale_crack_meter_frame
+#   mongo    frame_records (to_dict), insert_many and insert_data_in_batches,
+#            against --uri (scratch database, dropped afterwards) or mongomock
+#   dash     load_dataset and the update_graph/update_history callbacks (Homework-1-live)
+#   weather  weather_api.create_weather_dataframe on FlatBuffers responses
+#   gui      CSVVisualizerApp.generate_plot per plot type, drawn on an Agg canvas
+#
+# Results are saved as JSON (commit, machine, parameters, all run times) for
+# comparison between commits. With --compare the run is checked against an
+# earlier result file; exits with status 1 if a case is slower than --tolerance.
+#
+# Usage: python benchmark_suite.py [--scale 10] [--hours 8760] [--repeat 3] [--only csv,scale]
+#                                  [--uri mongodb://localhost:27017] [--output FILE] [--compare FILE]
+
+import argparse
+import glob
+import importlib
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+os.environ.setdefault("MPLBACKEND", "Agg")  # before anything imports pyplot
+
+import numpy as np
+import pandas as pd
+
+import src_path  # noqa: F401  (CSV_reader and the crack meter modules)
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+from crack_meter import (CRACK_METER_DTYPES, CRACK_METER_NAMES, Scale_current, Scale_voltage,
+                         read_crack_meter_csv, scale_crack_meter_frame)
+
+CRACK_CSV = "datasets/crack_meter/CalibData-30kHz-0-12--.csv"
+WEATHER_CSVS = "weather_data_*for_Prague_*.csv"
+RESULTS_DIR = "benchmark_results"
+GROUPS = ("csv", "scale", "mongo", "dash", "weather", "gui")
+
+VOLTAGE_DROP = CRACK_METER_NAMES["Voltage Drop"]
+CURRENT = CRACK_METER_NAMES["Current"]
+CRACK_SIZE = CRACK_METER_NAMES["Crack size"]
+
+
+def synthetic_crack_frame(scale: float, seed: int = 0) -> pd.DataFrame:
+    """Raw crack meter frame: the calibration capture repeated to scale times its length"""
+    real = pd.read_csv(CRACK_CSV, sep=";", encoding="utf-8-sig")
+    rows = max(1, int(len(real) * scale))
+    frame = real.iloc[np.arange(rows) % len(real)].reset_index(drop=True)
+    # The ADC counts jitter by one count, so the copies are not identical
+    rng = np.random.default_rng(seed)
+    for column in ("Current", "Voltage Drop"):
+        frame[column] = np.maximum(frame[column] + rng.integers(-1, 2, rows), 0).astype(np.float64)
+    return frame
+
+
+def synthetic_weather_frame(hours: int, seed: int = 0) -> pd.DataFrame:
+    """Hourly rain built from whole days of the Prague CSVs, drawn at random"""
+    days = []
+    for path in sorted(glob.glob(WEATHER_CSVS)):
+        values = pd.read_csv(path).iloc[:, 1].to_numpy(dtype=np.float64)
+        days.extend(values[i:i + 24] for i in range(0, len(values) - 23, 24))
+    if not days:
+        raise FileNotFoundError(f"No weather CSVs matching {WEATHER_CSVS}")
+    rng = np.random.default_rng(seed)
+    rain = np.concatenate([days[i] for i in rng.integers(0, len(days), hours // 24 + 1)])[:hours]
+    time_index = pd.date_range("2025-10-18", periods=hours, freq="h")
+    return pd.DataFrame({"time": time_index, "rain": rain})
+
+
+def synthetic_weather_responses(weather: pd.DataFrame, sites: int):
+    """Parsed Open-Meteo responses (one per site) carrying the rain series"""
+    from openmeteo_sdk.WeatherApiResponse import WeatherApiResponse
+
+    from weather_stub_server import build_forecast
+
+    start = int(weather["time"].iloc[0].timestamp())
+    values = {"rain": weather["rain"].to_numpy()}
+    responses = []
+    for i in range(sites):
+        message = build_forecast(50.0 + i / 100, 14.4, ["rain"], len(weather), start, values)
+        responses.append(WeatherApiResponse.GetRootAs(message, 4))  # after the size prefix
+    return responses
+
+
+class Suite:
+    """Runs the cases and collects their timings"""
+
+    def __init__(self, repeat: int):
+        self.repeat = repeat
+        self.results = {}
+
+    def run(self, name: str, rows: int, func, setup=None):
+        """Time func() repeat times; setup() runs untimed before every run"""
+        runs = []
+        for _ in range(self.repeat):
+            if setup is not None:
+                setup()
+            started = time.perf_counter()
+            func()
+            runs.append(time.perf_counter() - started)
+        best = min(runs)
+        self.results[name] = {
+            "rows": rows,
+            "best_s": best,
+            "mean_s": sum(runs) / len(runs),
+            "runs_s": runs,
+            "rows_per_s": rows / best if best > 0 else None,
+        }
+        print(f"{name:<40} {best * 1000:10.1f} ms {rows / best if best > 0 else 0:14,.0f} rows/s")
+
+
+def bench_csv(suite: Suite, work_dir: str, crack: pd.DataFrame, weather: pd.DataFrame):
+    crack_path = os.path.join(work_dir, "crack.csv")
+    weather_path = os.path.join(work_dir, "weather.csv")
+    suite.run("csv/read_crack_meter_csv", len(crack), lambda: read_crack_meter_csv(crack_path, sep=";"))
+    suite.run("csv/read_csv (default dtypes)", len(crack),
+              lambda: pd.read_csv(crack_path, sep=";", encoding="utf-8-sig"))
+    suite.run("csv/read_csv weather", len(weather),
+              lambda: pd.read_csv(weather_path, index_col="time", parse_dates=["time"]))
+
+
+def bench_scale(suite: Suite, crack: pd.DataFrame):
+    def per_value():
+        # Homework-1: one Python call per value
+        crack["CurrentSet"].apply(Scale_current)
+        crack["Current"].apply(Scale_current)
+        crack["Voltage Drop"].apply(Scale_voltage)
+
+    suite.run("scale/Scale_current+Scale_voltage apply", len(crack), per_value)
+    suite.run("scale/scale_crack_meter_frame", len(crack), lambda: scale_crack_meter_frame(crack))
+    suite.run("scale/scale_crack_meter_frame float32", len(crack),
+              lambda: scale_crack_meter_frame(crack, np.float32))
+
+
+def bench_mongo(suite: Suite, crack: pd.DataFrame, uri: str = None, rows: int = None):
+    import CSV_reader
+
+    # The compact schema read_crack_meter_csv returns, as the ingest sees it
+    data = (crack.iloc[:rows] if rows else crack).astype(CRACK_METER_DTYPES)
+    data["timestamp"] = pd.date_range(datetime(2025, 10, 18), periods=len(data), freq="s")
+    if uri:
+        from pymongo import MongoClient
+        client = MongoClient(uri, serverSelectionTimeoutMS=5000)
+    else:
+        import mongomock
+        client = mongomock.MongoClient()
+    collection = client["crack_benchmark"]["crack_data"]
+    batch_size = 1000
+    records = []
+
+    def to_dict():
+        records[:] = [CSV_reader.frame_records(data.iloc[i:i + batch_size])
+                      for i in range(0, len(data), batch_size)]
+
+    def insert_many():
+        for batch in records:
+            collection.insert_many(batch)
+
+    # The ingest logs every batch at INFO
+    level = CSV_reader.logger.level
+    CSV_reader.logger.setLevel(logging.WARNING)
+    try:
+        suite.run("mongo/frame_records (to_dict)", len(data), to_dict)
+        suite.run("mongo/insert_many", len(data), insert_many, setup=lambda: (collection.drop(), to_dict()))
+        suite.run("mongo/insert_data_in_batches", len(data),
+                  lambda: CSV_reader.insert_data_in_batches(collection, data, batch_size=batch_size,
+                                                            delay_seconds=0, stats={}),
+                  setup=collection.drop)
+    finally:
+        CSV_reader.logger.setLevel(level)
+        client.drop_database("crack_benchmark")
+        client.close()
+
+
+def bench_dash(suite: Suite, work_dir: str, rows: int, intervals: int = 200):
+    live = importlib.import_module("Homework-1-live")
+    live.PATH = os.path.join(work_dir, "crack.csv")
+
+    def load():
+        live._dataset = None
+        live.load_dataset()
+
+    suite.run("dash/load_dataset", rows, load)
+    suite.run("dash/update_graph", intervals * 20,
+              lambda: [live.update_graph(n) for n in range(intervals)])
+
+    live._pyramid = None
+    live.load_pyramid()  # built next to the CSV once, like the first request of the app
+    zooms = [None] + [{"xaxis.range[0]": start, "xaxis.range[1]": start + width}
+                      for start in (0, rows // 3, rows // 2) for width in (500, 20_000, rows // 4)]
+    suite.run("dash/update_history", len(zooms), lambda: [live.update_history(zoom) for zoom in zooms])
+
+
+def bench_weather(suite: Suite, weather: pd.DataFrame, sites: int = 100):
+    from weather_api import create_weather_dataframe
+
+    responses = synthetic_weather_responses(weather, sites)
+    suite.run("weather/create_weather_dataframe", len(weather) * sites,
+              lambda: [create_weather_dataframe(response, "rain") for response in responses])
+
+
+class _Var:
+    """Value holder standing in for the Tk variables and comboboxes of the app"""
+
+    def __init__(self, value=None):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+class _HeadlessRoot:
+    """Root window stand-in; idle callbacks run on flush()"""
+
+    def __init__(self):
+        self.idle = []
+
+    def title(self, text):
+        pass
+
+    def geometry(self, size):
+        pass
+
+    def after_idle(self, callback):
+        self.idle.append(callback)
+
+    def flush(self):
+        while self.idle:
+            self.idle.pop(0)()
+
+
+def headless_visualizer(path: str):
+    """CSVVisualizerApp with the crack CSV loaded, plotting on an Agg canvas instead of Tk widgets"""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    from csv_gui_app import CSVVisualizerApp
+    from plot_controller import PlotController
+
+    class HeadlessVisualizer(CSVVisualizerApp):
+        def create_widgets(self):
+            self.x_var, self.y_var, self.z_var = _Var(), _Var(), _Var("None")
+            self.plot_type = _Var("Scatter")
+            self.scale_data_var = _Var(True)
+            self.out_of_core_var = _Var(False)
+            self.fig = Figure(figsize=(8, 6))
+            self.ax = self.fig.add_subplot()
+            self.canvas = FigureCanvasAgg(self.fig)
+            self.plotter = PlotController(self.fig, self.ax, self.canvas)
+
+    app = HeadlessVisualizer(_HeadlessRoot())
+    # What load_csv_file does after the file dialog
+    app.current_file = app.pyramid_source = path
+    app.df_original = read_crack_meter_csv(path, sep=";")
+    app.apply_data_processing()
+    return app
+
+
+def bench_gui(suite: Suite, work_dir: str, rows: int):
+    from csv_gui_app import SAMPLE_AXIS
+
+    app = headless_visualizer(os.path.join(work_dir, "crack.csv"))
+
+    def plot(plot_type, x, y, z="None"):
+        def draw():
+            app.plot_type.set(plot_type)
+            app.x_var.set(x)
+            app.y_var.set(y)
+            app.z_var.set(z)
+            app.generate_plot()
+            app.canvas.draw()
+            app.root.flush()
+        return draw
+
+    cases = {
+        "gui/scatter": plot("Scatter", VOLTAGE_DROP, CRACK_SIZE),
+        "gui/colored scatter": plot("Colored Scatter", VOLTAGE_DROP, CRACK_SIZE, CURRENT),
+        "gui/line": plot("Line", VOLTAGE_DROP, CRACK_SIZE),
+        "gui/histogram": plot("Histogram", VOLTAGE_DROP, CRACK_SIZE),
+        "gui/sample plot": plot("Line", SAMPLE_AXIS, CRACK_SIZE),
+    }
+    cases["gui/sample plot"]()  # builds the tile pyramid once
+    for name, draw in cases.items():
+        suite.run(name, rows, draw)
+
+    def zoom():
+        for start in (0, rows // 3, rows // 2):
+            for width in (500, 20_000, rows // 4):
+                app.ax.set_xlim(start, start + width)
+                app.root.flush()
+                app.canvas.draw()
+
+    cases["gui/sample plot"]()
+    suite.run("gui/sample plot zoom", 9, zoom)
+
+
+def git_commit() -> str:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{commit}-dirty" if dirty else commit
+
+
+def compare(report: dict, baseline_path: str, tolerance: float) -> bool:
+    """Print best-time ratios against an earlier result file; True if nothing regressed"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline.get('commit', '?')} ({baseline_path}):")
+    if baseline.get("parameters") != report["parameters"]:
+        print(f"     parameters differ: {baseline.get('parameters')} vs. {report['parameters']}")
+    ok = True
+    for name, result in report["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            print(f"     {name}: new case")
+            continue
+        ratio = result["best_s"] / old["best_s"] if old["best_s"] > 0 else float("inf")
+        slower = ratio > 1 + tolerance
+        ok &= not slower
+        print(f"{'SLOW' if slower else 'OK  '} {name}: {old['best_s'] * 1000:.1f} -> "
+              f"{result['best_s'] * 1000:.1f} ms ({ratio:.2f}x)")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmarks on synthetic crack meter and weather data")
+    parser.add_argument("--scale", type=float, default=10.0, help="crack data rows, as a multiple of CalibData")
+    parser.add_argument("--hours", type=int, default=24 * 365, help="hours of synthetic weather data")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case (the best is kept)")
+    parser.add_argument("--only", help=f"comma separated groups ({', '.join(GROUPS)})")
+    parser.add_argument("--uri", default=os.getenv("MONGO_URI"), help="MongoDB URI (default: mongomock)")
+    parser.add_argument("--mongo-rows", type=int, help="rows inserted (default: all; 20,000 with mongomock)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help=f"result file (default: {RESULTS_DIR}/<commit>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown for --compare")
+    args = parser.parse_args()
+
+    groups = args.only.split(",") if args.only else list(GROUPS)
+    unknown = set(groups) - set(GROUPS)
+    if unknown:
+        parser.error(f"unknown groups: {', '.join(sorted(unknown))}")
+    os.chdir(ROOT)  # the modules use paths relative to the repository
+
+    crack = synthetic_crack_frame(args.scale, args.seed)
+    weather = synthetic_weather_frame(args.hours, args.seed)
+    print(f"{len(crack):,} crack meter rows, {len(weather):,} hours of weather, best of {args.repeat}")
+    work_dir = tempfile.mkdtemp(prefix="benchmark_suite_")
+    suite = Suite(args.repeat)
+    try:
+        crack.to_csv(os.path.join(work_dir, "crack.csv"), sep=";", index=False)
+        weather.to_csv(os.path.join(work_dir, "weather.csv"), index=False)
+        if "csv" in groups:
+            bench_csv(suite, work_dir, crack, weather)
+        if "scale" in groups:
+            bench_scale(suite, crack)
+        if "mongo" in groups:
+            bench_mongo(suite, crack, args.uri, args.mongo_rows or (None if args.uri else 20_000))
+        if "dash" in groups:
+            bench_dash(suite, work_dir, len(crack))
+        if "weather" in groups:
+            bench_weather(suite, weather)
+        if "gui" in groups:
+            bench_gui(suite, work_dir, len(crack))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    commit = git_commit()
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    report = {
+        "commit": commit,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs",
+        "parameters": {"scale": args.scale, "hours": args.hours, "repeat": args.repeat,
+                       "mongo": "mongod" if args.uri else "mongomock", "seed": args.seed},
+        "results": suite.results,
+    }
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare and not compare(report, args.compare, args.tolerance):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
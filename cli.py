@@ -0,0 +1,115 @@
+# cli.py
+# Command line entry point for the weather and crack meter scripts
+#
+# Usage: python cli.py fetch [--csv]                 (forecast for the current location -> store)
+#        python cli.py analyze [--city CITY | --csv FILE ...]
+#        python cli.py plot [--city CITY | --csv FILE ...]
+#        python cli.py ingest [CSV] [--mqtt]           (crack meter data -> MongoDB)
+#
+# Only argparse is imported at startup. Every subcommand imports what it
+# needs when it runs, so fetch never loads the plotting stack and --help
+# returns immediately (see startup_benchmark.py).
+
+import argparse
+import importlib
+import sys
+
+DEFAULT_CITY = "Prague"
+
+
+def load_forecast(args):
+    """Latest stored forecast of args.city, or saved weather CSV files, with a "rain" column"""
+    if args.csv:
+        from weather_crack_join import read_weather_csv
+
+        df = read_weather_csv(args.csv)
+    else:
+        from forecast_store import ForecastStore
+
+        df = ForecastStore().latest(args.city)
+    # Homework-2 stores the forecast as rain_forecast; older snapshots use rain,
+    # so files of both kinds read together have both columns
+    if "rain_forecast" not in df.columns:
+        return df
+    forecast = df.pop("rain_forecast")
+    df["rain"] = df["rain"].combine_first(forecast) if "rain" in df.columns else forecast
+    return df
+
+
+def fetch(args):
+    homework = importlib.import_module("Homework-2")
+    weather_df, city = homework.fetch_forecast()
+    if weather_df is None:
+        print("Failed to create DataFrame from weather data")
+        return 1
+    homework.save_dataframe_to_store(weather_df, city)
+    if args.csv:
+        homework.save_dataframe_to_csv(weather_df, city)
+    return 0
+
+
+def analyze(args):
+    df = load_forecast(args)
+    if df.empty:
+        print("No forecast data")
+        return 1
+    importlib.import_module("Homework-2-print_data").analyze_weather_dataframe(df)
+    return 0
+
+
+def plot(args):
+    df = load_forecast(args)
+    if df.empty:
+        print("No forecast data")
+        return 1
+    importlib.import_module("Homework-2-print_data").plot_weather_dataframe(df, args.city)
+    return 0
+
+
+def ingest(args):
+    import logging
+
+    logging.basicConfig(level=logging.INFO)
+    import src_path  # noqa: F401  (CSV_reader and the bridge live in src/)
+    if args.mqtt:
+        import mqtt_mongo_bridge
+
+        mqtt_mongo_bridge.main()
+    else:
+        import CSV_reader
+
+        CSV_reader.main(args.path or CSV_reader.CSV_PATH)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Weather and crack meter tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    fetch_parser = commands.add_parser("fetch", help="fetch the rain forecast for the current location")
+    fetch_parser.add_argument("--csv", action="store_true", help="also save a CSV snapshot")
+    fetch_parser.set_defaults(func=fetch)
+
+    for name, func, help_text in (
+        ("analyze", analyze, "print rain statistics and rainy periods"),
+        ("plot", plot, "plot the rain forecast"),
+    ):
+        sub = commands.add_parser(name, help=help_text)
+        sub.add_argument("--city", default=DEFAULT_CITY, help="location in the forecast store")
+        sub.add_argument("--csv", nargs="+", help="weather CSV file(s) instead of the store")
+        sub.set_defaults(func=func)
+
+    ingest_parser = commands.add_parser("ingest", help="load crack meter data into MongoDB")
+    ingest_parser.add_argument("path", nargs="?", help="crack meter CSV file")
+    ingest_parser.add_argument("--mqtt", action="store_true", help="run the live MQTT bridge instead")
+    ingest_parser.set_defaults(func=ingest)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
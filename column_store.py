@@ -0,0 +1,141 @@
+"""
+Out-of-core column store for large CSV captures.
+
+A CSV file is converted once into one raw float64 file per numeric column
+plus a small JSON header, stored next to the CSV in a ``<name>.columns``
+directory. The column files are opened as read-only memory maps, and
+statistics, histograms and decimated plot data are computed chunk by
+chunk, so memory use is bounded by the chunk size and not by the file size.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import src_path  # noqa: F401  (crack meter modules in src/)
+
+from streaming_stats import StreamingStats, histogram_edges, stats_from_chunks
+
+CHUNK_ROWS = 1_000_000   # rows processed per streaming step
+META_FILE = "columns.json"
+
+
+def detect_separator(csv_path: str) -> str:
+    """Guess the column separator from the header line (';' or ',')"""
+    with open(csv_path, "r", encoding="utf-8-sig") as f:
+        header = f.readline()
+    return ";" if header.count(";") > header.count(",") else ","
+
+
+class ColumnStore:
+    """Read-only, memory-mapped numeric columns of a converted CSV file"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, META_FILE), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.columns = [c["name"] for c in self.meta["columns"]]
+        self._files = {c["name"]: c["file"] for c in self.meta["columns"]}
+        self._maps = {}
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    @classmethod
+    def from_csv(cls, csv_path: str, directory: str = None, sep: str = None,
+                 chunk_rows: int = CHUNK_ROWS) -> "ColumnStore":
+        """Open the column store of a CSV file, converting it first if needed"""
+        directory = directory or csv_path + ".columns"
+        stat = os.stat(csv_path)
+        meta_path = os.path.join(directory, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("source_size") == stat.st_size and meta.get("source_mtime") == stat.st_mtime:
+                return cls(directory)
+
+        convert_csv(csv_path, directory, sep=sep, chunk_rows=chunk_rows)
+        return cls(directory)
+
+    def column(self, name: str) -> np.memmap:
+        """Memory-mapped values of one column (nothing is read until accessed)"""
+        if name not in self._maps:
+            path = os.path.join(self.directory, self._files[name])
+            if len(self) == 0:
+                self._maps[name] = np.empty(0, dtype=np.float64)
+            else:
+                self._maps[name] = np.memmap(path, dtype=np.float64, mode="r", shape=(len(self),))
+        return self._maps[name]
+
+    def iter_chunks(self, name: str, transform=None, chunk_rows: int = CHUNK_ROWS):
+        """Yield the column in chunks, optionally passed through transform"""
+        values = self.column(name)
+        for start in range(0, len(values), chunk_rows):
+            chunk = np.asarray(values[start:start + chunk_rows])
+            yield transform(chunk) if transform is not None else chunk
+
+    def column_stats(self, name: str, transform=None, edges=None, workers: int = 1) -> StreamingStats:
+        """One-pass streaming statistics (and optional histogram) of a column"""
+        return stats_from_chunks(self.iter_chunks(name, transform), edges=edges, workers=workers)
+
+    def describe(self, names, transforms=None) -> pd.DataFrame:
+        """Streaming equivalent of DataFrame.describe() (quartiles are approximate)"""
+        transforms = transforms or {}
+        return pd.DataFrame({name: self.column_stats(name, transforms.get(name)).describe()
+                             for name in names})
+
+    def histogram(self, name: str, bins: int = 30, transform=None, stats: StreamingStats = None):
+        """Fixed-bin histogram; the value range comes from stats (computed if not given)"""
+        stats = stats or self.column_stats(name, transform)
+        edges = histogram_edges(stats, bins)
+        return self.column_stats(name, transform, edges=edges).histogram()
+
+    def sample(self, names, max_points: int, transforms=None) -> pd.DataFrame:
+        """Evenly strided rows of the given columns, at most max_points of them"""
+        transforms = transforms or {}
+        step = max(1, -(-len(self) // max_points))  # ceil division
+        data = {}
+        for name in names:
+            values = np.asarray(self.column(name)[::step])
+            transform = transforms.get(name)
+            data[name] = transform(values) if transform is not None else values
+        return pd.DataFrame(data)
+
+
+def convert_csv(csv_path: str, directory: str, sep: str = None, chunk_rows: int = CHUNK_ROWS):
+    """Convert the numeric columns of a CSV file into raw column files, chunk by chunk"""
+    sep = sep or detect_separator(csv_path)
+    os.makedirs(directory, exist_ok=True)
+    meta_path = os.path.join(directory, META_FILE)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)  # the store is incomplete until the header is rewritten
+
+    columns = None
+    handles = {}
+    rows = 0
+    try:
+        for chunk in pd.read_csv(csv_path, sep=sep, chunksize=chunk_rows, encoding="utf-8-sig"):
+            if columns is None:
+                # Numeric columns of the first chunk define the store layout
+                columns = chunk.select_dtypes(include=[np.number]).columns.tolist()
+                for i, name in enumerate(columns):
+                    handles[name] = open(os.path.join(directory, f"col_{i}.bin"), "wb")
+            for name in columns:
+                values = pd.to_numeric(chunk[name], errors="coerce").to_numpy(dtype=np.float64)
+                values.tofile(handles[name])
+            rows += len(chunk)
+    finally:
+        for handle in handles.values():
+            handle.close()
+
+    stat = os.stat(csv_path)
+    meta = {
+        "source": os.path.abspath(csv_path),
+        "source_size": stat.st_size,
+        "source_mtime": stat.st_mtime,
+        "rows": rows,
+        "columns": [{"name": name, "file": f"col_{i}.bin"} for i, name in enumerate(columns or [])],
+    }
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
@@ -1,29 +1,34 @@
+import os
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox
+from tkinter import ttk, filedialog, messagebox, simpledialog
 import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import numpy as np
 
+import src_path  # noqa: F401  (crack meter modules in src/)
 
-def Scale_current(current) -> float:
-    """Scale current to mA using linear polynomial approximation"""
-    if current is None:
-        return None
-    elif current < 150:
-        return 0
-    elif current > 2000:
-        return (147.48 + 0.0118 * current)
-    else:
-        return (101.97 + 0.0283 * current)  # values between 150 and 2000
+from plot_controller import PlotController
+from column_store import ColumnStore, detect_separator
+from streaming_stats import histogram_edges, iter_array_chunks, stats_from_chunks
+from multi_file import load_files
+from row_index import RowIndex
+from table_view import TableModel, VirtualTable
+from tile_pyramid import PYRAMID_SERIES, TilePyramid
+from crack_meter import (CRACK_METER_COLUMNS, CRACK_METER_NAMES, CRACK_METER_SCALING,
+                         is_numeric_column, read_crack_meter_csv, scale_crack_meter_frame)
 
+# Maximum number of points drawn from an out-of-core file
+MAX_PLOT_POINTS = 200_000
 
-def Scale_voltage(voltage) -> float:
-    """Scale voltage to mV"""
-    if voltage is None:
-        return None
-    else:
-        return (((2.048/(65535/2))*1000) * voltage)  # AD1114 was used with 2.048V range
+# Threads used to reduce column chunks into statistics
+STATS_WORKERS = os.cpu_count() or 1
+
+# X axis choice for plotting a column against the sample number (time plot)
+SAMPLE_AXIS = "Sample #"
+
+# Points (pyramid tiles or raw samples) drawn for the visible sample range
+ENVELOPE_POINTS = 2000
 
 
 class CSVVisualizerApp:
@@ -36,6 +41,17 @@ class CSVVisualizerApp:
         self.df = None
         self.df_original = None  # Store original data
         self.current_file = None
+        self.store = None  # Memory-mapped columns in out-of-core mode
+        self.store_columns = {}  # Display name -> (store column, transform)
+        self.multi = None  # Several files loaded for comparison
+        self.multi_original = None
+        self.stats_cache = {}  # Column -> StreamingStats, reused across plots
+        self.hist_cache = {}  # (column, bins) -> (counts, edges)
+        self.pyramid = None  # Min/max/mean tiles of the loaded file, built on first use
+        self.pyramid_source = None  # CSV file the pyramid is built from (whole files only)
+        self.sample_plot = None  # Column shown against SAMPLE_AXIS, refetched on zoom
+        self._sample_range = None  # Sample range last drawn in the sample plot
+        self._zoom_pending = False
         
         # Create the main interface
         self.create_widgets()
@@ -62,6 +78,23 @@ class CSVVisualizerApp:
         self.file_label = ttk.Label(file_frame, text="No file selected")
         self.file_label.grid(row=0, column=1, sticky=(tk.W, tk.E))
         
+        # Out-of-core mode keeps large files on disk as memory-mapped columns
+        self.out_of_core_var = tk.BooleanVar()
+        ttk.Checkbutton(file_frame, text="Out-of-core mode (large files)",
+                        variable=self.out_of_core_var).grid(row=0, column=2, padx=(5, 0))
+        
+        # Several files are loaded in parallel and plotted as overlaid series
+        ttk.Button(file_frame, text="Compare Files",
+                  command=self.load_multiple_files).grid(row=0, column=3, padx=(5, 0))
+        
+        # A row range of a large file is read through its sparse row index
+        ttk.Button(file_frame, text="Load Row Range",
+                  command=self.load_row_range).grid(row=0, column=4, padx=(5, 0))
+        
+        # Raw rows in a virtualized table (only the visible rows are rendered)
+        ttk.Button(file_frame, text="Show Table",
+                  command=self.show_table).grid(row=0, column=5, padx=(5, 0))
+        
         # Data info section
         info_frame = ttk.LabelFrame(main_frame, text="Data Information", padding="5")
         info_frame.grid(row=1, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
@@ -120,6 +153,11 @@ class CSVVisualizerApp:
         self.canvas = FigureCanvasTkAgg(self.fig, self.plot_frame)
         self.canvas.get_tk_widget().grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         
+        # Plot artists are kept and updated in place between plots; the
+        # controller also keeps the zoom callback of sample plots registered
+        self.plotter = PlotController(self.fig, self.ax, self.canvas,
+                                      on_xlim_changed=self.on_xlim_changed)
+        
         # Add toolbar for plot interaction
         toolbar_frame = ttk.Frame(self.plot_frame)
         toolbar_frame.grid(row=1, column=0, sticky=(tk.W, tk.E))
@@ -130,39 +168,101 @@ class CSVVisualizerApp:
         
     def on_scaling_change(self):
         """Handle scaling checkbox change"""
-        if self.df_original is not None:
+        if self.df_original is not None or self.store is not None or self.multi_original is not None:
             self.apply_data_processing()
             self.update_data_info()
             self.update_column_dropdowns()
             
     def apply_data_processing(self):
         """Apply scaling and column renaming based on checkbox state"""
+        self.stats_cache.clear()
+        self.hist_cache.clear()
+        if self.store is not None:
+            self.apply_store_processing()
+            return
+        if self.multi_original is not None:
+            # Scaling is applied once per shared frame, not per file
+            self.multi = self.multi_original
+            if self.scale_data_var.get() and all(col in self.multi.columns for col in CRACK_METER_COLUMNS):
+                self.multi = self.multi_original.map_frames(
+                    lambda frame: scale_crack_meter_frame(frame, np.float32))
+            return
         if self.df_original is None:
             return
             
         # Start with original data
-        self.df = self.df_original.copy()
+        self.df = self.df_original
         
         if self.scale_data_var.get():
             # Check if this looks like crack meter data
-            expected_cols = ['Frequency', 'CurrentSet', 'Current', 'Voltage Drop', 'Crack size']
-            if all(col in self.df.columns for col in expected_cols):
-                # Apply scaling functions
-                self.df["CurrentSet"] = self.df["CurrentSet"].apply(Scale_current)
-                self.df["Current"] = self.df["Current"].apply(Scale_current)
-                self.df["Voltage Drop"] = self.df["Voltage Drop"].apply(Scale_voltage)
-                
-                # Rename columns for easier access
-                self.df.rename(
-                    columns={
-                        "Frequency": "Frequency [kHz]",
-                        "CurrentSet": "Set current [mA]",
-                        "Current": "Real current [mA]",
-                        "Voltage Drop": "RSM voltage drop [mV]",
-                        "Crack size": "Crack size [mm]",
-                    },
-                    inplace=True,
-                )
+            if all(col in self.df.columns for col in CRACK_METER_COLUMNS):
+                # Apply scaling and rename columns for easier access
+                self.df = scale_crack_meter_frame(self.df, np.float32)
+        
+    def apply_store_processing(self):
+        """Out-of-core counterpart of apply_data_processing: scaling is applied per chunk"""
+        self.store_columns = {name: (name, None) for name in self.store.columns}
+        if self.scale_data_var.get() and all(col in self.store.columns for col in CRACK_METER_COLUMNS):
+            self.store_columns = {
+                CRACK_METER_NAMES.get(name, name): (name, CRACK_METER_SCALING.get(name))
+                for name in self.store.columns
+            }
+            
+    def get_columns(self):
+        """Column names of the loaded data (in-memory or out-of-core)"""
+        if self.store is not None:
+            return list(self.store_columns)
+        if self.multi is not None:
+            return self.multi.columns
+        if self.df is not None:
+            return self.df.columns.tolist()
+        return []
+        
+    def get_plot_data(self, columns):
+        """Data for plotting; out-of-core files are decimated to MAX_PLOT_POINTS rows"""
+        columns = list(dict.fromkeys(columns))  # unique, order preserved
+        if self.store is None:
+            return self.df[columns]
+        sources = [self.store_columns[c][0] for c in columns]
+        transforms = {self.store_columns[c][0]: self.store_columns[c][1] for c in columns}
+        data = self.store.sample(sources, MAX_PLOT_POINTS, transforms)
+        return pd.DataFrame({c: data[src].to_numpy() for c, src in zip(columns, sources)})
+        
+    def get_column_stats(self, column):
+        """Streaming statistics of one column, computed once and cached"""
+        if column not in self.stats_cache:
+            if self.store is not None:
+                source, transform = self.store_columns[column]
+                stats = self.store.column_stats(source, transform, workers=STATS_WORKERS)
+            elif self.multi is not None:
+                chunks = (f[column].to_numpy(dtype=float) for f in self.multi.frames)
+                stats = stats_from_chunks(chunks, workers=STATS_WORKERS)
+            else:
+                values = self.df[column].to_numpy(dtype=float)
+                stats = stats_from_chunks(iter_array_chunks(values), workers=STATS_WORKERS)
+            self.stats_cache[column] = stats
+        return self.stats_cache[column]
+        
+    def get_histogram(self, column, bins=30):
+        """Histogram counts and bin edges of one column, cached per bin count"""
+        key = (column, bins)
+        if key not in self.hist_cache:
+            edges = histogram_edges(self.get_column_stats(column), bins)
+            if self.store is not None:
+                source, transform = self.store_columns[column]
+                stats = self.store.column_stats(source, transform, edges=edges, workers=STATS_WORKERS)
+            elif self.multi is not None:
+                chunks = (f[column].to_numpy(dtype=float) for f in self.multi.frames)
+                stats = stats_from_chunks(chunks, edges=edges, workers=STATS_WORKERS)
+            else:
+                values = self.df[column].to_numpy(dtype=float)
+                stats = stats_from_chunks(iter_array_chunks(values), edges=edges, workers=STATS_WORKERS)
+            self.hist_cache[key] = stats.histogram()
+        return self.hist_cache[key]
+        
+    def describe_columns(self, columns):
+        """describe()-like table built from the cached streaming statistics"""
+        return pd.DataFrame({c: self.get_column_stats(c).describe() for c in columns})
         
     def load_csv_file(self):
         """Open file dialog and load CSV file"""
@@ -173,25 +273,27 @@ class CSVVisualizerApp:
         
         if file_path:
             try:
-                # Load CSV file - try different separators
-                try:
-                    self.df_original = pd.read_csv(file_path, sep=';')
-                except:
-                    # Try with comma separator
-                    self.df_original = pd.read_csv(file_path)
-                    
                 self.current_file = file_path
+                filename = file_path.split('/')[-1]
+                
+                self.multi = self.multi_original = None
+                self.pyramid, self.pyramid_source = None, file_path
+                if self.out_of_core_var.get():
+                    self.load_out_of_core(file_path, filename)
+                    return
+                self.store = None
+                
+                # Load CSV file; crack meter captures use the compact dtype schema
+                self.df_original = read_crack_meter_csv(file_path, sep=detect_separator(file_path))
                 
                 # Check if this looks like crack meter data and enable scaling by default
-                expected_cols = ['Frequency', 'CurrentSet', 'Current', 'Voltage Drop', 'Crack size']
-                if all(col in self.df_original.columns for col in expected_cols):
+                if all(col in self.df_original.columns for col in CRACK_METER_COLUMNS):
                     self.scale_data_var.set(True)
                 
                 # Apply data processing based on checkbox state
                 self.apply_data_processing()
                 
                 # Update file label
-                filename = file_path.split('/')[-1]
                 self.file_label.config(text=f"Loaded: {filename}")
                 
                 # Update data information
@@ -205,9 +307,145 @@ class CSVVisualizerApp:
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to load CSV file:\n{str(e)}")
                 
+    def load_multiple_files(self):
+        """Select several CSV files and load them in parallel for comparison"""
+        file_paths = filedialog.askopenfilenames(
+            title="Select CSV Files to Compare",
+            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+        )
+        
+        if file_paths:
+            try:
+                self.multi_original = load_files(file_paths)
+                self.df_original = self.df = self.store = None
+                self.pyramid = self.pyramid_source = None
+                self.current_file = file_paths[0]
+                
+                if not self.multi_original.columns:
+                    raise ValueError("The selected files have no common columns")
+                if all(col in self.multi_original.columns for col in CRACK_METER_COLUMNS):
+                    self.scale_data_var.set(True)
+                self.apply_data_processing()
+                
+                self.file_label.config(text=f"Comparing {len(file_paths)} files")
+                self.update_data_info()
+                self.update_column_dropdowns()
+                
+                messagebox.showinfo("Success", f"Successfully loaded {len(self.multi)} rows from {len(file_paths)} files!")
+                
+            except Exception as e:
+                self.multi = self.multi_original = None
+                messagebox.showerror("Error", f"Failed to load CSV files:\n{str(e)}")
+                
+    def load_row_range(self):
+        """Load only a range of rows of a large CSV file, seeking via its row index"""
+        file_path = filedialog.askopenfilename(
+            title="Select CSV File",
+            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+        )
+        if not file_path:
+            return
+        try:
+            # Built once (sidecar file), then only extended when the file grows
+            index = RowIndex.open(file_path)
+            start = simpledialog.askinteger(
+                "Row Range", f"First row (0 - {len(index) - 1}):",
+                parent=self.root, minvalue=0, maxvalue=max(0, len(index) - 1))
+            if start is None:
+                return
+            count = simpledialog.askinteger(
+                "Row Range", "Number of rows:", parent=self.root,
+                initialvalue=min(100_000, len(index) - start), minvalue=1)
+            if count is None:
+                return
+            
+            self.current_file = file_path
+            filename = file_path.split('/')[-1]
+            self.multi = self.multi_original = self.store = None
+            self.pyramid = self.pyramid_source = None  # the pyramid covers whole files
+            self.df_original = index.read_rows(start, start + count)
+            
+            if all(col in self.df_original.columns for col in CRACK_METER_COLUMNS):
+                self.scale_data_var.set(True)
+            self.apply_data_processing()
+            
+            end = start + len(self.df_original) - 1
+            self.file_label.config(text=f"Loaded: {filename} (rows {start}-{end} of {len(index)})")
+            self.update_data_info()
+            self.update_column_dropdowns()
+            
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to load row range:\n{str(e)}")
+                
+    def show_table(self):
+        """Open the loaded data in a virtualized table window"""
+        if self.store is not None:
+            model = TableModel(store=self.store, store_columns=self.store_columns)
+        elif self.multi is not None:
+            # Rows of the first schema group (all files sharing the first file's columns)
+            model = TableModel(frame=self.multi.frames[0])
+        elif self.df is not None:
+            model = TableModel(frame=self.df)
+        else:
+            messagebox.showwarning("Warning", "Please load a CSV file first!")
+            return
+        
+        window = tk.Toplevel(self.root)
+        title = os.path.basename(self.current_file) if self.current_file else "Data"
+        window.title(f"Table: {title}")
+        window.geometry("900x700")
+        window.columnconfigure(0, weight=1)
+        window.rowconfigure(0, weight=1)
+        VirtualTable(window, model).grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), padx=5, pady=5)
+                
+    def load_out_of_core(self, file_path, filename):
+        """Open a CSV file as memory-mapped columns (converted on first use)"""
+        self.df_original = None
+        self.df = None
+        self.store = ColumnStore.from_csv(file_path)
+        
+        if all(col in self.store.columns for col in CRACK_METER_COLUMNS):
+            self.scale_data_var.set(True)
+        self.apply_data_processing()
+        
+        self.file_label.config(text=f"Loaded (out-of-core): {filename}")
+        self.update_data_info()
+        self.update_column_dropdowns()
+        
+        messagebox.showinfo("Success", f"Opened {len(self.store)} rows of data out-of-core!")
+                
     def update_data_info(self):
         """Update the data information text widget"""
-        if self.df is not None:
+        if self.multi is not None:
+            columns = self.get_columns()
+            info = []
+            info.append(f"Files: {len(self.multi.names)} ({len(self.multi.frames)} distinct schemas)")
+            for name in self.multi.names:
+                info.append(f"  {name}: {len(self.multi.frame(name))} rows")
+            info.append(f"Common columns: {', '.join(columns)}")
+            
+            numeric_cols = [c for c in columns
+                            if all(is_numeric_column(f[c]) for f in self.multi.frames)]
+            if numeric_cols:
+                info.append(f"\nNumeric columns statistics (all files):")
+                info.append(self.describe_columns(numeric_cols).to_string())
+                
+            self.info_text.delete(1.0, tk.END)
+            self.info_text.insert(1.0, "\n".join(info))
+        elif self.store is not None:
+            columns = self.get_columns()
+            info = []
+            info.append(f"Rows: {len(self.store)} (out-of-core)")
+            info.append(f"Columns: {len(columns)}")
+            info.append(f"Column names: {', '.join(columns)}")
+            
+            # Statistics are computed chunk by chunk from the memory-mapped columns
+            info.append(f"\nNumeric columns statistics:")
+            info.append(self.describe_columns(columns).to_string())
+            
+            self.info_text.delete(1.0, tk.END)
+            self.info_text.insert(1.0, "\n".join(info))
+        elif self.df is not None:
             info = []
             info.append(f"Rows: {len(self.df)}")
             info.append(f"Columns: {len(self.df.columns)}")
@@ -215,21 +453,22 @@ class CSVVisualizerApp:
             info.append(f"Data types:\n{self.df.dtypes.to_string()}")
             
             # Add basic statistics for numeric columns
-            numeric_cols = self.df.select_dtypes(include=[np.number]).columns
+            numeric_cols = [c for c in self.df.columns if is_numeric_column(self.df[c])]
             if len(numeric_cols) > 0:
                 info.append(f"\nNumeric columns statistics:")
-                info.append(self.df[numeric_cols].describe().to_string())
+                info.append(self.describe_columns(numeric_cols).to_string())
                 
             self.info_text.delete(1.0, tk.END)
             self.info_text.insert(1.0, "\n".join(info))
             
     def update_column_dropdowns(self):
         """Update the column selection dropdowns"""
-        if self.df is not None:
-            columns = self.df.columns.tolist()
+        columns = self.get_columns()
+        if columns:
             
-            # Update x, y, and z axis dropdowns
-            self.x_var['values'] = columns
+            # Update x, y, and z axis dropdowns; single files can also be
+            # plotted against the sample number
+            self.x_var['values'] = columns if self.multi is not None else columns + [SAMPLE_AXIS]
             self.y_var['values'] = columns
             self.z_var['values'] = ['None'] + columns  # Add 'None' option for z-axis
             
@@ -252,7 +491,7 @@ class CSVVisualizerApp:
                 
     def generate_plot(self):
         """Generate plot based on selected options"""
-        if self.df is None:
+        if self.df is None and self.store is None and self.multi is None:
             messagebox.showwarning("Warning", "Please load a CSV file first!")
             return
             
@@ -266,62 +505,142 @@ class CSVVisualizerApp:
             return
             
         try:
-            # Clear previous plot
-            self.ax.clear()
+            self.sample_plot = None
+            # Create appropriate title
+            if plot_type == "Colored Scatter" and z_col and z_col != 'None':
+                title = f'{plot_type}: {y_col} vs {x_col} (colored by {z_col})'
+            else:
+                title = f'{plot_type}: {y_col} vs {x_col}'
+            
+            if self.multi is not None:
+                self.generate_multi_plot(x_col, y_col, plot_type, title)
+                return
             
-            # Generate plot based on type
+            # Histograms are binned from the full column, other plots use the
+            # (possibly decimated) plot data
+            if plot_type == "Histogram":
+                counts, edges = self.get_histogram(y_col)
+                self.plotter.plot_histogram(counts, edges, y_col)
+                return
+            
+            if x_col == SAMPLE_AXIS:
+                self.generate_sample_plot(y_col, f'{y_col} over samples')
+                return
+            
+            columns = [x_col, y_col]
+            if plot_type == "Colored Scatter" and z_col and z_col != 'None':
+                columns.append(z_col)
+            df = self.get_plot_data(columns)
+            
+            # Update the existing artists based on type
             if plot_type == "Line":
-                self.ax.plot(self.df[x_col], self.df[y_col], marker='o', linewidth=1, markersize=3)
+                self.plotter.plot_line(df[x_col], df[y_col], x_col, y_col, title)
             elif plot_type == "Scatter":
-                self.ax.scatter(self.df[x_col], self.df[y_col], alpha=0.7)
+                self.plotter.plot_scatter(df[x_col], df[y_col], x_col, y_col, title)
             elif plot_type == "Colored Scatter":
                 if z_col and z_col != 'None':
-                    # Create colored scatter plot
-                    scatter = self.ax.scatter(self.df[x_col], self.df[y_col], 
-                                            c=self.df[z_col], cmap='Spectral', 
-                                            alpha=0.7, s=20)
-                    # Add colorbar
-                    cbar = plt.colorbar(scatter, ax=self.ax)
-                    cbar.set_label(z_col)
+                    # Colored scatter plot; the colorbar is reused between plots
+                    self.plotter.plot_scatter(df[x_col], df[y_col], x_col, y_col, title,
+                                              c=df[z_col], c_label=z_col)
                 else:
                     # Fallback to regular scatter if no z-column selected
-                    self.ax.scatter(self.df[x_col], self.df[y_col], alpha=0.7)
+                    self.plotter.plot_scatter(df[x_col], df[y_col], x_col, y_col, title)
                     messagebox.showinfo("Info", "No color column selected. Showing regular scatter plot.")
             elif plot_type == "Bar":
                 # For bar plots, we'll aggregate data if there are too many unique values
-                if self.df[x_col].nunique() > 50:
+                if df[x_col].nunique() > 50:
                     messagebox.showwarning("Warning", 
                                          "Too many unique X values for bar plot. Consider using scatter or line plot.")
                     return
-                self.ax.bar(self.df[x_col], self.df[y_col])
-            elif plot_type == "Histogram":
-                # For histogram, we'll plot the distribution of the selected column
-                self.ax.hist(self.df[y_col], bins=30, alpha=0.7, edgecolor='black')
-                self.ax.set_xlabel(y_col)
-                self.ax.set_ylabel('Frequency')
-                self.ax.set_title(f'Histogram of {y_col}')
-                self.canvas.draw()
-                return
-                
-            # Set labels and title
-            self.ax.set_xlabel(x_col)
-            self.ax.set_ylabel(y_col)
-            
-            # Create appropriate title
-            if plot_type == "Colored Scatter" and z_col and z_col != 'None':
-                title = f'{plot_type}: {y_col} vs {x_col} (colored by {z_col})'
-            else:
-                title = f'{plot_type}: {y_col} vs {x_col}'
-            
-            self.ax.set_title(title)
-            self.ax.grid(True, alpha=0.3)
-            
-            # Update canvas
-            self.canvas.draw()
+                self.plotter.plot_bar(df[x_col], df[y_col], x_col, y_col, title)
             
         except Exception as e:
             messagebox.showerror("Error", f"Failed to generate plot:\n{str(e)}")
 
+    def generate_sample_plot(self, y_col, title):
+        """Time plot of a column: min/max band and mean, re-read at the right level on zoom"""
+        self.sample_plot = y_col
+        self._sample_range = (0, self.row_count())
+        x, mean, low, high = self.get_sample_envelope(y_col, *self._sample_range)
+        self.plotter.plot_envelope(x, mean, low, high, SAMPLE_AXIS, y_col, title)
+
+    def row_count(self):
+        return len(self.store) if self.store is not None else len(self.df)
+
+    def get_pyramid(self, column):
+        """Tile pyramid holding column (built on first use), or None"""
+        if column not in PYRAMID_SERIES or self.pyramid_source is None:
+            return None
+        if self.pyramid is None:
+            try:
+                self.pyramid = TilePyramid.from_csv(self.pyramid_source)
+            except (OSError, ValueError):
+                self.pyramid_source = None  # not a crack meter capture, don't retry
+                return None
+        if column not in self.pyramid.series or self.pyramid.samples(column) != self.row_count():
+            return None
+        return self.pyramid
+
+    def get_sample_envelope(self, column, start, stop):
+        """
+        (x, mean, min, max) of samples start..stop-1, at most about
+        ENVELOPE_POINTS of them: pyramid tiles for long ranges of the
+        calibrated series, otherwise (strided) raw samples.
+        """
+        start, stop = max(0, start), min(stop, self.row_count())
+        pyramid = self.get_pyramid(column)
+        if pyramid is not None:
+            level, tiles = pyramid.query(column, start, stop, ENVELOPE_POINTS)
+            if tiles is not None:
+                x = tiles["sample"].to_numpy() + (pyramid.tile_size(level) - 1) / 2  # tile centers
+                return x, tiles["mean"].to_numpy(), tiles["min"].to_numpy(), tiles["max"].to_numpy()
+        
+        step = max(1, -(-(stop - start) // ENVELOPE_POINTS))  # ceil division
+        if self.store is not None:
+            name, transform = self.store_columns[column]
+            values = np.asarray(self.store.column(name)[start:stop:step])
+            values = transform(values) if transform is not None else values
+        else:
+            values = self.df[column].iloc[start:stop:step].to_numpy(dtype=np.float64)
+        x = np.arange(start, stop, step)[:len(values)]
+        return x, values, values, values
+
+    def on_xlim_changed(self, ax):
+        """Zoom or pan of a sample plot: refetch the visible range once the event settles"""
+        if self.sample_plot is not None and not self._zoom_pending:
+            self._zoom_pending = True
+            self.root.after_idle(self.update_sample_zoom)
+
+    def update_sample_zoom(self):
+        self._zoom_pending = False
+        if self.sample_plot is None:
+            return
+        x0, x1 = self.ax.get_xlim()
+        visible = (max(0, int(np.floor(x0))), min(self.row_count(), int(np.ceil(x1)) + 1))
+        if visible == self._sample_range:
+            return
+        self._sample_range = visible
+        x, mean, low, high = self.get_sample_envelope(self.sample_plot, *visible)
+        self.plotter.set_envelope(x, mean, low, high, redraw=True)
+
+    def generate_multi_plot(self, x_col, y_col, plot_type, title):
+        """Overlay one series per loaded file"""
+        if plot_type == "Line":
+            # Lines are aligned on the X column (averaging repeated X values),
+            # then decimated with one step for all files
+            aligned = self.multi.aligned(y_col, index_column=x_col, max_points=MAX_PLOT_POINTS,
+                                         duplicates="mean")
+            series = [(name, aligned.index.to_numpy(), aligned[name].to_numpy())
+                      for name in aligned.columns]
+            self.plotter.plot_overlay(series, x_col, y_col, title)
+        elif plot_type in ("Scatter", "Colored Scatter"):
+            # Every file keeps its own rows, strided with a shared step
+            series = [(name, frame[x_col].to_numpy(), frame[y_col].to_numpy())
+                      for name, frame in self.multi.decimated([x_col, y_col], MAX_PLOT_POINTS)]
+            self.plotter.plot_overlay(series, x_col, y_col, title, markers_only=True)
+        else:
+            messagebox.showinfo("Info", "Comparing files supports Line and Scatter plots only.")
+
 
 def main():
     root = tk.Tk()
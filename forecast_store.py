@@ -0,0 +1,232 @@
+# forecast_store.py
+# Append-only SQLite store of hourly forecasts, replacing the timestamped
+# weather_data_forecast_for_{city}_{timestamp}.csv snapshots
+#
+# Every value is keyed by (location, variable, valid time, issue time) and a
+# new forecast only writes the hours whose value changed since the previous
+# issue, so the store grows with the changes and not with the number of runs.
+#
+# Usage: python forecast_store.py import weather_data_forecast_for_Prague_*.csv
+#        python forecast_store.py latest Prague [--as-of "2025-10-18 18:30"]
+
+import argparse
+import os
+import re
+import sqlite3
+
+import numpy as np
+import pandas as pd
+from dateutil import tz
+
+FORECAST_STORE_PATH = "forecast_store.sqlite"
+
+# Snapshot file names written by the old save_dataframe_to_csv
+SNAPSHOT_PATTERN = re.compile(r"weather_data(?:_forecast)?_for_(?P<city>.+)_(?P<stamp>\d{8}_\d{6})\.csv$")
+
+
+def _seconds(times) -> np.ndarray:
+    """Timestamps (index, array or scalar) as int64 epoch seconds; naive times are taken as is."""
+    times = pd.DatetimeIndex(np.atleast_1d(pd.to_datetime(times)))
+    if times.tz is not None:
+        times = times.tz_convert("UTC").tz_localize(None)
+    return times.as_unit("s").asi8
+
+
+class ForecastStore:
+    """
+    Forecast values keyed by location, variable, valid time and issue time.
+
+    Valid times are stored as given by create_weather_dataframe (local time of
+    the location), issue times in UTC. Both are epoch seconds.
+    """
+
+    def __init__(self, path: str = FORECAST_STORE_PATH):
+        self.path = path
+        with self._connect() as conn:
+            # WITHOUT ROWID keeps the rows clustered on the primary key, so
+            # "latest issue per valid time" is a range scan of one index
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS forecasts ("
+                "location TEXT NOT NULL, variable TEXT NOT NULL, "
+                "valid_time INTEGER NOT NULL, issue_time INTEGER NOT NULL, value REAL, "
+                "PRIMARY KEY (location, variable, valid_time, issue_time)) WITHOUT ROWID"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS issues ("
+                "location TEXT NOT NULL, issue_time INTEGER NOT NULL, "
+                "rows_received INTEGER NOT NULL, rows_written INTEGER NOT NULL, "
+                "PRIMARY KEY (location, issue_time))"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def _latest(self, conn, location: str, variable: str, as_of: int, start: int = None, end: int = None):
+        """(valid_time, value, issue_time) rows of the latest issue per valid time."""
+        # SQLite returns the other columns from the row that holds MAX(issue_time)
+        query = (
+            "SELECT valid_time, value, MAX(issue_time) FROM forecasts "
+            "WHERE location = ? AND variable = ? AND issue_time <= ?"
+        )
+        params = [location, variable, as_of]
+        if start is not None:
+            query += " AND valid_time >= ?"
+            params.append(start)
+        if end is not None:
+            query += " AND valid_time <= ?"
+            params.append(end)
+        return conn.execute(query + " GROUP BY valid_time ORDER BY valid_time", params).fetchall()
+
+    def append(self, df: pd.DataFrame, location: str, issue_time=None) -> int:
+        """
+        Add one forecast issue, writing only the hours that changed.
+
+        Args:
+            df (pandas.DataFrame): forecast with a time index and one column per variable
+            location (str): location key (e.g. the city name)
+            issue_time: when the forecast was issued (default: now, UTC)
+
+        Returns:
+            int: number of rows written
+        """
+        issue = int(_seconds(issue_time if issue_time is not None else pd.Timestamp.now(tz="UTC"))[0])
+        valid = _seconds(df.index)
+        if len(valid) == 0:
+            return 0
+
+        written = 0
+        with self._connect() as conn:
+            for variable in df.columns:
+                values = df[variable].to_numpy(dtype=np.float64)
+                previous = pd.Series(np.nan, index=valid)
+                known = np.zeros(len(valid), dtype=bool)
+                rows = self._latest(conn, location, variable, issue, int(valid.min()), int(valid.max()))
+                if rows:
+                    times, stored, _ = zip(*rows)
+                    positions = previous.index.get_indexer(times)
+                    found = positions >= 0
+                    previous.iloc[positions[found]] = np.array(stored, dtype=np.float64)[found]
+                    known[positions[found]] = True
+
+                # Unchanged hours (including NaN == NaN) are not written again
+                old = previous.to_numpy()
+                unchanged = known & ((old == values) | (np.isnan(old) & np.isnan(values)))
+                changed = ~unchanged
+                conn.executemany(
+                    "INSERT OR REPLACE INTO forecasts VALUES (?, ?, ?, ?, ?)",
+                    (
+                        (location, variable, int(t), issue, None if np.isnan(v) else float(v))
+                        for t, v in zip(valid[changed], values[changed])
+                    ),
+                )
+                written += int(changed.sum())
+
+            conn.execute(
+                "INSERT OR REPLACE INTO issues VALUES (?, ?, ?, ?)",
+                (location, issue, int(df.size), written),
+            )
+        return written
+
+    def latest(self, location: str, variables=None, as_of=None, start=None, end=None) -> pd.DataFrame:
+        """
+        Latest forecast known at as_of (default: now) for every valid time.
+
+        Args:
+            location (str): location key
+            variables (list): variables to return (default: all stored for the location)
+            as_of: only issues up to this time are used (naive times are UTC)
+            start, end: optional valid time range (inclusive)
+
+        Returns:
+            pandas.DataFrame: time index and one column per variable
+        """
+        as_of = int(_seconds(as_of if as_of is not None else pd.Timestamp.now(tz="UTC"))[0])
+        start = int(_seconds(start)[0]) if start is not None else None
+        end = int(_seconds(end)[0]) if end is not None else None
+        variables = variables or self.variables(location)
+
+        columns = {}
+        with self._connect() as conn:
+            for variable in variables:
+                rows = self._latest(conn, location, variable, as_of, start, end)
+                times = [row[0] for row in rows]
+                values = np.array([row[1] for row in rows], dtype=np.float64)
+                columns[variable] = pd.Series(values, index=pd.to_datetime(times, unit="s"))
+
+        df = pd.DataFrame(columns)
+        df.index.name = "time"
+        return df
+
+    def variables(self, location: str) -> list:
+        """Variables stored for a location."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT DISTINCT variable FROM forecasts WHERE location = ?", (location,)
+            ).fetchall()
+        return sorted(row[0] for row in rows)
+
+    def issues(self, location: str) -> pd.DataFrame:
+        """Issue times of a location with the number of rows received and written."""
+        with self._connect() as conn:
+            df = pd.read_sql_query(
+                "SELECT issue_time, rows_received, rows_written FROM issues "
+                "WHERE location = ? ORDER BY issue_time",
+                conn,
+                params=(location,),
+            )
+        df["issue_time"] = pd.to_datetime(df["issue_time"], unit="s")
+        return df.set_index("issue_time")
+
+
+def import_csv_snapshots(paths, store: ForecastStore = None) -> dict:
+    """
+    Import old timestamped CSV snapshots, oldest first.
+
+    The location and issue time come from the file name
+    (weather_data_forecast_for_{city}_{YYYYmmdd_HHMMSS}.csv, local time).
+
+    Returns:
+        dict: file name -> rows written
+    """
+    store = store or ForecastStore()
+    snapshots = []
+    for path in paths:
+        match = SNAPSHOT_PATTERN.search(os.path.basename(path))
+        if match is None:
+            print(f"Skipping {path}: not a forecast snapshot file name")
+            continue
+        # The stamp is the local time of the run (datetime.now() in Homework-2)
+        issue_time = pd.to_datetime(match["stamp"], format="%Y%m%d_%H%M%S")
+        issue_time = issue_time.tz_localize(tz.tzlocal()).tz_convert("UTC")
+        snapshots.append((issue_time, match["city"], path))
+
+    written = {}
+    for issue_time, city, path in sorted(snapshots):
+        df = pd.read_csv(path, index_col="time", parse_dates=["time"])
+        written[os.path.basename(path)] = store.append(df, city, issue_time)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental forecast store")
+    parser.add_argument("--db", default=FORECAST_STORE_PATH, help="store file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import", help="import timestamped CSV snapshots")
+    import_parser.add_argument("paths", nargs="+")
+    latest_parser = commands.add_parser("latest", help="print the latest forecast of a location")
+    latest_parser.add_argument("location")
+    latest_parser.add_argument("--as-of", help="issue time limit (UTC), default now")
+    args = parser.parse_args()
+
+    store = ForecastStore(args.db)
+    if args.command == "import":
+        for name, rows in import_csv_snapshots(args.paths, store).items():
+            print(f"{name}: {rows} rows written")
+        print(f"Store size: {os.path.getsize(args.db)} bytes")
+    else:
+        print(store.issues(args.location))
+        print(store.latest(args.location, as_of=args.as_of))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+# http_cache.py
+# Managed requests cache for the weather scripts: per-endpoint expiry,
+# size limit with LRU eviction, background expiry sweeps / vacuuming and
+# hit/miss/latency statistics
+#
+# Usage: python http_cache.py          (print cache statistics)
+#        python http_cache.py --sweep  (purge expired entries, evict, vacuum)
+
+import argparse
+import atexit
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import requests_cache
+from requests_cache import DO_NOT_CACHE, EXPIRE_IMMEDIATELY
+
+CACHE_NAME = ".cache"  # -> .cache.sqlite
+MAX_CACHE_BYTES = 50 * 1024 * 1024  # stored response bodies, LRU evicted above this
+MAINTENANCE_INTERVAL = 3600  # seconds between background sweeps
+ACCESS_FLUSH_SIZE = 100  # cache hits recorded in memory before their last use is written
+REQUEST_TIMEOUT = 5  # seconds, used when a request does not set its own timeout
+
+# Expiry per endpoint (seconds or requests_cache constants); the most specific
+# pattern matching the URL wins, everything else uses the session default
+URL_EXPIRE_AFTER = {
+    "api.open-meteo.com": 3600,  # forecasts are recomputed hourly
+    "ip-api.com": 24 * 3600,  # geolocation of an IP rarely changes
+    "api.ipify.org": DO_NOT_CACHE,  # the public IP must always be current
+    "api.tomorrow.io": EXPIRE_IMMEDIATELY,  # stored, but revalidated (ETag) on every use
+}
+
+
+class ManagedCachedSession(requests_cache.CachedSession):
+    """
+    CachedSession with a size limit, LRU eviction and request statistics.
+
+    Last use and size of every cached response are tracked in an extra
+    table of the cache database, so the least recently used responses can
+    be evicted when the stored bodies exceed max_size. The stored size is
+    kept as a running total (read from the database once, and again after
+    every sweep), so a cache miss does not scan the whole cache. Cache hits
+    only note the time in memory; the times are written in batches
+    (flush_access) so a hit adds no write transaction.
+    """
+
+    def __init__(self, cache_name: str = CACHE_NAME, max_size: int = MAX_CACHE_BYTES,
+                 urls_expire_after: dict = None, timeout: float = REQUEST_TIMEOUT, **kwargs):
+        kwargs.setdefault("backend", "sqlite")
+        super().__init__(
+            cache_name,
+            urls_expire_after=URL_EXPIRE_AFTER if urls_expire_after is None else urls_expire_after,
+            **kwargs,
+        )
+        self.max_size = max_size
+        self.timeout = timeout
+        self._stats = defaultdict(lambda: {"hits": 0, "misses": 0, "revalidated": 0,
+                                           "errors": 0, "hit_time": 0.0, "miss_time": 0.0})
+        self._stats_lock = threading.Lock()
+        self._maintenance = None
+        self._stored = None  # running total of the stored bytes, None: read from the database
+        self._stored_lock = threading.Lock()
+        self._used = {}  # key -> last use of cache hits not written yet
+        self._used_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS access (key TEXT PRIMARY KEY, used_at REAL, size INTEGER)")
+            if "size" not in [row[1] for row in conn.execute("PRAGMA table_info(access)")]:
+                conn.execute("ALTER TABLE access ADD COLUMN size INTEGER")  # older cache files
+
+    @contextmanager
+    def _connect(self):
+        """Connection to the cache file, committed and closed on exit."""
+        conn = sqlite3.connect(self.cache.responses.db_path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def request(self, method, url, *args, **kwargs):
+        # Clients like openmeteo_requests send no timeout; a stalled server
+        # must not block the caller forever
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, *args, **kwargs)
+
+    def send(self, request, **kwargs):
+        host = urlparse(request.url).netloc
+        started = time.perf_counter()
+        try:
+            response = super().send(request, **kwargs)
+        except Exception:
+            with self._stats_lock:
+                self._stats[host]["errors"] += 1
+            raise
+        elapsed = time.perf_counter() - started
+
+        from_cache = getattr(response, "from_cache", False)
+        with self._stats_lock:
+            stats = self._stats[host]
+            if from_cache:
+                stats["hits"] += 1
+                stats["hit_time"] += elapsed
+                stats["revalidated"] += bool(getattr(response, "revalidated", False))
+            else:
+                stats["misses"] += 1
+                stats["miss_time"] += elapsed
+
+        key = getattr(response, "cache_key", None)
+        if key and from_cache:
+            with self._used_lock:
+                self._used[key] = time.time()
+                flush = len(self._used) >= ACCESS_FLUSH_SIZE
+            if flush:
+                self.flush_access()
+        elif key:
+            with self._used_lock:
+                self._used.pop(key, None)
+            with self._connect() as conn:
+                # Primary key lookups only: the new body and the size recorded for the old one
+                row = conn.execute("SELECT LENGTH(value) FROM responses WHERE key = ?", (key,)).fetchone()
+                old = conn.execute("SELECT size FROM access WHERE key = ?", (key,)).fetchone()
+                size = row[0] if row else 0
+                conn.execute("INSERT OR REPLACE INTO access (key, used_at, size) VALUES (?, ?, ?)",
+                             (key, time.time(), size))
+            self._update_stored(size, old)
+            if self.max_size and self.stored_size() > self.max_size:
+                self.evict()
+        return response
+
+    def flush_access(self):
+        """Write the last use of the cache hits recorded since the previous flush."""
+        with self._used_lock:
+            used, self._used = self._used, {}
+        if used:
+            with self._connect() as conn:
+                conn.executemany(
+                    "INSERT INTO access (key, used_at) VALUES (?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET used_at = MAX(COALESCE(used_at, 0), excluded.used_at)",
+                    used.items(),
+                )
+
+    def _update_stored(self, size: int, old):
+        """Account for a response of size bytes that replaced the one recorded in old (access row)."""
+        with self._stored_lock:
+            if self._stored is None:
+                return
+            if old is not None and old[0] is None:
+                self._stored = None  # size of the replaced body unknown: read the total again
+            else:
+                self._stored += size - (old[0] if old else 0)
+
+    def stored_size(self) -> int:
+        """Total size of the stored responses in bytes."""
+        with self._stored_lock:
+            if self._stored is None:
+                with self._connect() as conn:
+                    self._stored = conn.execute(
+                        "SELECT COALESCE(SUM(LENGTH(value)), 0) FROM responses"
+                    ).fetchone()[0]
+            return self._stored
+
+    def evict(self, max_size: int = None) -> int:
+        """Delete least recently used responses until the stored size fits max_size."""
+        max_size = max_size or self.max_size
+        excess = self.stored_size() - max_size
+        if excess <= 0:
+            return 0
+        self.flush_access()  # least recently used by the latest hits
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT r.key, LENGTH(r.value) FROM responses r "
+                "LEFT JOIN access a ON a.key = r.key ORDER BY COALESCE(a.used_at, 0)"
+            ).fetchall()
+        keys = []
+        freed = 0
+        for key, size in rows:
+            if excess <= 0:
+                break
+            keys.append(key)
+            excess -= size
+            freed += size
+        self._delete(keys)
+        with self._stored_lock:
+            if self._stored is not None:
+                self._stored -= freed
+        return len(keys)
+
+    def _delete(self, keys):
+        if not keys:
+            return
+        self.cache.delete(*keys, vacuum=False)
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM access WHERE key = ?", [(key,) for key in keys])
+
+    def sweep(self, vacuum: bool = True) -> dict:
+        """Purge expired responses, enforce the size limit and compact the file."""
+        before = self.cache.responses.size()
+        self.flush_access()
+        with self._connect() as conn:
+            expired = [row[0] for row in conn.execute(
+                "SELECT key FROM responses WHERE expires IS NOT NULL AND expires < ?",
+                (time.time(),),
+            )]
+        # Responses that are revalidated (ETag / Last-Modified) stay useful
+        # after they expire, so only the others are purged
+        expired = [key for key in expired if not self._revalidatable(key)]
+        self._delete(expired)
+        with self._stored_lock:
+            self._stored = None  # also picks up writes by other processes sharing the file
+        evicted = self.evict() if self.max_size else 0
+        with self._connect() as conn:
+            conn.execute("DELETE FROM access WHERE key NOT IN (SELECT key FROM responses)")
+        if vacuum:
+            self.cache.responses.vacuum()
+        return {"expired": len(expired), "evicted": evicted,
+                "file_before": before, "file_after": self.cache.responses.size()}
+
+    def _revalidatable(self, key: str) -> bool:
+        response = self.cache.responses.get(key)
+        return response is not None and (
+            "ETag" in response.headers or "Last-Modified" in response.headers
+        )
+
+    def start_maintenance(self, interval: float = MAINTENANCE_INTERVAL):
+        """Run sweep() now and then every interval seconds on a daemon thread."""
+        if self._maintenance is not None:
+            return
+
+        def run():
+            while True:
+                try:
+                    self.sweep()
+                except (sqlite3.Error, OSError) as e:
+                    print(f"Cache maintenance failed: {e}")
+                time.sleep(interval)
+
+        self._maintenance = threading.Thread(target=run, daemon=True)
+        self._maintenance.start()
+
+    def stats(self) -> dict:
+        """Hit/miss counts, hit rate and mean latency per host, plus cache size."""
+        with self._stats_lock:
+            hosts = {}
+            for host, s in self._stats.items():
+                requests = s["hits"] + s["misses"]
+                hosts[host] = {
+                    "hits": s["hits"],
+                    "misses": s["misses"],
+                    "revalidated": s["revalidated"],
+                    "errors": s["errors"],
+                    "hit_rate": s["hits"] / requests if requests else None,
+                    "hit_latency_ms": 1000 * s["hit_time"] / s["hits"] if s["hits"] else None,
+                    "miss_latency_ms": 1000 * s["miss_time"] / s["misses"] if s["misses"] else None,
+                }
+        return {
+            "entries": self.cache.responses.count(),
+            "stored_bytes": self.stored_size(),
+            "file_bytes": self.cache.responses.size(),
+            "max_bytes": self.max_size,
+            "hosts": hosts,
+        }
+
+
+_sessions = {}
+
+
+def get_session(**kwargs) -> ManagedCachedSession:
+    """
+    Shared managed session per set of options, with background maintenance.
+
+    All sessions use the same cache file (CACHE_NAME unless cache_name is
+    given) and per-endpoint expiry (URL_EXPIRE_AFTER).
+    """
+    key = tuple(sorted(kwargs.items()))
+    if key not in _sessions:
+        session = ManagedCachedSession(**kwargs)
+        session.start_maintenance()
+        atexit.register(session.flush_access)  # hits since the last flush
+        _sessions[key] = session
+    return _sessions[key]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Weather HTTP cache maintenance")
+    parser.add_argument("--cache", default=CACHE_NAME, help="cache name (without .sqlite)")
+    parser.add_argument("--sweep", action="store_true", help="purge, evict and vacuum now")
+    args = parser.parse_args()
+
+    session = ManagedCachedSession(args.cache)
+    if args.sweep:
+        print(session.sweep())
+    stats = session.stats()
+    print(f"Entries: {stats['entries']}, stored: {stats['stored_bytes']} bytes, "
+          f"file: {stats['file_bytes']} bytes (limit {stats['max_bytes']} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# location_cache.py
+# Persistent IP geolocation cache (SQLite), shared by the weather scripts
+# and the weather GUI, so ipify.org / ip-api.com are not queried on every run
+
+import json
+import sqlite3
+import threading
+import time
+from os import getenv
+
+LOCATION_CACHE_PATH = ".location_cache.sqlite"  # next to the requests cache (.cache.sqlite)
+LOCATION_TTL = 24 * 3600  # seconds, overridden by the LOCATION_CACHE_TTL variable
+
+
+class LocationCache:
+    """
+    Location lookups (ip-api.com JSON) keyed by public IP, with a TTL.
+
+    Every entry also records when it was last used, so the most recently used
+    entry serves as the last known location on the next start.
+    """
+
+    def __init__(self, path: str = LOCATION_CACHE_PATH, ttl: float = None):
+        self.path = path
+        self.ttl = ttl if ttl is not None else float(getenv("LOCATION_CACHE_TTL", LOCATION_TTL))
+        self.revalidation = None  # background revalidation thread, if one was started
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS locations ("
+                "ip TEXT PRIMARY KEY, data TEXT NOT NULL, "
+                "fetched_at REAL NOT NULL, used_at REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        # One short-lived connection per call, so the cache can be used from
+        # the background revalidation thread as well
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get(self, ip: str):
+        """Cached location for ip, or None if missing or older than the TTL."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT data, fetched_at FROM locations WHERE ip = ?", (ip,)
+            ).fetchone()
+            if row is None or time.time() - row[1] > self.ttl:
+                return None
+            conn.execute("UPDATE locations SET used_at = ? WHERE ip = ?", (time.time(), ip))
+        return json.loads(row[0])
+
+    def put(self, ip: str, location: dict):
+        """Store a successful location lookup for ip."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO locations (ip, data, fetched_at, used_at) VALUES (?, ?, ?, ?)",
+                (ip, json.dumps(location), now, now),
+            )
+
+    def last_known(self):
+        """(ip, location) of the most recently used entry regardless of age, or (None, None)."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT ip, data FROM locations ORDER BY used_at DESC LIMIT 1"
+            ).fetchone()
+        return (row[0], json.loads(row[1])) if row else (None, None)
+
+    def lookup(self, ip: str, get_location):
+        """Location for ip from the cache, or from get_location(ip, "json") on a miss."""
+        location = self.get(ip)
+        if location is not None:
+            return location
+        location_json = get_location(ip, "json")
+        location = json.loads(location_json) if location_json else {}
+        if location.get("status") == "success":
+            self.put(ip, location)
+        return location
+
+    def revalidate(self, get_ip, get_location):
+        """Check the current public IP and refresh its entry if missing or expired."""
+        try:
+            ip = get_ip()
+            return self.lookup(ip, get_location) if ip else None
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Location revalidation failed: {e}")
+            return None
+
+
+def get_cached_location(get_ip, get_location, cache: LocationCache = None, background: bool = True):
+    """
+    Get the location of this machine, using the cache where possible.
+
+    With a last known location in the cache it is returned right away, and
+    the public IP is checked on a background thread: if the IP changed (or
+    its entry expired) the new location is fetched and stored for the next
+    call. Only with an empty cache do the IP and location requests block.
+
+    Args:
+        get_ip: function returning the public IP address (or None)
+        get_location: function (ip, format) returning the ip-api.com response text
+        cache: LocationCache to use (default: LOCATION_CACHE_PATH with LOCATION_TTL)
+        background: revalidate on a daemon thread; False revalidates before returning
+
+    Returns:
+        dict: ip-api.com location data ("query" holds the IP), or {} on failure
+    """
+    cache = cache or LocationCache()
+    _, location = cache.last_known()
+    if location is None:
+        return cache.revalidate(get_ip, get_location) or {}
+
+    if background:
+        if cache.revalidation is not None and cache.revalidation.is_alive():
+            return location  # already being revalidated
+        cache.revalidation = threading.Thread(
+            target=cache.revalidate, args=(get_ip, get_location), daemon=True
+        )
+        cache.revalidation.start()
+        return location
+    return cache.revalidate(get_ip, get_location) or location
@@ -0,0 +1,149 @@
+"""
+Multi-file loading and comparison for the CSV visualizer.
+
+A selection of CSV files (e.g. several CalibData runs or the Prague
+forecast snapshots) is read in parallel on a process pool. Files that share
+a schema are concatenated into one frame, so they share a single block of
+memory per dtype and each file is a zero-copy row slice of it. Series can be
+aligned on a common column (such as ``time``) and decimated with one shared
+step, so overlaid curves stay comparable.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import src_path  # noqa: F401  (crack meter modules in src/)
+
+from column_store import detect_separator
+from crack_meter import read_crack_meter_csv
+
+
+def read_csv_file(path: str) -> pd.DataFrame:
+    """Read one CSV file with its detected separator (runs in a worker process)"""
+    # Crack meter captures are read with the compact dtype schema
+    return read_crack_meter_csv(path, sep=detect_separator(path))
+
+
+def load_files(paths, workers: int = None) -> "MultiFileSet":
+    """Load several CSV files in parallel and group them by schema"""
+    paths = list(paths)
+    workers = workers or min(len(paths), os.cpu_count() or 1)
+    if workers <= 1:
+        frames = [read_csv_file(path) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            frames = list(pool.map(read_csv_file, paths))
+    return MultiFileSet([os.path.basename(path) for path in paths], frames)
+
+
+def _as_index(values: np.ndarray) -> np.ndarray:
+    """Use text columns that look like timestamps as datetimes"""
+    if values.dtype == object:
+        try:
+            return pd.to_datetime(values).to_numpy()
+        except (ValueError, TypeError):
+            pass
+    return values
+
+
+def _concat(frames) -> pd.DataFrame:
+    """Concatenate frames of one schema; categoricals get the union of all categories"""
+    first = frames[0]
+    for column in first.columns:
+        if isinstance(first[column].dtype, pd.CategoricalDtype):
+            categories = pd.api.types.union_categoricals(
+                [frame[column] for frame in frames], ignore_order=True
+            ).categories
+            # Otherwise concat falls back to object for differing categories
+            frames = [frame.assign(**{column: frame[column].cat.set_categories(categories)})
+                      for frame in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+class MultiFileSet:
+    """Several loaded files, stored as one concatenated frame per schema"""
+
+    def __init__(self, names, frames):
+        # Make the file names unique, they are used as series labels
+        self.names = []
+        for name in names:
+            label, n = name, 2
+            while label in self.names:
+                label, n = f"{name} ({n})", n + 1
+            self.names.append(label)
+
+        groups = {}
+        for name, frame in zip(self.names, frames):
+            schema = tuple(zip(frame.columns, frame.dtypes.astype(str)))
+            groups.setdefault(schema, []).append((name, frame))
+
+        self.frames = []  # one combined frame per schema
+        self._slices = {}  # file name -> (frame index, start row, stop row)
+        for members in groups.values():
+            start = 0
+            for name, frame in members:
+                self._slices[name] = (len(self.frames), start, start + len(frame))
+                start += len(frame)
+            self.frames.append(_concat([frame for _, frame in members]))
+
+    def frame(self, name: str) -> pd.DataFrame:
+        """Rows of one file (a view into the shared frame of its schema)"""
+        index, start, stop = self._slices[name]
+        return self.frames[index].iloc[start:stop]
+
+    def __len__(self):
+        return sum(len(frame) for frame in self.frames)
+
+    @property
+    def columns(self):
+        """Columns present in every file, in the order of the first file"""
+        common = self.frames[0].columns.tolist() if self.frames else []
+        for frame in self.frames[1:]:
+            common = [c for c in common if c in frame.columns]
+        return common
+
+    def map_frames(self, func) -> "MultiFileSet":
+        """New set with func applied to every shared frame (must keep the row count)"""
+        result = MultiFileSet.__new__(MultiFileSet)
+        result.names = list(self.names)
+        result._slices = dict(self._slices)
+        result.frames = [func(frame) for frame in self.frames]
+        return result
+
+    def decimation_step(self, max_points: int) -> int:
+        """One stride for all files so that the longest has at most max_points rows"""
+        longest = max((stop - start for _, start, stop in self._slices.values()), default=0)
+        return max(1, -(-longest // max_points))  # ceil division
+
+    def decimated(self, columns, max_points: int):
+        """(name, frame) pairs with the given columns, all strided with the same step"""
+        step = self.decimation_step(max_points)
+        return [(name, self.frame(name)[list(columns)].iloc[::step]) for name in self.names]
+
+    def aligned(self, column: str, index_column: str = None, max_points: int = None,
+                duplicates: str = "first") -> pd.DataFrame:
+        """
+        Wide frame with one column per file, aligned on index_column.
+
+        Without index_column the files are aligned on row number. Repeated
+        index values within a file are combined with the duplicates
+        aggregation ("first", "mean", ...) and rows missing in some files are
+        NaN. With max_points the aligned frame is decimated with one shared
+        step.
+        """
+        series = {}
+        for name in self.names:
+            frame = self.frame(name)
+            values = frame[column].to_numpy()
+            if index_column is None:
+                series[name] = pd.Series(values)
+            else:
+                index = pd.Index(_as_index(frame[index_column].to_numpy()))
+                series[name] = pd.Series(values, index=index).groupby(level=0).agg(duplicates)
+
+        aligned = pd.DataFrame(series).sort_index()
+        if max_points:
+            aligned = aligned.iloc[::max(1, -(-len(aligned) // max_points))]
+        return aligned
@@ -0,0 +1,254 @@
+"""
+Reusable plot artists for the CSV visualizer.
+
+The controller keeps one matplotlib artist per plot type (and a single
+colorbar) and updates them in place with set_data/set_offsets/set_array
+instead of clearing the axes and building a new figure on every plot.
+"""
+import matplotlib as mpl
+import numpy as np
+
+
+def _unit_kind(values) -> str:
+    """Return 'numeric' for numbers, otherwise the numpy dtype kind"""
+    kind = np.asarray(values).dtype.kind
+    return "numeric" if kind in "biuf" else kind
+
+
+class PlotController:
+    """Keep the data artists of one Axes alive and update them in place"""
+
+    def __init__(self, fig, ax, canvas, on_xlim_changed=None):
+        self.fig = fig
+        self.ax = ax
+        self.canvas = canvas
+        self.on_xlim_changed = on_xlim_changed  # called with the Axes on zoom and pan
+
+        # One artist per plot type, created on first use
+        self.line = None
+        self.scatter = None
+        self.bars = None
+        self.hist = None
+        self.cbar = None
+        self.overlay = []  # one line per series in multi-file plots
+        self.envelope = None  # mean line of a min/max/mean envelope
+        self.band = None  # min/max band of the envelope (recreated, its vertex count varies)
+
+        self._units = None       # unit kind of the x and y data last plotted
+        self._labels = None      # axis labels and title last drawn
+        self._background = None  # figure pixels without the data artists
+
+        # Cache the background after every full draw (needed for blitting)
+        self.canvas.mpl_connect("draw_event", self._on_draw)
+        self._connect_limits()
+
+    # ------------------------------------------------------------------
+    # Public plotting API
+    # ------------------------------------------------------------------
+    def plot_line(self, x, y, x_label, y_label, title):
+        """Show a line plot of y against x"""
+        x, y = self._prepare_xy(x, y)
+        if self.line is None:
+            self.line, = self.ax.plot([], [], marker='o', linewidth=1, markersize=3,
+                                      animated=True)
+        self.line.set_data(x, y)
+        self._show([self.line])
+        self._refresh(x_label, y_label, title)
+
+    def plot_scatter(self, x, y, x_label, y_label, title, c=None, c_label=None):
+        """Show a scatter plot, colored by c when it is given"""
+        x, y = self._prepare_xy(x, y)
+        if self.scatter is None:
+            self.scatter = self.ax.scatter([], [], alpha=0.7, animated=True)
+        self.scatter.set_offsets(np.column_stack([x, y]))
+
+        if c is None:
+            self.scatter.set_array(None)
+            self.scatter.set_facecolor('C0')
+            self.scatter.set_sizes([mpl.rcParams['lines.markersize'] ** 2])
+        else:
+            self.scatter.set_array(np.asarray(c))
+            self.scatter.set_cmap('Spectral')
+            self.scatter.set_sizes([20])
+            self.scatter.autoscale()
+            if self.cbar is None:
+                self.cbar = self.fig.colorbar(self.scatter, ax=self.ax)
+            else:
+                self.cbar.update_normal(self.scatter)
+            self.cbar.set_label(c_label)
+
+        self._show([self.scatter], colorbar=c is not None)
+        colors = (c_label, self.scatter.get_clim()) if c is not None else None
+        self._refresh(x_label, y_label, title, colors)
+
+    def plot_bar(self, x, y, x_label, y_label, title):
+        """Show a bar plot; bars are recreated because their count varies"""
+        x, y = self._prepare_xy(x, y)
+        if self.bars is not None:
+            self.bars.remove()
+        self.bars = self.ax.bar(x, y)
+        for bar in self.bars:
+            bar.set_animated(True)
+        self._show(list(self.bars))
+        self._refresh(x_label, y_label, title)
+
+    def plot_overlay(self, series, x_label, y_label, title, markers_only=False):
+        """Overlay several (label, x, y) series, reusing one line artist per series"""
+        series = [(label, *self._prepare_xy(x, y)) for label, x, y in series]
+        while len(self.overlay) > len(series):
+            self.overlay.pop().remove()
+        while len(self.overlay) < len(series):
+            line, = self.ax.plot([], [], animated=True)
+            self.overlay.append(line)
+
+        for line, (label, x, y) in zip(self.overlay, series):
+            line.set_data(x, y)
+            line.set_label(label)
+            if markers_only:
+                line.set_linestyle('')
+                line.set_marker('o')
+                line.set_markersize(3)
+                line.set_alpha(0.7)
+            else:
+                line.set_linestyle('-')
+                line.set_marker('')
+                line.set_alpha(1.0)
+        self._show(self.overlay)
+        self.ax.legend(handles=self.overlay, fontsize='small')
+        self._refresh(x_label, y_label, title, legend=tuple(label for label, _, _ in series))
+
+    def plot_envelope(self, x, mean, low, high, x_label, y_label, title):
+        """Show a mean line inside a min/max band (tiles of a long series)"""
+        self._check_units(("numeric", "numeric"))
+        self.set_envelope(x, mean, low, high)
+        self._show([self.envelope, self.band])
+        self._refresh(x_label, y_label, title)
+
+    def set_envelope(self, x, mean, low, high, redraw=False):
+        """
+        Replace the envelope data without touching the axis limits, e.g.
+        with a finer level after a zoom; redraw to show it right away.
+        """
+        if self.envelope is None:
+            self.envelope, = self.ax.plot([], [], linewidth=1, color='C0', animated=True)
+        self.envelope.set_data(x, mean)
+        if self.band is not None:
+            self.band.remove()
+        self.band = self.ax.fill_between(x, low, high, color='C0', alpha=0.3, linewidth=0,
+                                         animated=True)
+        if redraw:
+            self.canvas.draw_idle()
+
+    def plot_histogram(self, counts, edges, label):
+        """Show precomputed histogram counts over the given bin edges"""
+        self._check_units(("numeric", "numeric"))
+        if self.hist is None:
+            self.hist = self.ax.stairs(counts, edges, fill=True, alpha=0.7,
+                                       edgecolor='black', animated=True)
+        else:
+            self.hist.set_data(counts, edges)
+        self._show([self.hist])
+        self._refresh(label, 'Frequency', f'Histogram of {label}', grid=False)
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+    def _data_artists(self):
+        """All data artists that currently exist"""
+        artists = [a for a in (self.line, self.scatter, self.hist, self.envelope, self.band)
+                   if a is not None]
+        if self.bars is not None:
+            artists.extend(self.bars)
+        artists.extend(self.overlay)
+        return artists
+
+    def _prepare_xy(self, x, y):
+        """Convert x/y through the axis units, resetting the axes if units change"""
+        self._check_units((_unit_kind(x), _unit_kind(y)))
+        self.ax.xaxis.update_units(x)
+        self.ax.yaxis.update_units(y)
+        return self.ax.convert_xunits(x), self.ax.convert_yunits(y)
+
+    def _check_units(self, units):
+        """Reset the axes when switching between categorical and numeric data"""
+        if self._units is not None and units != self._units:
+            self.reset()
+        self._units = units
+
+    def _show(self, artists, colorbar=False):
+        """Make only the given artists visible"""
+        for a in self._data_artists():
+            a.set_visible(any(a is m for m in artists))
+        if self.cbar is not None:
+            self.cbar.ax.set_visible(colorbar)
+        legend = self.ax.get_legend()
+        if legend is not None and artists is not self.overlay:
+            legend.remove()
+
+    def _refresh(self, x_label, y_label, title, colors=None, grid=True, legend=None):
+        """Redraw: blit if only the data changed, otherwise a full idle draw"""
+        old_limits = self.ax.dataLim.frozen()
+        self.ax.relim(visible_only=True)
+        if self.scatter is not None and self.scatter.get_visible():
+            offsets = self.scatter.get_offsets()
+            if len(offsets):
+                self.ax.update_datalim(offsets)
+
+        # Colorbar and text live outside the blitted artists, so any change
+        # to them (or to the data limits) needs a full draw
+        labels = (x_label, y_label, title, colors, grid, legend)
+        limits_changed = not np.allclose(old_limits.get_points(),
+                                         self.ax.dataLim.get_points(), equal_nan=True)
+
+        if (labels == self._labels and not limits_changed
+                and self._background is not None and self.canvas.supports_blit):
+            self._blit()
+            return
+
+        self._labels = labels
+        self.ax.set_xlabel(x_label)
+        self.ax.set_ylabel(y_label)
+        self.ax.set_title(title)
+        if grid:
+            self.ax.grid(True, alpha=0.3)
+        else:
+            self.ax.grid(False)
+        self.ax.set_autoscale_on(True)
+        self.ax.autoscale_view()
+        self.canvas.draw_idle()
+
+    def _draw_animated(self):
+        """Draw the visible data artists onto the current canvas buffer"""
+        for artist in self._data_artists():
+            if artist.get_visible():
+                self.fig.draw_artist(artist)
+
+    def _on_draw(self, event):
+        """Store the background after a full draw and paint the data on top"""
+        if event is not None and event.canvas is not self.canvas:
+            return
+        if self.canvas.supports_blit:
+            self._background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_animated()
+
+    def _blit(self):
+        """Restore the cached background and repaint only the data artists"""
+        self.canvas.restore_region(self._background)
+        self._draw_animated()
+        self.canvas.blit(self.fig.bbox)
+        self.canvas.flush_events()
+
+    def _connect_limits(self):
+        """Register the limit callback on the Axes (cla() drops its callbacks)"""
+        if self.on_xlim_changed is not None:
+            self.ax.callbacks.connect("xlim_changed", self.on_xlim_changed)
+
+    def reset(self):
+        """Clear the axes and forget all artists (colorbar axes is kept)"""
+        self.ax.cla()
+        self._connect_limits()
+        self.line = self.scatter = self.bars = self.hist = self.envelope = self.band = None
+        self.overlay = []
+        self._labels = None
+        self._background = None
+
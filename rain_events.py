@@ -0,0 +1,134 @@
+# rain_events.py
+# Rain episode analysis: contiguous rainy hours found by run-length encoding
+# on NumPy arrays, for one site or many (a "site" index level)
+
+import numpy as np
+import pandas as pd
+
+EPISODE_COLUMNS = ["start", "end", "hours", "total", "peak", "mean_rate"]
+
+
+def find_runs(wet: np.ndarray, groups: np.ndarray = None):
+    """
+    Start and end (exclusive) positions of the runs of True in wet.
+
+    Runs never cross a change in groups (e.g. the site of a stacked
+    multi-site series).
+    """
+    wet = np.asarray(wet, dtype=bool)
+    previous = np.concatenate(([False], wet[:-1]))
+    following = np.concatenate((wet[1:], [False]))
+    if groups is not None:
+        changed = np.concatenate(([True], groups[1:] != groups[:-1]))
+        previous &= ~changed
+        following &= ~np.concatenate((changed[1:], [True]))
+    starts = np.flatnonzero(wet & ~previous)
+    ends = np.flatnonzero(wet & ~following) + 1
+    return starts, ends
+
+
+def _site_codes(index: pd.Index):
+    """(codes, sites) of the "site" level, or (None, None) for a single site."""
+    if isinstance(index, pd.MultiIndex) and "site" in index.names:
+        codes, sites = pd.factorize(index.get_level_values("site"))
+        return codes, sites
+    return None, None
+
+
+def _rain_values(data, column: str) -> pd.Series:
+    """Rain series of a wide frame, a tidy (site, time, variable) frame or a series."""
+    if isinstance(data, pd.DataFrame):
+        if "variable" in data.index.names:
+            return data.xs(column, level="variable")["value"]
+        return data[column]
+    return data
+
+
+def rain_episodes(data, column: str = "rain", threshold: float = 0.0) -> pd.DataFrame:
+    """
+    Contiguous rainy episodes (rain > threshold) with duration, total and peak.
+
+    Args:
+        data: time indexed DataFrame (with column) or Series, or the tidy
+            (site, time, variable) frame of get_weather_data_bulk; a "site"
+            index level splits episodes per site
+        column (str): rain column of a DataFrame
+        threshold (float): rain above this value counts as a rainy hour
+
+    Returns:
+        pandas.DataFrame: one row per episode with start, end (time of the
+        last rainy hour), hours, total, peak and mean_rate; plus a site
+        column for multi-site data
+    """
+    rain = _rain_values(data, column)
+    values = rain.to_numpy(dtype=np.float64)
+    codes, sites = _site_codes(rain.index)
+    times = rain.index.get_level_values("time") if codes is not None else rain.index
+
+    wet = values > threshold  # NaN compares False, so it ends an episode
+    starts, ends = find_runs(wet, codes)
+
+    # Episode totals from a cumulative sum, peaks from one reduceat: dry
+    # hours between episodes are -inf and never win the maximum
+    cumulative = np.concatenate(([0.0], np.cumsum(np.where(wet, values, 0.0))))
+    totals = cumulative[ends] - cumulative[starts]
+    peaks = (np.maximum.reduceat(np.where(wet, values, -np.inf), starts)
+             if len(starts) else np.empty(0))
+    hours = ends - starts
+
+    episodes = pd.DataFrame({
+        "start": times[starts] if len(starts) else pd.DatetimeIndex([]),
+        "end": times[ends - 1] if len(starts) else pd.DatetimeIndex([]),
+        "hours": hours,
+        "total": totals,
+        "peak": peaks,
+        "mean_rate": totals / np.maximum(hours, 1),
+    }, columns=EPISODE_COLUMNS)
+    if codes is not None:
+        episodes.insert(0, "site", np.asarray(sites)[codes[starts]])
+    return episodes
+
+
+def rain_summary(data, column: str = "rain", threshold: float = 0.0, episodes: pd.DataFrame = None):
+    """
+    Rain summary statistics, derived from the episodes.
+
+    Total, maximum and number of rainy hours only depend on the rainy hours,
+    so they come from the (much smaller) episode table instead of separate
+    passes over the whole column.
+
+    Returns:
+        dict for single-site data, or a DataFrame indexed by site, with
+        hours, total, max, mean, rainy_hours, episodes and longest_episode
+    """
+    rain = _rain_values(data, column)
+    if episodes is None:
+        episodes = rain_episodes(rain, threshold=threshold)
+    codes, sites = _site_codes(rain.index)
+    valid = ~np.isnan(rain.to_numpy(dtype=np.float64))
+
+    if codes is None:
+        hours = int(valid.sum())
+        total = float(episodes["total"].sum())
+        return {
+            "hours": hours,
+            "total": total,
+            "max": float(episodes["peak"].max()) if len(episodes) else 0.0,
+            "mean": total / hours if hours else float("nan"),
+            "rainy_hours": int(episodes["hours"].sum()),
+            "episodes": len(episodes),
+            "longest_episode": int(episodes["hours"].max()) if len(episodes) else 0,
+        }
+
+    hours = pd.Series(np.bincount(codes, weights=valid, minlength=len(sites)), index=sites)
+    per_site = episodes.groupby("site").agg(
+        total=("total", "sum"),
+        max=("peak", "max"),
+        rainy_hours=("hours", "sum"),
+        episodes=("hours", "size"),
+        longest_episode=("hours", "max"),
+    ).reindex(sites).fillna(0).astype({"rainy_hours": int, "episodes": int, "longest_episode": int})
+    per_site.insert(0, "hours", hours.astype(int))
+    per_site.insert(3, "mean", per_site["total"] / hours.where(hours > 0))
+    per_site.index.name = "site"
+    return per_site
@@ -0,0 +1,300 @@
+"""
+Sparse row index for random access into large CSV captures.
+
+Every BLOCK_ROWS rows the byte offset of the row is recorded, together with
+the first and last value of the key columns in that block. The index lives
+in a sidecar file next to the CSV (``<name>.rowindex.npz``), so a reader can
+seek straight to the blocks covering a row range, or a value range of a
+sorted column (such as a time column), and parse only those bytes.
+
+Building the index only scans the file for line breaks and parses the two
+boundary lines of each block. When the CSV grows (a capture still being
+written), the index is extended from its last block instead of being rebuilt.
+
+Usage:
+    python row_index.py CSV [--block-rows 10000]        (build or update, print a summary)
+    python row_index.py CSV --rows 5000 5100
+    python row_index.py CSV --values COLUMN LOW HIGH
+"""
+import argparse
+import io
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import src_path  # noqa: F401  (crack meter modules in src/)
+
+from crack_meter import CRACK_METER_COLUMNS, compact_crack_meter_frame
+
+BLOCK_ROWS = 10_000  # rows per indexed block
+SCAN_BYTES = 16 * 1024 * 1024  # bytes read per step while scanning for line breaks
+INDEX_SUFFIX = ".rowindex.npz"
+INDEX_VERSION = 1
+
+
+def _parse_value(text: str) -> float:
+    """Numeric value of a CSV field; timestamps become seconds since the epoch, anything else NaN"""
+    text = text.strip().strip('"')
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    try:
+        return pd.Timestamp(text).value / 1e9
+    except (ValueError, TypeError):
+        return np.nan
+
+
+def _seconds(values: pd.Series) -> np.ndarray:
+    """Timestamps as seconds since the epoch (UTC for time zone aware values)"""
+    times = pd.to_datetime(values)
+    if times.dt.tz is not None:
+        times = times.dt.tz_convert(None)
+    return times.to_numpy("datetime64[ns]").astype(np.int64) / 1e9
+
+
+class RowIndex:
+    """Block offsets and boundary values of one CSV file"""
+
+    def __init__(self, csv_path: str, header: bytes, sep: str, block_rows: int, offsets, first, last,
+                 rows: int, end: int, index_path: str = None):
+        self.csv_path = csv_path
+        self.index_path = index_path or csv_path + INDEX_SUFFIX
+        self.header = header  # header line, including its line break
+        self.sep = sep
+        self.columns = [c.strip().strip('"') for c in header.decode("utf-8-sig").rstrip("\r\n").split(sep)]
+        self.block_rows = block_rows
+        self.offsets = np.asarray(offsets, dtype=np.int64)  # byte offset of the first row of each block
+        self.first = np.asarray(first, dtype=np.float64).reshape(len(self.offsets), len(self.columns))
+        self.last = np.asarray(last, dtype=np.float64).reshape(len(self.offsets), len(self.columns))
+        self.rows = rows
+        self.end = end  # indexed bytes of the file
+
+    def __len__(self):
+        return self.rows
+
+    @classmethod
+    def open(cls, csv_path: str, block_rows: int = BLOCK_ROWS, index_path: str = None) -> "RowIndex":
+        """Load the sidecar index of a CSV file, building or extending it as needed"""
+        index_path = index_path or csv_path + INDEX_SUFFIX
+        index = None
+        if os.path.exists(index_path):
+            try:
+                index = cls.load(csv_path, index_path)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Rebuilding unreadable row index {index_path}: {e}")
+        if index is None or index.block_rows != block_rows or not index._matches_file():
+            index = cls.build(csv_path, block_rows, index_path)
+            index.save()
+        elif index.update():
+            index.save()
+        return index
+
+    @classmethod
+    def build(cls, csv_path: str, block_rows: int = BLOCK_ROWS, index_path: str = None) -> "RowIndex":
+        """Index a CSV file from scratch"""
+        with open(csv_path, "rb") as f:
+            header = f.readline()
+        text = header.decode("utf-8-sig")
+        sep = ";" if text.count(";") > text.count(",") else ","
+        index = cls(csv_path, header, sep, block_rows, np.empty(0, dtype=np.int64),
+                    np.empty(0), np.empty(0), rows=0, end=len(header), index_path=index_path)
+        index.update()
+        return index
+
+    @classmethod
+    def load(cls, csv_path: str, index_path: str = None) -> "RowIndex":
+        index_path = index_path or csv_path + INDEX_SUFFIX
+        with np.load(index_path) as data:
+            if int(data["version"]) != INDEX_VERSION:
+                raise ValueError(f"Index version {int(data['version'])} is not supported")
+            return cls(csv_path, data["header"].tobytes(), str(data["sep"]), int(data["block_rows"]),
+                       data["offsets"], data["first"], data["last"], int(data["rows"]), int(data["end"]),
+                       index_path)
+
+    def save(self):
+        tmp_path = self.index_path + ".tmp.npz"
+        np.savez(
+            tmp_path, version=INDEX_VERSION, header=np.frombuffer(self.header, dtype=np.uint8),
+            sep=self.sep, block_rows=self.block_rows, offsets=self.offsets, first=self.first,
+            last=self.last, rows=self.rows, end=self.end,
+        )
+        os.replace(tmp_path, self.index_path)  # readers never see a partial index
+
+    def _matches_file(self) -> bool:
+        """False if the file was replaced: other header, or shorter than what was indexed"""
+        if os.path.getsize(self.csv_path) < self.end:
+            return False
+        with open(self.csv_path, "rb") as f:
+            return f.readline() == self.header
+
+    def update(self) -> bool:
+        """
+        Index the rows appended since the last update.
+
+        The last block (possibly incomplete, its last line possibly still
+        being written) is indexed again, everything before it is kept.
+
+        Returns:
+            bool: True if the index changed
+        """
+        if os.path.getsize(self.csv_path) == self.end:
+            return False
+        # Restart at the last block
+        blocks = max(0, len(self.offsets) - 1)
+        start = int(self.offsets[blocks]) if len(self.offsets) else len(self.header)
+        first_row = blocks * self.block_rows
+
+        # Scan for line breaks; only the starts of the first and last row of
+        # each block are kept, so memory does not grow with the file
+        boundary_rows, boundary_starts = [np.array([0])], [np.array([start])]
+        tail = [start]  # starts of the last three lines seen
+        rows = 1  # lines starting from the restart point; the last one may be empty
+        with open(self.csv_path, "rb") as f:
+            f.seek(start)
+            position = start
+            while True:
+                chunk = f.read(SCAN_BYTES)
+                if not chunk:
+                    break
+                starts = position + np.flatnonzero(np.frombuffer(chunk, dtype=np.uint8) == ord("\n")) + 1
+                numbers = rows + np.arange(len(starts))
+                in_block = numbers % self.block_rows
+                boundary = (in_block == 0) | (in_block == self.block_rows - 1)
+                boundary_rows.append(numbers[boundary])
+                boundary_starts.append(starts[boundary])
+                tail = (tail + starts[-3:].tolist())[-3:]
+                rows += len(starts)
+                position += len(chunk)
+
+            # Nothing starts at the end of the file, and a blank last line is not a row
+            if tail[-1] == position:
+                rows -= 1
+                tail.pop()
+            if tail:
+                f.seek(tail[-1])
+                if not f.readline().strip():
+                    rows -= 1
+                    tail.pop()
+
+            numbers = np.concatenate(boundary_rows)
+            starts = np.concatenate(boundary_starts)
+            firsts = starts[(numbers % self.block_rows == 0) & (numbers < rows)]
+            lasts = starts[(numbers % self.block_rows == self.block_rows - 1) & (numbers < rows)]
+            if rows % self.block_rows:
+                lasts = np.append(lasts, tail[-1])  # the incomplete last block ends with the last row
+            width = len(self.columns)
+            first = [self._values(f, offset) for offset in firsts]
+            last = [self._values(f, offset) for offset in lasts]
+
+        self.offsets = np.concatenate([self.offsets[:blocks], firsts]).astype(np.int64)
+        self.first = np.concatenate([self.first[:blocks], np.reshape(first, (-1, width))])
+        self.last = np.concatenate([self.last[:blocks], np.reshape(last, (-1, width))])
+        self.rows = first_row + rows
+        self.end = position
+        return True
+
+    def _values(self, f, start: int) -> np.ndarray:
+        """Key values of the line starting at byte start"""
+        f.seek(start)
+        fields = f.readline().decode("utf-8", errors="replace").rstrip("\r\n").split(self.sep)
+        values = np.full(len(self.columns), np.nan)
+        for i, field in enumerate(fields[:len(self.columns)]):
+            values[i] = _parse_value(field)
+        return values
+
+    def _read_blocks(self, first_block: int, last_block: int) -> pd.DataFrame:
+        """Parse the rows of blocks first_block..last_block (inclusive)"""
+        start = int(self.offsets[first_block])
+        stop = int(self.offsets[last_block + 1]) if last_block + 1 < len(self.offsets) else self.end
+        with open(self.csv_path, "rb") as f:
+            f.seek(start)
+            data = f.read(stop - start)
+        df = pd.read_csv(io.BytesIO(data), sep=self.sep, header=None, names=self.columns,
+                         encoding="utf-8")
+        # Crack meter captures get the same compact dtypes as a full read
+        if all(column in df.columns for column in CRACK_METER_COLUMNS):
+            df = compact_crack_meter_frame(df)
+        df.index = pd.RangeIndex(first_block * self.block_rows, first_block * self.block_rows + len(df))
+        return df
+
+    def read_rows(self, start: int, stop: int) -> pd.DataFrame:
+        """Rows start..stop-1 (indexed by row number), parsing only their blocks"""
+        start, stop = max(0, start), min(stop, self.rows)
+        if start >= stop:
+            return pd.read_csv(io.BytesIO(self.header), sep=self.sep, encoding="utf-8-sig")
+        df = self._read_blocks(start // self.block_rows, (stop - 1) // self.block_rows)
+        return df.loc[start:stop - 1]
+
+    def is_sorted(self, column: str) -> bool:
+        """True if the block boundaries of a column never decrease (required by read_values)"""
+        i = self.columns.index(column)
+        bounds = np.column_stack([self.first[:, i], self.last[:, i]]).ravel()
+        return not np.isnan(bounds).any() and bool(np.all(np.diff(bounds) >= 0))
+
+    def block_range(self, column: str, low: float, high: float):
+        """(first, last) block that may hold values low..high of a sorted column, or None"""
+        i = self.columns.index(column)
+        first_block = int(np.searchsorted(self.last[:, i], low, side="left"))
+        last_block = int(np.searchsorted(self.first[:, i], high, side="right")) - 1
+        if first_block > last_block:
+            return None
+        return first_block, last_block
+
+    def read_values(self, column: str, low, high) -> pd.DataFrame:
+        """
+        Rows whose column value is within low..high, for a sorted column.
+
+        Timestamps (strings or pandas Timestamps) are compared as seconds
+        since the epoch, like the index stores them.
+
+        Raises:
+            ValueError: if the column is not sorted
+        """
+        if not self.is_sorted(column):
+            raise ValueError(f"Column {column} is not sorted, value lookups need a sorted column")
+        low, high = (_parse_value(str(v)) if not isinstance(v, (int, float)) else float(v) for v in (low, high))
+        blocks = self.block_range(column, low, high)
+        if blocks is None:
+            return self.read_rows(0, 0)
+        df = self._read_blocks(*blocks)
+        values = df[column]
+        if not pd.api.types.is_numeric_dtype(values):
+            values = _seconds(values)
+        return df[(values >= low) & (values <= high)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sparse row index for large CSV files")
+    parser.add_argument("csv")
+    parser.add_argument("--block-rows", type=int, default=BLOCK_ROWS)
+    parser.add_argument("--rows", nargs=2, type=int, metavar=("START", "STOP"), help="print rows START..STOP-1")
+    parser.add_argument("--values", nargs=3, metavar=("COLUMN", "LOW", "HIGH"),
+                        help="print rows with LOW <= COLUMN <= HIGH (sorted columns)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    index = RowIndex.open(args.csv, args.block_rows)
+    print(f"{index.rows:,} rows in {len(index.offsets)} blocks of {index.block_rows:,} "
+          f"({1000 * (time.perf_counter() - started):.1f} ms to open {index.index_path})")
+    sorted_columns = [column for column in index.columns if index.is_sorted(column)]
+    print(f"Sorted columns (value lookups): {', '.join(sorted_columns) or 'none'}")
+
+    started = time.perf_counter()
+    if args.rows:
+        df = index.read_rows(*args.rows)
+    elif args.values:
+        column, low, high = args.values
+        df = index.read_values(column, *(float(v) if v.replace(".", "", 1).lstrip("-").isdigit() else v
+                                         for v in (low, high)))
+    else:
+        return
+    elapsed = time.perf_counter() - started
+    print(df.to_string(max_rows=20))
+    print(f"{len(df):,} rows in {1000 * elapsed:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
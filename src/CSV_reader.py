@@ -9,6 +9,12 @@ from datetime import datetime, timedelta
 import time
 from collections import deque
 from datetime import timedelta
+import numpy as np
+from streaming_stats import StreamingStats
+from crack_anomaly import ALERT_COLLECTION, CrackAnomalyDetector, store_alerts
+from crack_meter import CRACK_METER_DTYPES, is_numeric_column, read_crack_meter_csv
+from spool import DRAIN_INTERVAL, Spool
+from tile_pyramid import PYRAMID_DIR, PYRAMID_SERIES, TilePyramid
 
 # turn logging on
 logging.basicConfig(level=logging.INFO)
@@ -19,6 +25,11 @@ MONGO_HOST = os.getenv(
 )  # Default to MongoDB container name
 MONGO_PORT = 27017  # Default MongoDB port
 MONGO_DB = os.getenv("MONGO_DB", "crack_meter-db")  # Default to test_db if not set
+# Next to this script (src/ in the repository, /app in the container), not the working directory
+CSV_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "datasets", "crack_meter", "CalibData-30kHz-0-12--.csv"
+)
+DRAIN_TIMEOUT = float(os.getenv("DRAIN_TIMEOUT", "60"))  # seconds an ingest run waits for the spool to drain
 
 
 def connect_to_mongodb():
@@ -53,11 +64,27 @@ def create_collection(db: Database, collection_name: str) -> Collection:
     return collection
 
 
+def frame_records(data: pd.DataFrame) -> list:
+    """
+    Rows of a DataFrame as documents.
+
+    Crack meter columns held in the compact schema (integer counts,
+    categoricals) are stored as doubles, like the float64 frames before.
+    """
+    compact = {column: "float64" for column in CRACK_METER_DTYPES if column in data.columns}
+    return data.astype(compact).to_dict(orient="records")
+
+
 def insert_data_in_batches(
     collection: Collection,
     data: pd.DataFrame,
     batch_size: int = 10,
     delay_seconds: float = 0.1,
+    stats: dict = None,
+    spool: Spool = None,
+    detector: CrackAnomalyDetector = None,
+    alert_collection: Collection = None,
+    pyramid: TilePyramid = None,
 ):
     """
     Insert DataFrame data into MongoDB in batches with delays between batches.
@@ -67,10 +94,21 @@ def insert_data_in_batches(
         data: pandas DataFrame containing the data to insert
         batch_size: Number of records to insert in each batch
         delay_seconds: Delay in seconds between batches
+        stats: Optional dict of column name -> StreamingStats, updated with
+            every batch that was inserted successfully
+        spool: Optional Spool; batches that fail to insert are spooled for
+            a later replay instead of aborting the ingest
+        detector: Optional CrackAnomalyDetector run over the "Crack size" of
+            every batch; its alerts are logged and stored in alert_collection
+        alert_collection: Collection for the alerts of the detector
+        pyramid: Optional TilePyramid extended with the calibrated crack size
+            and voltage drop of every batch, for zoomable time plots
     """
-    # Convert DataFrame to list of dictionaries
-    records = data.to_dict(orient="records")
-    total_records = len(records)
+    numeric_columns = [column for column in data.columns if is_numeric_column(data[column])]
+    total_records = len(data)
+    times = None
+    if detector is not None and "timestamp" in data.columns:
+        times = data["timestamp"].to_numpy("datetime64[ns]").astype(np.int64) / 1e9
 
     logger.info(
         f"Starting batch insertion: {total_records} records, batch size: {batch_size}, delay: {delay_seconds}s"
@@ -79,12 +117,31 @@ def insert_data_in_batches(
     # Insert data in batches
     for i in range(0, total_records, batch_size):
         batch_end = min(i + batch_size, total_records)
-        batch = records[i:batch_end]
+        # Documents are built per batch, not for the whole frame at once
+        batch = frame_records(data.iloc[i:batch_end])
+        batch_num = (i // batch_size) + 1
+        if detector is not None and "Crack size" in data.columns:
+            detect_anomalies(
+                detector,
+                data["Crack size"].iloc[i:batch_end].to_numpy(dtype=float),
+                None if times is None else times[i:batch_end],
+                alert_collection,
+            )
+        if pyramid is not None:
+            pyramid.append_frame(data.iloc[i:batch_end])
+        if spool is not None and spool.pending():
+            # MongoDB failed a moment ago: don't wait for another timeout
+            spool.append(batch)
+            continue
 
         try:
             # Insert current batch
             result = collection.insert_many(batch)
-            batch_num = (i // batch_size) + 1
+            if stats is not None:
+                for column in numeric_columns:
+                    stats.setdefault(column, StreamingStats()).update(
+                        data[column].iloc[i:batch_end].to_numpy(dtype=float)
+                    )
             total_batches = (total_records + batch_size - 1) // batch_size
 
             logger.info(
@@ -98,14 +155,94 @@ def insert_data_in_batches(
 
         except Exception as e:
             logger.error(f"Error inserting batch {batch_num}: {e}")
-            raise
+            if spool is None:
+                raise
+            spool.append(batch)
+            logger.warning(f"Batch {batch_num} spooled to {spool.directory}")
+
+
+def detect_anomalies(
+    detector: CrackAnomalyDetector, crack_size: np.ndarray, times: np.ndarray = None, alert_collection: Collection = None
+):
+    """Run the anomaly detector over one batch and store its alerts"""
+    alerts = detector.update(crack_size, times)["alerts"]
+    for alert in alerts:
+        logger.warning(
+            f"{alert['metadata']['kind']} alert at {alert['timestamp']}: crack size {alert['crack_size']:.3f} mm, "
+            f"EWMA {alert['ewma']:.3f} mm, z-score {alert['zscore']:.1f}, rate {alert['rate']:.1f} mm/s"
+        )
+    if alerts and alert_collection is not None:
+        try:
+            store_alerts(alert_collection, alerts)
+        except Exception as e:
+            logger.error(f"Error storing {len(alerts)} alerts: {e}")
 
 
-def main():
-    path = "datasets/crack_meter/CalibData-30kHz-0-12--.csv"
+def spool_data(spool: Spool, data: pd.DataFrame, batch_size: int = 1000):
+    """Write a whole DataFrame to the spool, e.g. while MongoDB is unreachable"""
+    for i in range(0, len(data), batch_size):
+        spool.append(frame_records(data.iloc[i : i + batch_size]))
+    logger.info(f"Spooled {len(data)} records to {spool.directory}")
+
+
+def drain_spool(
+    spool: Spool,
+    collection_name: str = "crack_data",
+    interval: float = DRAIN_INTERVAL,
+    timeout: float = DRAIN_TIMEOUT,
+) -> bool:
+    """
+    Replay the spool in the background as soon as MongoDB is reachable.
+
+    Waits until the spool is empty or timeout seconds passed; whatever is
+    left stays on disk and is replayed by the next run. Returns True if the
+    spool was drained.
+    """
+    connection = {}
+
+    def get_collection():
+        if "collection" not in connection:
+            client, db = connect_to_mongodb()
+            if not client:
+                return None
+            connection["client"] = client
+            connection["collection"] = create_collection(db, collection_name)
+        return connection["collection"]
+
+    spool.start_drain(get_collection, interval=interval)
+    deadline = time.monotonic() + timeout
+    while spool.pending() and time.monotonic() < deadline:
+        time.sleep(interval)
+    spool.close()
+    if "client" in connection:
+        connection["client"].close()
+    if spool.pending():
+        logger.warning(f"Spool not drained, {spool.size} bytes left in {spool.directory} for the next run")
+        return False
+    logger.info("Spool drained.")
+    return True
+
+
+def log_column_stats(stats: dict):
+    """Log the streaming statistics gathered during ingest"""
+    for column, column_stats in stats.items():
+        summary = column_stats.describe()
+        logger.info(
+            "%s: count=%d mean=%.4g std=%.4g min=%.4g median=%.4g max=%.4g",
+            column,
+            summary["count"],
+            summary["mean"],
+            summary["std"],
+            summary["min"],
+            summary["50%"],
+            summary["max"],
+        )
+
+
+def main(path: str = CSV_PATH):
     logger.info("Reading CSV data from %s", path)
     try:
-        data = pd.read_csv(path, delimiter=";")
+        data = read_crack_meter_csv(path, sep=";")
         logger.info("CSV data read successfully.")
         # Add dummy timestamp field, because it is missing in the CSV
         base_time = datetime.now()  # get actual time
@@ -115,20 +252,44 @@ def main():
     except Exception as e:
         logger.error("Error reading CSV data: %s", e)
         return
+    spool = Spool()
     client, db = connect_to_mongodb()
     if not client:
+        # Keep the data: the next run replays it once MongoDB is reachable again
+        spool_data(spool, data)
+        spool.close()
+        logger.warning(f"MongoDB not reachable, {spool.size} bytes spooled in {spool.directory}")
         return
     db: Database = client[MONGO_DB]
     collection: Collection = create_collection(db, "crack_data")
+    alert_collection: Collection = create_collection(db, ALERT_COLLECTION)
+    if spool.pending():
+        logger.info("Replaying spooled data from an earlier run...")
+        spool.drain(collection)
 
     # Insert data in batches with delays
+    stats = {}
     try:
-        insert_data_in_batches(collection, data, batch_size=100, delay_seconds=0.1)
+        insert_data_in_batches(
+            collection,
+            data,
+            batch_size=100,
+            delay_seconds=0.1,
+            stats=stats,
+            spool=spool,
+            detector=CrackAnomalyDetector(os.path.basename(path)),
+            alert_collection=alert_collection,
+            # Rebuilt on every run: each run inserts the whole file again
+            pyramid=TilePyramid.create(os.path.join(PYRAMID_DIR, os.path.basename(path)), PYRAMID_SERIES),
+        )
         logger.info("All data inserted into MongoDB successfully.")
+        log_column_stats(stats)
     except Exception as e:
         logger.error("Error inserting data into MongoDB: %s", e)
     finally:
         client.close()
+    if spool.pending():
+        drain_spool(spool)
 
 
 if __name__ == "__main__":
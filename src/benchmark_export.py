@@ -0,0 +1,142 @@
+# Benchmark: Arrow bulk export (crack_export) vs. the naive list(find()) path
+#
+# With --uri the benchmark runs against a real MongoDB (e.g. a local mongod):
+# synthetic crack data is inserted into a scratch collection and both read
+# paths are timed end to end.
+#
+# Without --uri it falls back to mongomock. mongomock has no raw BSON batch
+# cursor, so for the Arrow path the documents are encoded into BSON batches
+# first (as the server would send them) and only the client-side decoding is
+# timed, against decoding the same batches into dicts and a DataFrame.
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import bson
+import numpy as np
+import pandas as pd
+from bson.codec_options import CodecOptions
+from pymongoarrow.context import PyMongoArrowContext
+
+from crack_export import CRACK_COLUMNS, crack_schema, export_parquet, read_arrow
+
+logger = logging.getLogger(__name__)
+
+
+def synthetic_documents(rows: int, start: datetime):
+    """Crack meter documents like the ones CSV_reader inserts"""
+    rng = np.random.default_rng(0)
+    values = {
+        "Frequency": np.full(rows, 30.0),
+        "CurrentSet": rng.integers(100, 3000, rows).astype(float),
+        "Current": rng.normal(1500, 400, rows),
+        "Voltage Drop": rng.normal(700, 50, rows),
+        "Crack size": np.linspace(0, 12, rows),
+    }
+    for i in range(rows):
+        doc = {column: float(values[column][i]) for column in CRACK_COLUMNS}
+        doc["timestamp"] = start + timedelta(milliseconds=10 * i)
+        doc["metadata"] = {"sensor": "calib-30kHz"}
+        yield doc
+
+
+def timed(label: str, rows: int, func):
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<45} {elapsed:8.3f} s {rows / elapsed:14,.0f} rows/s")
+    return result
+
+
+def run_mongod(uri: str, rows: int, workers: int, batch_size: int):
+    from pymongo import MongoClient
+
+    client = MongoClient(uri, serverSelectionTimeoutMS=5000)
+    collection = client["crack_benchmark"]["crack_data"]
+    collection.drop()
+    client["crack_benchmark"].create_collection(
+        "crack_data", timeseries={"timeField": "timestamp", "metaField": "metadata"}
+    )
+    start = datetime(2025, 10, 18)
+    timed("insert synthetic data", rows,
+          lambda: collection.insert_many(synthetic_documents(rows, start), ordered=False))
+
+    projection = {"_id": 0, "timestamp": 1, **{c: 1 for c in CRACK_COLUMNS}}
+    naive = timed("naive: DataFrame(list(find()))", rows,
+                  lambda: pd.DataFrame(list(collection.find({}, projection))))
+    for n in sorted({1, workers}):
+        table = timed(f"arrow: read_arrow, {n} cursor(s)", rows,
+                      lambda n=n: read_arrow(collection, workers=n, batch_size=batch_size))
+    out_dir = tempfile.mkdtemp(prefix="crack_export_")
+    try:
+        timed(f"parquet: export_parquet, {workers} cursor(s)", rows,
+              lambda: export_parquet(collection, out_dir, workers=workers, batch_size=batch_size))
+    finally:
+        shutil.rmtree(out_dir)
+    assert len(naive) == table.num_rows == rows
+    client.drop_database("crack_benchmark")
+    client.close()
+
+
+def run_mongomock(rows: int, batch_size: int):
+    import mongomock
+
+    collection = mongomock.MongoClient()["crack_benchmark"]["crack_data"]
+    docs = list(synthetic_documents(rows, datetime(2025, 10, 18)))
+    collection.insert_many(docs)
+
+    projection = {"_id": 0, "timestamp": 1, **{c: 1 for c in CRACK_COLUMNS}}
+    timed("naive (mongomock): DataFrame(list(find()))", rows,
+          lambda: pd.DataFrame(list(collection.find({}, projection))))
+
+    # Raw BSON batches as a cursor with batch_size would receive them
+    stored = list(collection.find({}, projection))
+    batches = [
+        b"".join(bson.encode(doc) for doc in stored[i:i + batch_size])
+        for i in range(0, rows, batch_size)
+    ]
+    print(f"(mongomock has no raw batch cursor: decoding {len(batches)} BSON batches only)")
+
+    def decode_dicts():
+        records = []
+        for batch in batches:
+            records.extend(bson.decode_all(batch))
+        return pd.DataFrame(records)
+
+    def decode_arrow():
+        context = PyMongoArrowContext(crack_schema(), codec_options=CodecOptions())
+        for batch in batches:
+            context.process_bson_stream(batch)
+        return context.finish()
+
+    naive = timed("decode: bson -> dicts -> DataFrame", rows, decode_dicts)
+    table = timed("decode: bson -> Arrow (pymongoarrow)", rows, decode_arrow)
+    timed("decode: bson -> Arrow -> DataFrame", rows,
+          lambda: decode_arrow().to_pandas(split_blocks=True, self_destruct=True))
+    assert len(naive) == table.num_rows == rows
+    np.testing.assert_allclose(naive["Crack size"].to_numpy(), table["Crack size"].to_numpy())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark crack_data bulk export")
+    parser.add_argument("--uri", default=os.getenv("MONGO_URI"), help="MongoDB URI (default: mongomock)")
+    parser.add_argument("--rows", type=int, help="documents (default: 200,000; 20,000 with mongomock)")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    args = parser.parse_args()
+
+    args.rows = args.rows or (200_000 if args.uri else 20_000)
+    print(f"{args.rows:,} documents, batch size {args.batch_size:,}")
+    if args.uri:
+        run_mongod(args.uri, args.rows, args.workers, args.batch_size)
+    else:
+        run_mongomock(args.rows, args.batch_size)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,305 @@
+"""
+Online anomaly and threshold detection on a calibrated crack size stream.
+
+CrackAnomalyDetector keeps, per sensor, an exponentially weighted moving
+average (EWMA), a rolling mean/std over the last WINDOW samples and the rate
+of change of the smoothed crack size. Samples are fed in chunks (a CSV batch,
+an MQTT message, a Dash tick); the work per sample is constant: the rolling
+window lives in a NumPy ring buffer with running sums, so only the samples
+entering and leaving the window are touched and history is never re-scanned.
+Every update call has a fixed overhead of some 100 us, so feed chunks of tens
+of samples or more: with chunks of 100 one core handles some 20 sensors at
+30 kHz (see --benchmark).
+
+Alerts are edge-triggered: one alert document when a condition starts
+(|z-score| above Z_THRESHOLD, |rate| above RATE_THRESHOLD, smoothed crack size
+above CRACK_SIZE_LIMIT), not one per sample while it lasts. store_alerts
+writes them to their own collection (crack_alerts).
+
+Usage:
+    python src/crack_anomaly.py [CSV]            (run over a capture, print the alerts)
+    python src/crack_anomaly.py --benchmark [--samples 3000000] [--chunk 100]
+"""
+import argparse
+import logging
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+WINDOW = 3000  # samples in the rolling window (0.1 s at 30 kHz)
+EWMA_ALPHA = 0.01  # smoothing factor of the EWMA
+MIN_SAMPLES = 100  # no z-score until the window holds this many samples
+Z_THRESHOLD = 6.0  # |z-score| of a sample against the previous window
+RATE_THRESHOLD = 5.0  # |change of the EWMA over the window| / window duration [mm/s]
+CRACK_SIZE_LIMIT = 12.0  # smoothed crack size [mm]
+RESYNC_SAMPLES = 1 << 20  # recompute the running sums from the ring after this many samples
+SAMPLE_RATE = 30_000  # Hz, for streams without timestamps
+ALERT_COLLECTION = "crack_alerts"
+ALERT_KINDS = ("zscore", "rate", "limit")
+
+
+class RingBuffer:
+    """Fixed-capacity buffer of the latest values (oldest are overwritten)"""
+
+    def __init__(self, capacity: int):
+        self.data = np.zeros(capacity)
+        self.capacity = capacity
+        self.position = 0  # next write index
+        self.count = 0
+
+    def oldest(self, n: int) -> np.ndarray:
+        """The n oldest values, oldest first (n <= count)"""
+        start = (self.position - self.count) % self.capacity
+        return self.data[(start + np.arange(n)) % self.capacity]
+
+    def extend(self, values: np.ndarray):
+        """Append values; only the last capacity of them are written"""
+        values = values[-self.capacity:]
+        n = len(values)
+        first = min(n, self.capacity - self.position)
+        self.data[self.position:self.position + first] = values[:first]
+        self.data[:n - first] = values[first:]
+        self.position = (self.position + n) % self.capacity
+        self.count = min(self.count + n, self.capacity)
+
+    def values(self) -> np.ndarray:
+        return self.oldest(self.count)
+
+    def lagged(self, values: np.ndarray):
+        """
+        For each of values (about to be appended), the value capacity samples
+        earlier, i.e. the one it pushes out of the buffer.
+
+        Returns:
+            (lagged values, mask of samples that have one; False while filling up)
+        """
+        n = len(values)
+        missing = self.capacity - self.count
+        lagged = np.zeros(n)
+        from_ring = max(0, min(n - missing, self.count))
+        lagged[missing:missing + from_ring] = self.oldest(from_ring)
+        if n > self.capacity:
+            lagged[self.capacity:] = values[:n - self.capacity]
+        return lagged, np.arange(n) >= missing
+
+
+class CrackAnomalyDetector:
+    """Streaming EWMA, rolling z-score and rate of change of one sensor"""
+
+    def __init__(
+        self,
+        sensor: str = "crack_meter",
+        window: int = WINDOW,
+        alpha: float = EWMA_ALPHA,
+        z_threshold: float = Z_THRESHOLD,
+        rate_threshold: float = RATE_THRESHOLD,
+        limit: float = CRACK_SIZE_LIMIT,
+        min_samples: int = MIN_SAMPLES,
+    ):
+        self.sensor = sensor
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.rate_threshold = rate_threshold
+        self.limit = limit
+        self.min_samples = min(min_samples, window)
+        self.ring = RingBuffer(window)  # window of samples
+        self.ewma_ring = RingBuffer(window)  # EWMA and time of the same samples, for the rate
+        self.time_ring = RingBuffer(window)
+        self.reference = None  # values are stored relative to this (less cancellation in the sums)
+        self.sum = 0.0  # running sum of the window
+        self.sum_squares = 0.0
+        self.ewma = None
+        self.last_time = None
+        self.active = dict.fromkeys(ALERT_KINDS, False)  # condition state at the last sample
+        self.samples = 0
+        self._since_resync = 0
+        # EWMA blocks stay short enough that (1 - alpha) ** -n cannot overflow
+        self._ewma_block = int(min(4096, max(1, 60 / -np.log1p(-alpha)))) if alpha < 1 else 4096
+
+    def update(self, crack_size, times=None) -> dict:
+        """
+        Process a chunk of samples.
+
+        Args:
+            crack_size: calibrated crack size [mm] per sample (NaN samples are skipped)
+            times: sample times [s since the epoch]; if omitted, samples are
+                SAMPLE_RATE apart and continue from the previous chunk
+
+        Returns:
+            dict of arrays per (non-NaN) sample: "time", "value", "ewma",
+            "zscore", "rate", "flagged" (any condition active), and
+            "alerts": list of alert documents for conditions that started
+        """
+        values = np.asarray(crack_size, dtype=np.float64)
+        if times is None:
+            start = self.last_time + 1 / SAMPLE_RATE if self.last_time is not None else 0.0
+            times = start + np.arange(len(values)) / SAMPLE_RATE
+        else:
+            times = np.asarray(times, dtype=np.float64)
+        valid = ~np.isnan(values)
+        if not valid.all():
+            values, times = values[valid], times[valid]
+        if len(values) == 0:
+            empty = np.empty(0)
+            return {"time": empty, "value": empty, "ewma": empty, "zscore": empty, "rate": empty,
+                    "flagged": np.empty(0, dtype=bool), "alerts": []}
+
+        if self.reference is None:
+            self.reference = values[0]
+        ewma = self._update_ewma(values)
+        zscore = self._update_window(values - self.reference)
+        rate = self._update_rate(ewma, times)
+        self.last_time = times[-1]
+        self.samples += len(values)
+
+        conditions = {
+            "zscore": np.abs(zscore) > self.z_threshold,
+            "rate": np.abs(rate) > self.rate_threshold,
+            "limit": ewma > self.limit,
+        }
+        alerts = []
+        for kind, condition in conditions.items():
+            if condition.any():
+                previous = np.concatenate(([self.active[kind]], condition[:-1]))
+                for i in np.flatnonzero(condition & ~previous):
+                    alerts.append(self._alert(kind, times[i], values[i], ewma[i], zscore[i], rate[i]))
+            self.active[kind] = bool(condition[-1])
+        alerts.sort(key=lambda alert: alert["timestamp"])
+        flagged = conditions["zscore"] | conditions["rate"] | conditions["limit"]
+        return {"time": times, "value": values, "ewma": ewma, "zscore": zscore, "rate": rate,
+                "flagged": flagged, "alerts": alerts}
+
+    def _update_ewma(self, values: np.ndarray) -> np.ndarray:
+        """EWMA of every sample, in closed form per block (no Python loop per sample)"""
+        decay = 1.0 - self.alpha
+        result = np.empty(len(values))
+        previous = values[0] if self.ewma is None else self.ewma
+        for start in range(0, len(values), self._ewma_block):
+            block = values[start:start + self._ewma_block]
+            powers = decay ** np.arange(1, len(block) + 1)
+            # e_j = d^(j+1) * (e_-1 + alpha * sum_{i<=j} v_i / d^(i+1))
+            result[start:start + len(block)] = powers * (previous + self.alpha * np.cumsum(block / powers))
+            previous = result[start + len(block) - 1]
+        self.ewma = previous
+        return result
+
+    def _update_window(self, values: np.ndarray) -> np.ndarray:
+        """z-score of every sample against the window of samples before it"""
+        ring = self.ring
+        n = len(values)
+        # Value leaving the window as each sample enters it (0 while the window fills up)
+        leaving, _ = ring.lagged(values)
+
+        # Window sums before each sample: previous sums plus the changes of the earlier samples
+        delta = np.cumsum(values - leaving)
+        delta_squares = np.cumsum(values * values - leaving * leaving)
+        sums = self.sum + np.concatenate(([0.0], delta[:-1]))
+        sum_squares = self.sum_squares + np.concatenate(([0.0], delta_squares[:-1]))
+        counts = np.minimum(ring.count + np.arange(n), ring.capacity)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = sums / counts
+            std = np.sqrt(np.maximum(sum_squares / counts - mean * mean, 0.0))
+            zscore = (values - mean) / std
+        zscore[(counts < self.min_samples) | ~(std > 0)] = 0.0
+
+        self.sum += delta[-1]
+        self.sum_squares += delta_squares[-1]
+        ring.extend(values)
+        self._since_resync += n
+        if self._since_resync >= RESYNC_SAMPLES:
+            # Rounding errors of the running sums would drift; the window is bounded, so re-add it
+            window = ring.values()
+            self.sum = float(window.sum())
+            self.sum_squares = float(np.dot(window, window))
+            self._since_resync = 0
+        return zscore
+
+    def _update_rate(self, ewma: np.ndarray, times: np.ndarray) -> np.ndarray:
+        """
+        Rate of change [mm/s] of the EWMA across the window (0 until the window is full).
+
+        Differences between neighbouring samples at 30 kHz would be mostly noise.
+        """
+        ewma_before, present = self.ewma_ring.lagged(ewma)
+        time_before, _ = self.time_ring.lagged(times)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rate = (ewma - ewma_before) / (times - time_before)
+        rate[~present | ~np.isfinite(rate)] = 0.0
+        self.ewma_ring.extend(ewma)
+        self.time_ring.extend(times)
+        return rate
+
+    def _alert(self, kind, timestamp, value, ewma, zscore, rate) -> dict:
+        thresholds = {"zscore": self.z_threshold, "rate": self.rate_threshold, "limit": self.limit}
+        return {
+            "timestamp": datetime.fromtimestamp(float(timestamp), timezone.utc),
+            "metadata": {"sensor": self.sensor, "kind": kind},
+            "crack_size": float(value),
+            "ewma": float(ewma),
+            "zscore": float(zscore),
+            "rate": float(rate),
+            "threshold": thresholds[kind],
+        }
+
+
+def store_alerts(collection, alerts: list) -> int:
+    """Insert alert documents into the alert collection; returns the number inserted"""
+    if not alerts:
+        return 0
+    return len(collection.insert_many(alerts).inserted_ids)
+
+
+def synthetic_stream(samples: int, seed: int = 0) -> np.ndarray:
+    """Slowly growing crack with sensor noise, a few spikes and one sudden jump"""
+    rng = np.random.default_rng(seed)
+    crack_size = np.linspace(2.0, 8.0, samples) + rng.normal(0, 0.02, samples)
+    spikes = rng.choice(samples, size=max(1, samples // 1_000_000), replace=False)
+    crack_size[spikes] += 1.0
+    crack_size[samples // 2:] += 3.0
+    return crack_size
+
+
+def run_benchmark(samples: int, chunk: int):
+    stream = synthetic_stream(samples)
+    detector = CrackAnomalyDetector("benchmark")
+    detector.update(stream[:chunk])  # warm up
+    detector = CrackAnomalyDetector("benchmark")
+    alerts = 0
+    started = time.perf_counter()
+    for start in range(0, samples, chunk):
+        alerts += len(detector.update(stream[start:start + chunk])["alerts"])
+    elapsed = time.perf_counter() - started
+    rate = samples / elapsed
+    print(f"{samples:,} samples in chunks of {chunk}: {elapsed:.2f} s, {rate:,.0f} samples/s "
+          f"({rate / SAMPLE_RATE:.1f}x a 30 kHz sensor), {alerts} alerts")
+
+
+def main():
+    from crack_meter import read_crack_meter_csv
+
+    parser = argparse.ArgumentParser(description="Streaming crack size anomaly detection")
+    parser.add_argument("csv", nargs="?", default="datasets/crack_meter/CalibData-30kHz-0-12--.csv")
+    parser.add_argument("--chunk", type=int, default=100, help="samples per update")
+    parser.add_argument("--benchmark", action="store_true", help="time the detector on a synthetic stream")
+    parser.add_argument("--samples", type=int, default=3_000_000)
+    args = parser.parse_args()
+
+    if args.benchmark:
+        run_benchmark(args.samples, args.chunk)
+        return
+    crack_size = read_crack_meter_csv(args.csv)["Crack size"].to_numpy(dtype=np.float64)
+    detector = CrackAnomalyDetector(args.csv)
+    for start in range(0, len(crack_size), args.chunk):
+        for alert in detector.update(crack_size[start:start + args.chunk])["alerts"]:
+            print(f"{alert['timestamp']:%H:%M:%S.%f} {alert['metadata']['kind']:>6}: "
+                  f"crack size {alert['crack_size']:.3f} mm, EWMA {alert['ewma']:.3f} mm, "
+                  f"z {alert['zscore']:.1f}, rate {alert['rate']:.1f} mm/s")
+    print(f"{detector.samples} samples")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+Crack size estimation from the RSM voltage drop and the real current.
+
+The calibration capture (CalibData) holds runs at a few set currents with a
+known crack size. Within one set current band the real current is almost
+constant, so the crack size is fitted per (frequency, set current) band as a
+polynomial of the normalized voltage drop ``V / I`` by linear least squares.
+Live samples are assigned to the band whose median real current is closest,
+and the polynomials are evaluated with a vectorized Horner scheme, chunk by
+chunk, so millions of samples per second can be converted.
+
+Fitted models are cached on disk under ``.calibration_cache/`` keyed by a
+hash of the calibration file and the fit parameters; refitting only happens
+when the dataset changes.
+
+Usage:
+    python src/crack_calibration.py [CSV] [--degree 3]   (fit or load, print the bands)
+    python src/crack_calibration.py --benchmark [--samples 10000000]
+"""
+import argparse
+import hashlib
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from crack_meter import CRACK_METER_NAMES, read_crack_meter_csv, scale_crack_meter_frame
+
+CALIBRATION_CSV = "datasets/crack_meter/CalibData-30kHz-0-12--.csv"
+CACHE_DIR = ".calibration_cache"
+DEGREE = 3  # polynomial degree per band
+MODEL_VERSION = 1  # part of the cache key, bump when the fit changes
+PREDICT_CHUNK = 1 << 20  # samples evaluated per step (bounded temporaries)
+ESTIMATED_CRACK_SIZE = "Estimated crack size [mm]"
+
+FREQUENCY = CRACK_METER_NAMES["Frequency"]
+SET_CURRENT = CRACK_METER_NAMES["CurrentSet"]
+CURRENT = CRACK_METER_NAMES["Current"]
+VOLTAGE_DROP = CRACK_METER_NAMES["Voltage Drop"]
+CRACK_SIZE = CRACK_METER_NAMES["Crack size"]
+
+
+class CrackSizeModel:
+    """
+    Per-band polynomials crack size = p(V / I), one band per (frequency, set current).
+
+    Bands are stored as flat arrays sorted by frequency and real current, so
+    the model is a handful of NumPy arrays that save to a single .npz file.
+    """
+
+    FIELDS = ("frequency", "set_current", "current", "coefficients", "ratio_min",
+              "ratio_max", "rmse", "samples")
+
+    def __init__(self, frequency, set_current, current, coefficients, ratio_min,
+                 ratio_max, rmse, samples):
+        self.frequency = np.asarray(frequency, dtype=np.float64)
+        self.set_current = np.asarray(set_current, dtype=np.float64)
+        self.current = np.asarray(current, dtype=np.float64)  # median real current [mA]
+        self.coefficients = np.asarray(coefficients, dtype=np.float64)  # highest power first
+        self.ratio_min = np.asarray(ratio_min, dtype=np.float64)
+        self.ratio_max = np.asarray(ratio_max, dtype=np.float64)
+        self.rmse = np.asarray(rmse, dtype=np.float64)
+        self.samples = np.asarray(samples, dtype=np.int64)
+
+    @property
+    def frequencies(self) -> np.ndarray:
+        return np.unique(self.frequency)
+
+    def save(self, path: str):
+        np.savez(path, **{name: getattr(self, name) for name in self.FIELDS})
+
+    @classmethod
+    def load(cls, path: str) -> "CrackSizeModel":
+        with np.load(path) as data:
+            return cls(**{name: data[name] for name in cls.FIELDS})
+
+    def summary(self) -> pd.DataFrame:
+        """One row per band with its current, validity range and fit error."""
+        return pd.DataFrame({
+            "frequency": self.frequency,
+            "set_current": self.set_current,
+            "current": self.current,
+            "ratio_min": self.ratio_min,
+            "ratio_max": self.ratio_max,
+            "rmse_mm": self.rmse,
+            "samples": self.samples,
+        })
+
+    def bands(self, current: np.ndarray, frequency: float) -> np.ndarray:
+        """Index of the band with the closest real current, for one frequency."""
+        candidates = np.flatnonzero(self.frequency == frequency)
+        if len(candidates) == 0:
+            raise ValueError(f"No calibration for frequency {frequency}")
+        centers = self.current[candidates]
+        # Band boundaries halfway between neighbouring band currents
+        position = np.searchsorted((centers[1:] + centers[:-1]) / 2, current)
+        return candidates[position]
+
+    def predict(self, voltage_drop, current, frequency=None) -> np.ndarray:
+        """
+        Estimated crack size [mm] of calibrated samples.
+
+        Args:
+            voltage_drop: RSM voltage drop [mV] (array or scalar)
+            current: real current [mA] (array or scalar)
+            frequency: frequency [kHz] (scalar or array); may be omitted if
+                the model covers a single frequency
+
+        Returns:
+            float64 array; NaN where an input is NaN or the current is not positive
+        """
+        voltage_drop, current = np.broadcast_arrays(
+            np.asarray(voltage_drop, dtype=np.float64), np.asarray(current, dtype=np.float64)
+        )
+        shape = voltage_drop.shape
+        voltage_drop, current = voltage_drop.ravel(), current.ravel()
+        if frequency is None:
+            if len(self.frequencies) != 1:
+                raise ValueError("frequency is required for a model with several frequencies")
+            frequency = self.frequencies[0]
+
+        result = np.empty(len(voltage_drop))
+        frequency = np.asarray(frequency, dtype=np.float64)
+        if frequency.ndim == 0:
+            for start in range(0, len(result), PREDICT_CHUNK):
+                stop = start + PREDICT_CHUNK
+                result[start:stop] = self._predict(voltage_drop[start:stop], current[start:stop], frequency)
+        else:
+            frequency = np.broadcast_to(frequency, shape).ravel()
+            for value in np.unique(frequency):
+                selected = np.flatnonzero(frequency == value)
+                result[selected] = self.predict(voltage_drop[selected], current[selected], value)
+        return result.reshape(shape)
+
+    def _predict(self, voltage_drop, current, frequency) -> np.ndarray:
+        band = self.bands(current, frequency)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = voltage_drop / np.where(current > 0, current, np.nan)
+        # Polynomials are not extrapolated beyond the calibrated range
+        ratio = np.clip(ratio, self.ratio_min[band], self.ratio_max[band])
+        coefficients = self.coefficients
+        result = coefficients[band, 0]
+        for k in range(1, coefficients.shape[1]):
+            result = result * ratio + coefficients[band, k]
+        return result
+
+
+def fit_crack_size_model(df: pd.DataFrame, degree: int = DEGREE) -> CrackSizeModel:
+    """
+    Fit the per-band polynomials on calibrated data.
+
+    Args:
+        df: calibrated calibration capture (scale_crack_meter_frame), with
+            frequency, set current, real current, voltage drop and crack size
+        degree: polynomial degree
+
+    Returns:
+        CrackSizeModel
+    """
+    data = pd.DataFrame({
+        "frequency": df[FREQUENCY].to_numpy(dtype=np.float64),
+        "set_current": df[SET_CURRENT].to_numpy(dtype=np.float64),
+        "current": df[CURRENT].to_numpy(dtype=np.float64),
+        "voltage_drop": df[VOLTAGE_DROP].to_numpy(dtype=np.float64),
+        "crack_size": df[CRACK_SIZE].to_numpy(dtype=np.float64),
+    }).dropna()
+    data = data[data["current"] > 0]
+
+    bands = []
+    for (frequency, set_current), band in data.groupby(["frequency", "set_current"]):
+        if len(band) <= degree:
+            continue
+        ratio = band["voltage_drop"].to_numpy() / band["current"].to_numpy()
+        target = band["crack_size"].to_numpy()
+        # Least squares on the Vandermonde matrix, highest power first (Horner order)
+        design = np.vander(ratio, degree + 1)
+        coefficients, *_ = np.linalg.lstsq(design, target, rcond=None)
+        residual = design @ coefficients - target
+        bands.append((frequency, set_current, float(np.median(band["current"])), coefficients,
+                      ratio.min(), ratio.max(), float(np.sqrt(np.mean(residual ** 2))), len(band)))
+    if not bands:
+        raise ValueError("No calibration band has enough samples to fit")
+
+    bands.sort(key=lambda band: (band[0], band[2]))
+    columns = list(zip(*bands))
+    return CrackSizeModel(
+        frequency=columns[0], set_current=columns[1], current=columns[2],
+        coefficients=np.vstack(columns[3]), ratio_min=columns[4], ratio_max=columns[5],
+        rmse=columns[6], samples=columns[7],
+    )
+
+
+def dataset_hash(path: str, degree: int = DEGREE) -> str:
+    """Cache key: SHA-256 of the calibration file and the fit parameters."""
+    digest = hashlib.sha256(f"v{MODEL_VERSION}-degree{degree}".encode())
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+_models = {}
+
+
+def load_model(path: str = CALIBRATION_CSV, degree: int = DEGREE, cache_dir: str = CACHE_DIR) -> CrackSizeModel:
+    """
+    Fitted model of a calibration file, from memory, the disk cache or a new fit.
+
+    Raises:
+        OSError: if the calibration file cannot be read
+    """
+    key = dataset_hash(path, degree)
+    if key in _models:
+        return _models[key]
+    cache_path = os.path.join(cache_dir, f"{key}.npz")
+    if os.path.exists(cache_path):
+        model = CrackSizeModel.load(cache_path)
+    else:
+        model = fit_crack_size_model(scale_crack_meter_frame(read_crack_meter_csv(path)), degree)
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = cache_path + ".tmp.npz"
+        model.save(tmp_path)
+        os.replace(tmp_path, cache_path)  # readers never see a partial file
+    _models[key] = model
+    return model
+
+
+def predict_crack_size(voltage_drop, current, frequency=None, model: CrackSizeModel = None) -> np.ndarray:
+    """
+    Vectorized crack size estimate [mm] from voltage drop [mV] and real current [mA].
+
+    Uses the model of CALIBRATION_CSV (fitted once, then cached) unless a
+    model is given.
+    """
+    model = model or load_model()
+    return model.predict(voltage_drop, current, frequency)
+
+
+def run_benchmark(samples: int, path: str = CALIBRATION_CSV):
+    started = time.perf_counter()
+    model = load_model(path)
+    print(f"Model load: {1000 * (time.perf_counter() - started):.1f} ms")
+
+    calibrated = scale_crack_meter_frame(read_crack_meter_csv(path))
+    estimate = model.predict(calibrated[VOLTAGE_DROP], calibrated[CURRENT])
+    error = estimate - calibrated[CRACK_SIZE].to_numpy()
+    print(f"Calibration data: RMSE {np.sqrt(np.nanmean(error ** 2)):.3f} mm, "
+          f"median abs error {np.nanmedian(np.abs(error)):.3f} mm")
+
+    # Live-like samples drawn around the calibrated bands
+    rng = np.random.default_rng(0)
+    band = rng.integers(0, len(model.current), samples)
+    current = model.current[band] + rng.normal(0, 0.5, samples)
+    voltage_drop = current * rng.uniform(model.ratio_min[band], model.ratio_max[band])
+    model.predict(voltage_drop[:1000], current[:1000])  # warm up
+    started = time.perf_counter()
+    model.predict(voltage_drop, current)
+    elapsed = time.perf_counter() - started
+    print(f"predict_crack_size: {samples:,} samples in {elapsed:.3f} s "
+          f"({samples / elapsed / 1e6:.1f} M samples/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit the crack size calibration model")
+    parser.add_argument("csv", nargs="?", default=CALIBRATION_CSV, help="calibration capture")
+    parser.add_argument("--degree", type=int, default=DEGREE)
+    parser.add_argument("--benchmark", action="store_true", help="time predict_crack_size")
+    parser.add_argument("--samples", type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    if args.benchmark:
+        run_benchmark(args.samples, args.csv)
+        return
+    model = load_model(args.csv, args.degree)
+    print(f"Cache key: {dataset_hash(args.csv, args.degree)}")
+    print(model.summary().to_string(index=False, float_format="{:.4g}".format))
+
+
+if __name__ == "__main__":
+    main()
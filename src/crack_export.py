@@ -0,0 +1,205 @@
+# Bulk export of crack meter data from MongoDB to Arrow / Parquet / NumPy
+#
+# The read counterpart of CSV_reader.insert_data_in_batches: documents are
+# fetched as raw BSON batches (large batch_size, projected to the needed
+# fields) and decoded straight into Arrow columns by pymongoarrow, without
+# creating a Python dict per document. The time range is split across
+# parallel cursors, and the export is written as Parquet partitioned by day.
+import argparse
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from pymongo.database import Collection
+from pymongoarrow.api import Schema, find_arrow_all
+
+logger = logging.getLogger(__name__)
+
+CRACK_COLUMNS = ["Frequency", "CurrentSet", "Current", "Voltage Drop", "Crack size"]
+EXPORT_BATCH_SIZE = 50_000  # documents per raw BSON batch
+EXPORT_WORKERS = 4  # parallel cursors
+
+
+def crack_schema(columns=CRACK_COLUMNS) -> Schema:
+    """Arrow schema (and projection) of the crack_data documents"""
+    fields = {"timestamp": datetime}
+    fields.update({column: float for column in columns})
+    return Schema(fields)
+
+
+def time_bounds(collection: Collection):
+    """First and last timestamp in the collection, or (None, None) if it is empty"""
+    first = collection.find_one({}, {"timestamp": 1}, sort=[("timestamp", 1)])
+    last = collection.find_one({}, {"timestamp": 1}, sort=[("timestamp", -1)])
+    if first is None or last is None:
+        return None, None
+    return first["timestamp"], last["timestamp"]
+
+
+def split_time_range(start: datetime, end: datetime, parts: int):
+    """Split [start, end] into parts half-open ranges that cover it completely"""
+    # BSON dates have millisecond resolution, so the last range ends 1 ms after end
+    end = end + timedelta(milliseconds=1)
+    step = (end - start) / max(1, parts)
+    bounds = [start + step * i for i in range(parts)] + [end]
+    bounds = [b.replace(microsecond=b.microsecond // 1000 * 1000) for b in bounds]
+    return [(lo, hi) for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo]
+
+
+def read_range_arrow(
+    collection: Collection,
+    start: datetime,
+    end: datetime,
+    columns=CRACK_COLUMNS,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> pa.Table:
+    """Documents with start <= timestamp < end as an Arrow table (one cursor)"""
+    query = {"timestamp": {"$gte": start, "$lt": end}}
+    return find_arrow_all(
+        collection, query, schema=crack_schema(columns), batch_size=batch_size
+    )
+
+
+def _ranges(collection: Collection, start, end, workers: int):
+    if start is None or end is None:
+        first, last = time_bounds(collection)
+        start = start or first
+        end = end or last
+    if start is None or end is None:
+        return []
+    return split_time_range(start, end, workers)
+
+
+def read_arrow(
+    collection: Collection,
+    start: datetime = None,
+    end: datetime = None,
+    columns=CRACK_COLUMNS,
+    workers: int = EXPORT_WORKERS,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> pa.Table:
+    """
+    Read crack data as one Arrow table, using parallel cursors.
+
+    Args:
+        collection: MongoDB collection (e.g. crack_data)
+        start, end: time range (inclusive); defaults to the whole collection
+        columns: measurement fields to read besides timestamp
+        workers: number of parallel cursors, each reading one time slice
+        batch_size: documents per raw BSON batch
+
+    Returns:
+        pyarrow.Table sorted by timestamp
+    """
+    ranges = _ranges(collection, start, end, workers)
+    if not ranges:
+        return crack_schema(columns).to_arrow().empty_table()
+    with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+        tables = list(
+            pool.map(
+                lambda r: read_range_arrow(collection, r[0], r[1], columns, batch_size),
+                ranges,
+            )
+        )
+    # Cursors without a sort return documents in storage order
+    table = pa.concat_tables(tables)
+    return table.sort_by("timestamp")
+
+
+def read_numpy(collection: Collection, **kwargs) -> dict:
+    """Crack data as a dict of column name -> NumPy array (see read_arrow)"""
+    table = read_arrow(collection, **kwargs)
+    return {
+        name: table.column(name).to_numpy()
+        for name in table.column_names
+    }
+
+
+def export_parquet(
+    collection: Collection,
+    out_dir: str,
+    start: datetime = None,
+    end: datetime = None,
+    columns=CRACK_COLUMNS,
+    workers: int = EXPORT_WORKERS,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> int:
+    """
+    Export crack data to Parquet files partitioned by day (out_dir/date=YYYY-MM-DD/).
+
+    Every parallel cursor writes its own files, so no table for the whole
+    range is ever built in memory.
+
+    Returns:
+        int: number of rows written
+    """
+    ranges = _ranges(collection, start, end, workers)
+    os.makedirs(out_dir, exist_ok=True)
+
+    def export_range(args):
+        index, (lo, hi) = args
+        table = read_range_arrow(collection, lo, hi, columns, batch_size)
+        if table.num_rows == 0:
+            return 0
+        table = table.sort_by("timestamp")
+        table = table.append_column("date", pc.strftime(table["timestamp"], format="%Y-%m-%d"))
+        pq.write_to_dataset(
+            table,
+            out_dir,
+            partition_cols=["date"],
+            basename_template=f"part-{index}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+        return table.num_rows
+
+    if not ranges:
+        return 0
+    with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+        rows = sum(pool.map(export_range, enumerate(ranges)))
+    logger.info(f"Exported {rows} rows to {out_dir} using {len(ranges)} cursors")
+    return rows
+
+
+def read_parquet(out_dir: str, columns=None, start: datetime = None, end: datetime = None) -> pa.Table:
+    """Read an export back, optionally restricted to a time range (inclusive)"""
+    filters = []
+    if start is not None:
+        filters.append(("timestamp", ">=", pa.scalar(start, pa.timestamp("ms"))))
+    if end is not None:
+        filters.append(("timestamp", "<=", pa.scalar(end, pa.timestamp("ms"))))
+    if columns is not None:
+        columns = ["timestamp"] + [c for c in columns if c != "timestamp"]
+    table = pq.read_table(out_dir, columns=columns, filters=filters or None)
+    return table.sort_by("timestamp")
+
+
+def main():
+    from CSV_reader import MONGO_DB, connect_to_mongodb
+
+    parser = argparse.ArgumentParser(description="Export crack_data to partitioned Parquet")
+    parser.add_argument("out_dir", help="output directory")
+    parser.add_argument("--collection", default="crack_data")
+    parser.add_argument("--start", type=datetime.fromisoformat, help="ISO start time")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="ISO end time")
+    parser.add_argument("--workers", type=int, default=EXPORT_WORKERS)
+    args = parser.parse_args()
+
+    client, db = connect_to_mongodb()
+    if not client:
+        return
+    try:
+        export_parquet(
+            client[MONGO_DB][args.collection], args.out_dir,
+            start=args.start, end=args.end, workers=args.workers,
+        )
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,269 @@
+"""
+Crack meter column names, compact dtypes and calibration.
+
+Shared by the CSV visualizer, the Dash app and the MongoDB ingest (CSV
+reader and MQTT bridge): the raw ADC values of the currents and the voltage
+drop are converted to mA and mV.
+
+Raw captures are loaded with a declared schema instead of float64 for
+everything: ADC counts as small integers, the few distinct frequencies and
+set currents as categoricals and the crack size as float32, and calibration
+can produce float32 on request. ``python src/crack_meter.py --benchmark``
+compares the memory footprint with a plain ``pd.read_csv``.
+"""
+import argparse
+import os
+import tempfile
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# Raw crack meter columns and their display names after scaling
+CRACK_METER_COLUMNS = ['Frequency', 'CurrentSet', 'Current', 'Voltage Drop', 'Crack size']
+CRACK_METER_NAMES = {
+    "Frequency": "Frequency [kHz]",
+    "CurrentSet": "Set current [mA]",
+    "Current": "Real current [mA]",
+    "Voltage Drop": "RSM voltage drop [mV]",
+    "Crack size": "Crack size [mm]",
+}
+
+# Compact in-memory dtypes of the raw columns: the ADCs deliver 16-bit counts,
+# Frequency and CurrentSet only take a few distinct values per capture
+CRACK_METER_DTYPES = {
+    "Frequency": "category",
+    "CurrentSet": "category",
+    "Current": "int16",
+    "Voltage Drop": "int16",
+    "Crack size": "float32",
+}
+
+
+def Scale_current(current) -> float:
+    """Scale current to mA using linear polynomial approximation"""
+    if current is None:
+        return None
+    elif current < 150:
+        return 0
+    elif current > 2000:
+        return (147.48 + 0.0118 * current)
+    else:
+        return (101.97 + 0.0283 * current)  # values between 150 and 2000
+
+
+def Scale_voltage(voltage) -> float:
+    """Scale voltage to mV"""
+    if voltage is None:
+        return None
+    else:
+        return (((2.048/(65535/2))*1000) * voltage)  # AD1114 was used with 2.048V range
+
+
+def scale_current_array(current: np.ndarray) -> np.ndarray:
+    """Vectorized Scale_current for NumPy arrays"""
+    return np.where(current < 150, 0.0,
+                    np.where(current > 2000, 147.48 + 0.0118 * current, 101.97 + 0.0283 * current))
+
+
+def scale_voltage_array(voltage: np.ndarray) -> np.ndarray:
+    """Vectorized Scale_voltage for NumPy arrays"""
+    return ((2.048/(65535/2))*1000) * voltage
+
+
+# Raw columns that are scaled, with their vectorized scaling functions
+CRACK_METER_SCALING = {
+    "CurrentSet": scale_current_array,
+    "Current": scale_current_array,
+    "Voltage Drop": scale_voltage_array,
+}
+
+
+def is_numeric_column(values: pd.Series) -> bool:
+    """True for numeric columns, including categoricals of numbers (compact schema)"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return pd.api.types.is_numeric_dtype(values.cat.categories)
+    return pd.api.types.is_numeric_dtype(values)
+
+
+def _numeric_categories(values: pd.Series) -> pd.Series:
+    # read_csv parses categories as strings; make them floats (e.g. "30" -> 30.0), so
+    # the categories of different files have the same dtype
+    categories = pd.to_numeric(values.cat.categories).astype(np.float64)
+    if not categories.is_unique:  # e.g. "30" and "30.0"
+        return values.astype(np.float64).astype("category")
+    return values.cat.rename_categories(categories)
+
+
+def _compact_column(values: pd.Series, dtype: str) -> pd.Series:
+    """values in dtype, or in the smallest dtype that holds them exactly"""
+    if dtype == "category":
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            return _numeric_categories(values)
+        return values.astype(np.float64).astype("category")
+    if dtype.startswith("float"):
+        return values.astype(dtype)
+    numbers = values.to_numpy(dtype=np.float64)
+    if np.isnan(numbers).any() or (numbers % 1 != 0).any():
+        return values.astype(np.float64)
+    for candidate in (dtype, "int32", "int64"):
+        info = np.iinfo(candidate)
+        if len(numbers) == 0 or (numbers.min() >= info.min and numbers.max() <= info.max):
+            return values.astype(candidate)
+    return values.astype(np.float64)
+
+
+def compact_crack_meter_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Crack meter columns of df converted to the compact schema (CRACK_METER_DTYPES).
+
+    Integer columns only use the declared dtype if every value fits exactly;
+    otherwise the next wider integer type (or float64 for missing or
+    fractional values) is used. Other columns are kept as they are.
+    """
+    return df.assign(**{
+        column: _compact_column(df[column], dtype)
+        for column, dtype in CRACK_METER_DTYPES.items()
+        if column in df.columns
+    })
+
+
+def read_crack_meter_csv(path: str, sep: str = ";", **kwargs) -> pd.DataFrame:
+    """
+    Read a CSV file; crack meter captures are parsed directly into the compact schema.
+
+    Files without all the crack meter columns are read unchanged.
+    """
+    kwargs.setdefault("encoding", "utf-8-sig")
+    header = pd.read_csv(path, sep=sep, nrows=0, **kwargs).columns
+    if not all(column in header for column in CRACK_METER_COLUMNS):
+        return pd.read_csv(path, sep=sep, **kwargs)
+    # Counts are parsed as int64 (narrower parser dtypes wrap around on
+    # overflow) and only downcast after the range check
+    dtypes = {
+        column: "int64" if dtype.startswith("int") else dtype
+        for column, dtype in CRACK_METER_DTYPES.items()
+    }
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # NaN cast before the ValueError
+            df = pd.read_csv(path, sep=sep, dtype=dtypes, **kwargs)
+    except (ValueError, OverflowError):
+        # Missing, fractional or out of range counts: parse as float64 first
+        df = pd.read_csv(path, sep=sep, **kwargs)
+    return compact_crack_meter_frame(df)
+
+
+def _scaled_column(values: pd.Series, scale, dtype) -> np.ndarray:
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Scale the few distinct values once and expand them by the codes
+        categories = values.cat.categories.to_numpy(dtype=dtype)
+        scaled = np.append(scale(categories) if scale else categories, np.nan).astype(dtype)
+        return scaled[values.cat.codes.to_numpy()]  # code -1 (missing) picks the NaN
+    numbers = values.to_numpy(dtype=dtype)
+    return (scale(numbers) if scale else numbers).astype(dtype, copy=False)
+
+
+def scale_crack_meter_frame(df: pd.DataFrame, dtype=np.float64) -> pd.DataFrame:
+    """
+    Scaled copy of a crack meter frame with the display column names.
+
+    Args:
+        df: raw crack meter frame (float64 or the compact schema)
+        dtype: dtype of the calibrated columns; np.float32 halves their size
+    """
+    df = df.assign(**{
+        column: _scaled_column(df[column], CRACK_METER_SCALING.get(column), dtype)
+        for column in CRACK_METER_COLUMNS
+        if column in df.columns
+    })
+    return df.rename(columns=CRACK_METER_NAMES)
+
+
+def calibrate_readings(readings: dict) -> dict:
+    """
+    Calibrated values of raw crack meter readings.
+
+    Args:
+        readings: dict of raw column name -> NumPy array (or list)
+
+    Returns:
+        dict of display name (e.g. "Real current [mA]") -> scaled array, for
+        the scaled columns present in readings
+    """
+    return {
+        CRACK_METER_NAMES[column]: scale(np.asarray(readings[column], dtype=float))
+        for column, scale in CRACK_METER_SCALING.items()
+        if column in readings
+    }
+
+
+def synthetic_capture(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Raw crack meter capture like CalibData-30kHz (counts stored as float64 by default)"""
+    rng = np.random.default_rng(seed)
+    crack = np.repeat(np.arange(0, 12.5, 0.5), -(-rows // 25))[:rows]
+    return pd.DataFrame({
+        "Frequency": np.full(rows, 30.0),
+        "CurrentSet": rng.choice([100.0, 150.0, 200.0, 250.0, 300.0, 320.0], rows),
+        "Current": rng.integers(100, 14200, rows).astype(np.float64),
+        "Voltage Drop": rng.integers(600, 9600, rows).astype(np.float64),
+        "Crack size": crack,
+    })
+
+
+def run_benchmark(rows: int, path: str = None):
+    """Memory footprint of the plain float64 load vs. the compact schema, raw and calibrated."""
+    tmp = None
+    if path is None:
+        tmp = tempfile.NamedTemporaryFile(suffix=".csv", delete=False)
+        tmp.close()
+        synthetic_capture(rows).to_csv(tmp.name, sep=";", index=False)
+        path = tmp.name
+    try:
+        started = time.perf_counter()
+        plain = pd.read_csv(path, sep=";", encoding="utf-8-sig")
+        plain_time = time.perf_counter() - started
+        started = time.perf_counter()
+        compact = read_crack_meter_csv(path)
+        compact_time = time.perf_counter() - started
+    finally:
+        if tmp is not None:
+            os.remove(tmp.name)
+
+    plain_scaled = scale_crack_meter_frame(plain)
+    compact_scaled = scale_crack_meter_frame(compact, np.float32)
+    for name in CRACK_METER_NAMES.values():
+        np.testing.assert_allclose(compact_scaled[name], plain_scaled[name], rtol=1e-6, atol=1e-4)
+
+    def size(df):
+        return df.memory_usage(deep=True, index=False).sum()
+
+    print(f"{len(plain):,} rows from {'synthetic capture' if tmp else path}")
+    print(f"{'':<28}{'bytes':>14}{'bytes/row':>11}{'ratio':>8}")
+    for label, df, reference in (
+        ("raw, read_csv (float64)", plain, plain),
+        ("raw, compact schema", compact, plain),
+        ("calibrated, float64", plain_scaled, plain_scaled),
+        ("calibrated, float32", compact_scaled, plain_scaled),
+    ):
+        print(f"{label:<28}{size(df):>14,}{size(df) / max(len(df), 1):>11.1f}"
+              f"{size(reference) / size(df):>7.1f}x")
+    print(f"Load time: read_csv {plain_time:.2f} s, compact {compact_time:.2f} s")
+    print("Compact dtypes: " + ", ".join(f"{c} {t}" for c, t in compact.dtypes.astype(str).items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crack meter schema memory benchmark")
+    parser.add_argument("--benchmark", action="store_true", help="compare load memory footprints")
+    parser.add_argument("--rows", type=int, default=5_000_000, help="rows of the synthetic capture")
+    parser.add_argument("--csv", help="measure a real capture instead of synthetic data")
+    args = parser.parse_args()
+    if args.benchmark:
+        run_benchmark(args.rows, args.csv)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
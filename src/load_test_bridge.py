@@ -0,0 +1,181 @@
+# Load test: sustained throughput of the MQTT -> MongoDB bridge
+#
+# Publishers send synthetic crack meter readings at a fixed rate for a fixed
+# time; the bridge writes them to crack_data. Reports the sustained insert
+# rate, receive -> ack latency and queue depth, and checks that every
+# published reading was stored.
+#
+# By default an in-process broker (amqtt) and mongomock are used. With
+# --broker HOST:PORT a running broker (e.g. a local Mosquitto) is used, and
+# with --uri a real MongoDB (the scratch database crack_load_test is dropped
+# afterwards).
+#
+# The in-process broker and mongomock are test dependencies, not part of the
+# container image: pip install -r src/requirements-dev.txt
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+import numpy as np
+import paho.mqtt.client as mqtt
+
+from mqtt_mongo_bridge import CrackMeterBridge
+
+logger = logging.getLogger(__name__)
+
+
+def start_broker() -> int:
+    """Start an in-process amqtt broker on a free local port and return the port."""
+    from amqtt.broker import Broker
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    config = {
+        "listeners": {"default": {"type": "tcp", "bind": f"127.0.0.1:{port}"}},
+        "plugins": {"amqtt.plugins.authentication.AnonymousAuthPlugin": {"allow_anonymous": True}},
+    }
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+
+    async def start():
+        broker = Broker(config, loop=loop)
+        await broker.start()
+        return broker
+
+    asyncio.run_coroutine_threadsafe(start(), loop).result(timeout=10)
+    return port
+
+
+def get_collection(uri: str):
+    if uri:
+        from pymongo import MongoClient
+
+        client = MongoClient(uri, serverSelectionTimeoutMS=5000)
+        client.drop_database("crack_load_test")
+        db = client["crack_load_test"]
+        db.create_collection("crack_data", timeseries={"timeField": "timestamp", "metaField": "metadata"})
+    else:
+        import mongomock
+
+        client = mongomock.MongoClient()
+        db = client["crack_load_test"]
+    return client, db["crack_data"]
+
+
+def publish(host: str, port: int, sensor: str, rate: float, per_message: int, duration: float, qos: int) -> int:
+    """Publish readings of one sensor at rate readings/s; returns the number of readings sent."""
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=f"load-{sensor}")
+    client.max_inflight_messages_set(1000)
+    client.max_queued_messages_set(10_000)
+    client.connect(host, port)
+    client.loop_start()
+    rng = np.random.default_rng(abs(hash(sensor)) % 2**32)
+    topic = f"crack_meter/{sensor}/readings"
+    interval = per_message / rate
+    sent = 0
+    started = time.monotonic()
+    next_time = started
+    infos = []
+    while next_time - started < duration:
+        now = time.time()
+        readings = [{
+            "timestamp": now + i / rate,
+            "Frequency": 30.0,
+            "CurrentSet": float(rng.integers(100, 3000)),
+            "Current": float(rng.normal(1500, 400)),
+            "Voltage Drop": float(rng.normal(700, 50)),
+            "Crack size": float(rng.uniform(0, 12)),
+        } for i in range(per_message)]
+        infos.append(client.publish(topic, json.dumps(readings), qos=qos))
+        sent += per_message
+        next_time += interval
+        time.sleep(max(0.0, next_time - time.monotonic()))
+    for info in infos:
+        info.wait_for_publish(timeout=60)
+    client.disconnect()
+    client.loop_stop()
+    return sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test of the MQTT -> MongoDB bridge")
+    parser.add_argument("--broker", help="HOST:PORT of a running broker (default: in-process amqtt)")
+    parser.add_argument("--uri", default=os.getenv("MONGO_URI"), help="MongoDB URI (default: mongomock)")
+    parser.add_argument("--sensors", type=int, default=4, help="publishing crack meters")
+    parser.add_argument("--rate", type=float, default=2000, help="readings/s per sensor")
+    parser.add_argument("--per-message", type=int, default=50, help="readings per MQTT message")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of publishing")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--batch-interval", type=float, default=0.5)
+    parser.add_argument("--max-inflight", type=int, default=20)
+    parser.add_argument("--qos", type=int, default=1, choices=(0, 1))
+    args = parser.parse_args()
+
+    if args.broker:
+        host, port = args.broker.rsplit(":", 1)
+        port = int(port)
+    else:
+        host, port = "127.0.0.1", start_broker()
+    client, collection = get_collection(args.uri)
+
+    bridge = CrackMeterBridge(
+        collection, host=host, port=port, qos=args.qos,
+        client_id=f"bridge-load-{uuid.uuid4().hex[:8]}",
+        batch_size=args.batch_size, batch_interval=args.batch_interval,
+        max_inflight=args.max_inflight,
+    )
+    bridge.start()
+    time.sleep(1)  # connect and subscribe before publishing
+
+    target = args.sensors * args.rate
+    print(f"{args.sensors} sensors x {args.rate:,.0f} readings/s ({target:,.0f}/s), "
+          f"{args.per_message} readings per message, {args.duration} s, QoS {args.qos}")
+    results = [0] * args.sensors
+    started = time.monotonic()
+    publishers = [
+        threading.Thread(target=lambda i=i: results.__setitem__(i, publish(
+            host, port, f"sensor-{i}", args.rate, args.per_message, args.duration, args.qos)))
+        for i in range(args.sensors)
+    ]
+    for thread in publishers:
+        thread.start()
+    for thread in publishers:
+        thread.join()
+    published = sum(results)
+
+    # Wait until the bridge has stored everything (or stops making progress)
+    last, stalled = -1, time.monotonic()
+    while bridge.stats()["inserted"] < published and time.monotonic() - stalled < 10:
+        inserted = bridge.stats()["inserted"]
+        if inserted != last:
+            last, stalled = inserted, time.monotonic()
+        time.sleep(0.1)
+    elapsed = time.monotonic() - started
+    bridge.stop()
+
+    stats = bridge.stats()
+    stored = collection.count_documents({})
+    print(f"Published {published:,} readings, stored {stored:,} in {elapsed:.1f} s")
+    print(f"Sustained throughput: {stored / elapsed:,.0f} readings/s (target {target:,.0f}/s)")
+    print(f"Inserts: {stats['batches']} batches, {stats['insert_rate']:,.0f} readings/s while inserting")
+    print(f"Receive -> ack latency: p50 {stats['latency_p50_ms']:.1f} ms, p99 {stats['latency_p99_ms']:.1f} ms")
+    print(f"Max queue depth: {stats['max_queue']} messages (limit {bridge.queue.maxsize})")
+    calibrated = collection.find_one({}, {"_id": 0, "metadata": 0})
+    print(f"Sample document: {calibrated}")
+    if args.uri:
+        client.drop_database("crack_load_test")
+    client.close()
+    if stored != published:
+        raise SystemExit(f"Lost readings: {published - stored:,}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    main()
@@ -0,0 +1,440 @@
+# MQTT -> MongoDB bridge for live crack meters
+#
+# Crack meters publish JSON readings (one object or a list of objects per
+# message) on crack_meter/<sensor>/readings. The bridge calibrates them with
+# the crack meter scaling (plus a crack size estimate from the calibration
+# model, see crack_calibration.py) and inserts them into the crack_data time-series
+# collection in micro-batches: BATCH_SIZE readings or BATCH_INTERVAL seconds,
+# whichever comes first.
+#
+# Delivery is at-least-once. Messages are subscribed with QoS 1 on a
+# persistent session and acknowledged manually, only after the batch holding
+# them was inserted with a journaled write concern. If the bridge or the
+# database goes down, the broker redelivers everything that was not stored.
+# The queue between the MQTT network thread and the writer is bounded, so
+# when MongoDB falls behind the bridge stops reading from the socket and the
+# broker buffers the backlog instead of the bridge's memory.
+#
+# With a spool (see spool.py), batches that cannot be inserted are written
+# to disk and acknowledged instead, and a background drain replays them when
+# the database is back. Acknowledged spooled batches are as durable as the
+# spool's fsync policy ("always" to fsync before every ack). The bridge also
+# starts while MongoDB is unreachable: it spools until the drain connects.
+# After a failed insert the bridge spools without trying the database again
+# until the drain succeeded, then inserts directly again.
+import json
+import logging
+import os
+import queue
+import signal
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+import numpy as np
+import paho.mqtt.client as mqtt
+from pymongo.database import Collection
+from pymongo.errors import PyMongoError
+from pymongo.write_concern import WriteConcern
+
+from crack_calibration import ESTIMATED_CRACK_SIZE, CrackSizeModel, load_model
+from crack_meter import CRACK_METER_COLUMNS, CRACK_METER_NAMES, calibrate_readings
+from spool import Spool, SpoolFullError
+
+logger = logging.getLogger(__name__)
+
+MQTT_HOST = os.getenv("MQTT_HOST", "crack_meter-mqtt")  # Default to broker container name
+MQTT_PORT = int(os.getenv("MQTT_PORT", "1883"))
+MQTT_TOPIC = os.getenv("MQTT_TOPIC", "crack_meter/+/readings")
+MQTT_QOS = int(os.getenv("MQTT_QOS", "1"))
+MQTT_CLIENT_ID = os.getenv("MQTT_CLIENT_ID", "crack_meter-bridge")  # fixed, for the persistent session
+
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", "1000"))  # readings per insert
+BATCH_INTERVAL = float(os.getenv("BATCH_INTERVAL", "1.0"))  # seconds before a partial batch is flushed
+MAX_PENDING = int(os.getenv("MAX_PENDING", "1000"))  # messages queued between MQTT and the writer
+# Unacknowledged messages the broker sends before it waits for acks (Mosquitto
+# max_inflight_messages, default 20); a batch is flushed when it holds this many
+MAX_INFLIGHT = int(os.getenv("MAX_INFLIGHT", "20"))
+STATS_INTERVAL = 60  # seconds between statistics log lines
+MAX_RETRY_DELAY = 30  # seconds, insert retries back off up to this
+
+
+class CrackMeterBridge:
+    """
+    Subscribes to crack meter readings and writes them to MongoDB in batches.
+
+    The paho network thread only parses messages and puts them into a
+    bounded queue; a writer thread builds the batches, inserts them and
+    acknowledges the messages.
+
+    The collection may be None if a spool is given; batches are then spooled
+    until set_collection is called.
+    """
+
+    def __init__(
+        self,
+        collection: Collection = None,
+        host: str = MQTT_HOST,
+        port: int = MQTT_PORT,
+        topic: str = MQTT_TOPIC,
+        qos: int = MQTT_QOS,
+        client_id: str = MQTT_CLIENT_ID,
+        batch_size: int = BATCH_SIZE,
+        batch_interval: float = BATCH_INTERVAL,
+        max_pending: int = MAX_PENDING,
+        max_inflight: int = MAX_INFLIGHT,
+        spool: Spool = None,
+        model: CrackSizeModel = None,
+    ):
+        if collection is None and spool is None:
+            raise ValueError("A bridge without a collection needs a spool")
+        self.collection = None
+        if collection is not None:
+            self.set_collection(collection)
+        self.host = host
+        self.port = port
+        self.topic = topic
+        self.qos = qos
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.max_inflight = max_inflight
+        self.spool = spool
+        self.model = model
+        self.queue = queue.Queue(maxsize=max_pending)
+
+        self.client = mqtt.Client(
+            mqtt.CallbackAPIVersion.VERSION2,
+            client_id=client_id,
+            clean_session=False,
+            manual_ack=True,
+        )
+        self.client.on_connect = self.on_connect
+        self.client.on_disconnect = self.on_disconnect
+        self.client.on_message = self.on_message
+
+        # Incremented on every disconnect: message ids of an older connection
+        # cannot be acknowledged, the broker redelivers those messages
+        self._generation = 0
+        # Cleared when an insert fails, set again by resume_inserts once the
+        # drain reached the database
+        self._direct = True
+        self._stop = threading.Event()
+        self._writer = None
+        self._stats_lock = threading.Lock()
+        self._latencies = deque(maxlen=10_000)  # receive -> ack, seconds
+        self._stats = {
+            "messages": 0,
+            "readings": 0,
+            "rejected": 0,
+            "inserted": 0,
+            "batches": 0,
+            "acked": 0,
+            "dropped": 0,
+            "spooled": 0,
+            "insert_errors": 0,
+            "insert_time": 0.0,
+            "max_queue": 0,
+        }
+
+    def set_collection(self, collection: Collection):
+        """Insert into collection from now on, e.g. once MongoDB became reachable."""
+        self.collection = collection.with_options(write_concern=WriteConcern(j=True))
+
+    def resume_inserts(self):
+        """Insert directly again instead of spooling, e.g. after a successful drain."""
+        if not self._direct:
+            logger.info("Spool drained, inserting directly again")
+        self._direct = True
+
+    # MQTT callbacks (paho network thread)
+
+    def on_connect(self, client, userdata, flags, reason_code, properties):
+        if reason_code.is_failure:
+            logger.error(f"MQTT connection to {self.host}:{self.port} refused: {reason_code}")
+            return
+        logger.info(
+            f"Connected to MQTT broker at {self.host}:{self.port} "
+            f"(session present: {flags.session_present})"
+        )
+        client.subscribe(self.topic, qos=self.qos)
+
+    def on_disconnect(self, client, userdata, flags, reason_code, properties):
+        self._generation += 1
+        if not self._stop.is_set():
+            logger.warning(f"Disconnected from MQTT broker: {reason_code}, reconnecting")
+
+    def on_message(self, client, userdata, message):
+        if self._stop.is_set():
+            return  # not acknowledged, redelivered after a restart
+        received = time.monotonic()
+        readings = self.parse_message(message)
+        with self._stats_lock:
+            self._stats["messages"] += 1
+            if readings is None:
+                self._stats["rejected"] += 1
+            else:
+                self._stats["readings"] += len(readings)
+        # Blocks while the writer is behind: no more messages are read from
+        # the socket, and the broker holds the backlog
+        self.queue.put((message.mid, message.qos, self._generation, received, readings or []))
+        with self._stats_lock:
+            self._stats["max_queue"] = max(self._stats["max_queue"], self.queue.qsize())
+
+    def parse_message(self, message):
+        """Readings of a message as documents without calibration, or None if it is invalid."""
+        try:
+            payload = json.loads(message.payload)
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            logger.warning(f"Invalid payload on {message.topic}: {e}")
+            return None
+        items = payload if isinstance(payload, list) else [payload]
+        if not all(isinstance(item, dict) for item in items):
+            logger.warning(f"Invalid payload on {message.topic}: expected objects")
+            return None
+
+        parts = message.topic.split("/")
+        topic_sensor = parts[1] if len(parts) == 3 else None
+        now = datetime.now(timezone.utc)
+        readings = []
+        for item in items:
+            try:
+                doc = {
+                    column: float(item[column])
+                    for column in CRACK_METER_COLUMNS
+                    if item.get(column) is not None
+                }
+                doc["timestamp"] = _parse_timestamp(item.get("timestamp"), now)
+            except (TypeError, ValueError) as e:
+                logger.warning(f"Invalid reading on {message.topic}: {e}")
+                return None
+            doc["metadata"] = {
+                "sensor": item.get("sensor", topic_sensor),
+                "topic": message.topic,
+            }
+            readings.append(doc)
+        return readings
+
+    # Writer thread
+
+    def run(self):
+        """Writer loop: collect batches from the queue, insert them, acknowledge them."""
+        batch = []  # (mid, qos, generation, received, readings) per message
+        size = 0
+        deadline = None
+        last_stats = time.monotonic()
+        while not (self._stop.is_set() and self.queue.empty()):
+            timeout = self.batch_interval if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                message = self.queue.get(timeout=min(timeout, 0.5))
+                batch.append(message)
+                size += len(message[4])
+                if deadline is None:
+                    deadline = time.monotonic() + self.batch_interval
+            except queue.Empty:
+                pass
+
+            if batch and (
+                size >= self.batch_size
+                or len(batch) >= self.max_inflight
+                or time.monotonic() >= deadline
+                or self._stop.is_set()
+            ):
+                self.flush(batch)
+                batch, size, deadline = [], 0, None
+
+            if time.monotonic() - last_stats >= STATS_INTERVAL:
+                self.log_stats()
+                last_stats = time.monotonic()
+
+    def flush(self, batch):
+        """Insert one batch (retrying until it is stored) and acknowledge its messages."""
+        # Messages of an earlier connection are redelivered by the broker
+        generation = self._generation
+        current = [message for message in batch if message[2] == generation]
+        if len(current) < len(batch):
+            with self._stats_lock:
+                self._stats["dropped"] += len(batch) - len(current)
+        readings = [doc for message in current for doc in message[4]]
+
+        if readings:
+            calibrate(readings, self.model)
+            if not self.store(readings):
+                logger.error(f"Bridge stopped, {len(current)} messages left unacknowledged")
+                return
+
+        now = time.monotonic()
+        for mid, qos, _, received, _ in current:
+            if qos > 0:
+                self.client.ack(mid, qos)
+            self._latencies.append(now - received)
+        with self._stats_lock:
+            self._stats["acked"] += len(current)
+
+    def store(self, readings: list) -> bool:
+        """
+        Insert a batch, or spool it if the database is unavailable.
+
+        Retries with backoff while neither works; returns False if the
+        bridge is stopped before the batch was stored.
+        """
+        delay = 1.0
+        while True:
+            # After a failed insert, spool right away instead of waiting for
+            # another timeout until the drain reached the database again
+            if self.collection is not None and (self.spool is None or self._direct):
+                started = time.perf_counter()
+                try:
+                    result = self.collection.insert_many(readings, ordered=False)
+                    elapsed = time.perf_counter() - started
+                    with self._stats_lock:
+                        self._stats["inserted"] += len(result.inserted_ids)
+                        self._stats["batches"] += 1
+                        self._stats["insert_time"] += elapsed
+                    return True
+                except PyMongoError as e:
+                    with self._stats_lock:
+                        self._stats["insert_errors"] += 1
+                    self._direct = False
+                    logger.error(f"Insert of {len(readings)} readings failed: {e}")
+            if self.spool is not None and self._spool(readings):
+                return True
+            logger.error(f"Batch of {len(readings)} readings not stored, retrying in {delay:.0f} s")
+            if self._stop.wait(delay):
+                return False
+            delay = min(2 * delay, MAX_RETRY_DELAY)
+
+    def _spool(self, readings: list) -> bool:
+        try:
+            self.spool.append(readings)
+        except SpoolFullError as e:
+            logger.error(str(e))
+            return False
+        with self._stats_lock:
+            self._stats["spooled"] += len(readings)
+        return True
+
+    # Control
+
+    def start(self):
+        """Connect to the broker and start the network and writer threads."""
+        self._writer = threading.Thread(target=self.run, name="crack-meter-writer", daemon=True)
+        self._writer.start()
+        self.client.connect_async(self.host, self.port)
+        self.client.loop_start()
+
+    def stop(self, timeout: float = 30):
+        """Stop reading, flush the pending batch and disconnect."""
+        self._stop.set()
+        if self._writer is not None:
+            self._writer.join(timeout)
+        self.client.disconnect()
+        self.client.loop_stop()
+        self.log_stats()
+
+    def stats(self) -> dict:
+        """Counters, insert throughput, queue depth and receive -> ack latency percentiles."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["queue"] = self.queue.qsize()
+        stats["insert_rate"] = stats["inserted"] / stats["insert_time"] if stats["insert_time"] else None
+        latencies = np.array(self._latencies)
+        for p in (50, 99):
+            stats[f"latency_p{p}_ms"] = 1000 * float(np.percentile(latencies, p)) if len(latencies) else None
+        return stats
+
+    def log_stats(self):
+        s = self.stats()
+        logger.info(
+            f"Messages: {s['messages']} ({s['rejected']} rejected), readings: {s['readings']}, "
+            f"inserted: {s['inserted']} in {s['batches']} batches, spooled: {s['spooled']}, "
+            f"acked: {s['acked']}, "
+            f"queue: {s['queue']} (max {s['max_queue']}), insert errors: {s['insert_errors']}"
+        )
+
+
+def _parse_timestamp(value, default: datetime) -> datetime:
+    """Reading time from epoch seconds or an ISO string (UTC if no zone is given)."""
+    if value is None:
+        return default
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, timezone.utc)
+    timestamp = datetime.fromisoformat(value)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp
+
+
+def calibrate(readings: list, model: CrackSizeModel = None):
+    """
+    Add the calibrated values (display names, e.g. "Real current [mA]") to the reading documents.
+
+    With a model, readings with a voltage drop and a current also get an
+    estimated crack size (ESTIMATED_CRACK_SIZE).
+    """
+    raw = {
+        column: np.array([doc.get(column, np.nan) for doc in readings], dtype=float)
+        for column in CRACK_METER_COLUMNS
+    }
+    calibrated = calibrate_readings(raw)
+    if model is not None:
+        frequency = raw["Frequency"] if len(model.frequencies) > 1 else None
+        try:
+            calibrated[ESTIMATED_CRACK_SIZE] = model.predict(
+                calibrated[CRACK_METER_NAMES["Voltage Drop"]],
+                calibrated[CRACK_METER_NAMES["Current"]],
+                frequency,
+            )
+        except ValueError as e:  # e.g. a frequency without calibration
+            logger.warning(f"No crack size estimate for this batch: {e}")
+    for name, values in calibrated.items():
+        for doc, value in zip(readings, values.tolist()):
+            if value == value:  # skip NaN, i.e. raw value missing
+                doc[name] = value
+
+
+def main():
+    from CSV_reader import create_collection, connect_to_mongodb
+
+    try:
+        model = load_model()
+    except (OSError, ValueError) as e:
+        logger.warning(f"Crack size model not available, no estimates: {e}")
+        model = None
+    spool = Spool()
+    bridge = CrackMeterBridge(spool=spool, model=model)
+    connection = {}
+
+    def get_collection():
+        # Connects on the first call that finds MongoDB reachable; until then
+        # the bridge spools every batch
+        if "collection" not in connection:
+            client, db = connect_to_mongodb()
+            if not client:
+                return None
+            connection["client"] = client
+            connection["collection"] = create_collection(db, "crack_data")
+            bridge.set_collection(connection["collection"])
+        return connection["collection"]
+
+    if get_collection() is None:
+        logger.warning("MongoDB not reachable, spooling readings until it is")
+    spool.start_drain(get_collection, on_drained=bridge.resume_inserts)
+
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *args: stopped.set())
+    bridge.start()
+    try:
+        stopped.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        bridge.stop()
+        spool.close()
+        if "client" in connection:
+            connection["client"].close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,325 @@
+# Disk-backed write-ahead spool for crack meter batches
+#
+# While MongoDB is unreachable (or too slow), batches of documents are
+# appended to segment files in a spool directory instead of being inserted.
+# A background drain replays them in large insert_many calls once the
+# database is back, oldest segment first, and deletes every segment it has
+# fully replayed.
+#
+# Segment format: a sequence of records, each a 4-byte length, a 4-byte CRC32
+# and a BSON document {"docs": [...]}, so datetimes and nested metadata
+# survive unchanged. A torn record at the end of a segment (crash during an
+# append) is detected by its length or CRC and skipped.
+#
+# The crack_data time-series collection has no unique index, so a replayed
+# document is not rejected as a duplicate. The drain therefore records how
+# many documents of a segment are stored in a progress file next to it
+# (segment-N.done) after every insert, and a later drain resumes from there.
+# Only an insert whose outcome is unknown (connection lost before the reply)
+# can still be stored twice.
+import argparse
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+
+import bson
+from bson import ObjectId
+from pymongo.database import Collection
+from pymongo.errors import BulkWriteError, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+SPOOL_DIR = os.getenv("SPOOL_DIR", "spool")
+SEGMENT_BYTES = int(os.getenv("SPOOL_SEGMENT_BYTES", str(16 * 1024 * 1024)))  # rotate above this
+MAX_SPOOL_BYTES = int(os.getenv("SPOOL_MAX_BYTES", str(1024 * 1024 * 1024)))  # appends fail above this
+# "always": fsync every append, "interval": at most every FSYNC_INTERVAL
+# seconds, "never": leave it to the OS
+FSYNC_POLICY = os.getenv("SPOOL_FSYNC", "interval")
+FSYNC_INTERVAL = 1.0
+DRAIN_BATCH_SIZE = 10_000  # documents per insert_many while draining
+DRAIN_INTERVAL = 5.0  # seconds between drain attempts while the database is down
+
+HEADER = struct.Struct("<II")  # record length, CRC32
+DUPLICATE_KEY = 11000
+
+
+class SpoolFullError(Exception):
+    """The spool reached its size cap."""
+
+
+class Spool:
+    """
+    Append-only segment files holding document batches for later insertion.
+
+    Appends and drains may run on different threads.
+    """
+
+    def __init__(
+        self,
+        directory: str = SPOOL_DIR,
+        segment_bytes: int = SEGMENT_BYTES,
+        max_bytes: int = MAX_SPOOL_BYTES,
+        fsync: str = FSYNC_POLICY,
+    ):
+        if fsync not in ("always", "interval", "never"):
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._active = None  # open file of the segment being appended to
+        self._active_seq = None
+        self._last_sync = 0.0
+        self._drainer = None
+        self._stop = threading.Event()
+        segments = self._segments()
+        self._next_seq = segments[-1] + 1 if segments else 0
+        self._size = sum(os.path.getsize(self._path(seq)) for seq in segments)
+
+    def _path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"segment-{seq:010d}.spool")
+
+    def _progress_path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"segment-{seq:010d}.done")
+
+    def _progress(self, seq: int) -> int:
+        """Number of leading documents of a segment already stored."""
+        try:
+            with open(self._progress_path(seq)) as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return 0
+
+    def _set_progress(self, seq: int, done: int):
+        # Written to a temporary file and renamed, so a crash leaves either
+        # the old or the new count
+        path = self._progress_path(seq)
+        with open(path + ".tmp", "w") as f:
+            f.write(str(done))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+
+    def _segments(self):
+        return sorted(
+            int(name[len("segment-"):-len(".spool")])
+            for name in os.listdir(self.directory)
+            if name.startswith("segment-") and name.endswith(".spool")
+        )
+
+    @property
+    def size(self) -> int:
+        """Bytes held in the spool."""
+        return self._size
+
+    def pending(self) -> bool:
+        """True if the spool holds data that was not replayed yet."""
+        return self._size > 0
+
+    def append(self, docs: list):
+        """
+        Append one batch of documents.
+
+        Raises:
+            SpoolFullError: if the batch would exceed max_bytes
+        """
+        for doc in docs:
+            doc.setdefault("_id", ObjectId())  # replays of the same document keep its _id
+        payload = bson.encode({"docs": docs})
+        record = HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        with self._lock:
+            if self._size + len(record) > self.max_bytes:
+                raise SpoolFullError(f"Spool {self.directory} is full ({self._size} bytes)")
+            if self._active is not None and self._active.tell() + len(record) > self.segment_bytes:
+                self._close_active()
+            if self._active is None:
+                self._active_seq = self._next_seq
+                self._next_seq += 1
+                self._active = open(self._path(self._active_seq), "ab")
+            self._active.write(record)
+            self._size += len(record)
+            self._sync()
+
+    def _sync(self, force: bool = False):
+        self._active.flush()
+        now = time.monotonic()
+        if force or self.fsync == "always" or (
+            self.fsync == "interval" and now - self._last_sync >= FSYNC_INTERVAL
+        ):
+            os.fsync(self._active.fileno())
+            self._last_sync = now
+
+    def _close_active(self):
+        if self._active is not None:
+            self._sync(force=True)
+            self._active.close()
+            self._active = None
+            self._active_seq = None
+
+    def close(self):
+        """Stop the drain thread and close the active segment."""
+        self._stop.set()
+        if self._drainer is not None:
+            self._drainer.join()
+        with self._lock:
+            self._close_active()
+
+    def _read_segment(self, seq: int):
+        """Yield the document batch of every complete record of a segment."""
+        with open(self._path(seq), "rb") as f:
+            offset = 0
+            while True:
+                header = f.read(HEADER.size)
+                if len(header) < HEADER.size:
+                    if header:
+                        logger.warning(f"Torn record header at the end of segment {seq}, skipped")
+                    return
+                length, crc = HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    logger.warning(f"Torn or corrupt record at offset {offset} of segment {seq}, skipped")
+                    return
+                offset += HEADER.size + length
+                yield bson.decode(payload)["docs"]
+
+    def drain(self, collection: Collection, batch_size: int = DRAIN_BATCH_SIZE) -> int:
+        """
+        Replay the spool into collection and delete the replayed segments.
+
+        Records are combined into ordered inserts of about batch_size
+        documents, and the number of stored documents of the segment is
+        recorded after each one. A segment is only deleted after all its
+        documents were inserted; if an insert fails the exception propagates
+        and the next drain continues after the last stored document.
+
+        Returns:
+            int: number of documents inserted
+        """
+        with self._lock:
+            self._close_active()  # new appends go to a new segment
+            segments = self._segments()
+        inserted = 0
+        for seq in segments:
+            done = self._progress(seq)
+            docs = []
+            for doc in self._documents(seq, done):
+                docs.append(doc)
+                if len(docs) >= batch_size:
+                    done, count = self._replay(collection, seq, docs, done)
+                    inserted += count
+                    docs = []
+            if docs:
+                done, count = self._replay(collection, seq, docs, done)
+                inserted += count
+            size = os.path.getsize(self._path(seq))
+            os.remove(self._path(seq))
+            if os.path.exists(self._progress_path(seq)):
+                os.remove(self._progress_path(seq))
+            with self._lock:
+                self._size -= size
+            logger.info(f"Spool segment {seq} replayed ({size} bytes)")
+        return inserted
+
+    def _documents(self, seq: int, start: int):
+        """Yield the documents of a segment, skipping the first start ones."""
+        position = 0
+        for docs in self._read_segment(seq):
+            if position + len(docs) > start:
+                yield from docs[max(0, start - position):]
+            position += len(docs)
+
+    def _replay(self, collection: Collection, seq: int, docs: list, done: int):
+        """
+        Insert docs in order and record the progress of segment seq.
+
+        Returns:
+            tuple: new progress of the segment, number of documents inserted
+        """
+        inserted = 0
+        while docs:
+            try:
+                collection.insert_many(docs, ordered=True)
+            except BulkWriteError as e:
+                # An ordered insert stops at the first error, everything
+                # before it is stored
+                error = e.details["writeErrors"][0]
+                index = error["index"]
+                done += index
+                inserted += index
+                if error.get("code") != DUPLICATE_KEY:
+                    self._set_progress(seq, done)
+                    raise
+                # Only a collection with a unique _id gets here: the document
+                # was stored by an insert whose result was lost
+                done += 1
+                docs = docs[index + 1:]
+                continue
+            done += len(docs)
+            inserted += len(docs)
+            break
+        self._set_progress(seq, done)
+        return done, inserted
+
+    def start_drain(self, get_collection, interval: float = DRAIN_INTERVAL, on_drained=None):
+        """
+        Drain in the background whenever the spool holds data.
+
+        Args:
+            get_collection: callable returning the target collection, or
+                None while the database is unreachable
+            interval: seconds between attempts
+            on_drained: optional callable, called after every successful drain
+        """
+        if self._drainer is not None:
+            return
+
+        def run():
+            while not self._stop.wait(interval):
+                if not self.pending():
+                    continue
+                try:
+                    collection = get_collection()
+                    if collection is not None:
+                        started = time.perf_counter()
+                        count = self.drain(collection)
+                        elapsed = time.perf_counter() - started
+                        logger.info(f"Drained {count} spooled documents in {elapsed:.1f} s")
+                        if on_drained is not None:
+                            on_drained()
+                except PyMongoError as e:
+                    logger.warning(f"Spool drain failed, retrying in {interval} s: {e}")
+
+        self._drainer = threading.Thread(target=run, name="spool-drain", daemon=True)
+        self._drainer.start()
+
+
+def main():
+    from CSV_reader import MONGO_DB, connect_to_mongodb
+
+    parser = argparse.ArgumentParser(description="Show or replay the ingest spool")
+    parser.add_argument("directory", nargs="?", default=SPOOL_DIR)
+    parser.add_argument("--collection", default="crack_data")
+    parser.add_argument("--drain", action="store_true", help="replay the spool into MongoDB")
+    args = parser.parse_args()
+
+    spool = Spool(args.directory)
+    print(f"Spool {args.directory}: {len(spool._segments())} segments, {spool.size} bytes")
+    if args.drain and spool.pending():
+        client, db = connect_to_mongodb()
+        if not client:
+            return
+        try:
+            print(f"Inserted {spool.drain(client[MONGO_DB][args.collection])} documents")
+        finally:
+            client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,190 @@
+"""
+One-pass, mergeable statistics for numeric columns.
+
+StreamingStats accumulates count, mean, variance, min/max, approximate
+quantiles (KLL sketch) and an optional fixed-bin histogram chunk by chunk.
+Two accumulators can be merged, so chunks can be reduced on several threads
+(NumPy releases the GIL in its reductions) and the partial results combined.
+It is used by the CSV visualizer, the out-of-core column store and the
+MongoDB ingester.
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+SKETCH_SIZE = 1024  # values kept per sketch level; quantile error is roughly 1/SKETCH_SIZE
+
+
+class QuantileSketch:
+    """KLL-style mergeable quantile sketch with a bounded number of stored values"""
+
+    def __init__(self, k: int = SKETCH_SIZE, seed=None):
+        self.k = k
+        self.levels = [np.empty(0)]  # values on level i stand for 2**i original values
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values: np.ndarray):
+        """Add a chunk of (NaN free) values"""
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other: "QuantileSketch"):
+        """Merge another sketch into this one"""
+        for i, level in enumerate(other.levels):
+            if i == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[i] = np.concatenate([self.levels[i], level])
+        self._compress()
+
+    def _compress(self):
+        """Halve every level that grew over k items and promote the survivors"""
+        i = 0
+        while i < len(self.levels):
+            level = self.levels[i]
+            if len(level) > self.k:
+                level = np.sort(level)
+                odd = len(level) % 2  # an odd item stays on this level
+                promoted = level[odd + self._rng.integers(2)::2]
+                self.levels[i] = level[:odd]
+                if i + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[i + 1] = np.concatenate([self.levels[i + 1], promoted])
+            i += 1
+
+    def quantile(self, q):
+        """Approximate quantile(s); exact while nothing has been compacted"""
+        if len(self.levels) == 1:
+            if len(self.levels[0]) == 0:
+                return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+            return np.quantile(self.levels[0], q)
+
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2 ** i) for i, level in enumerate(self.levels)])
+        order = np.argsort(values)
+        values = values[order]
+        ranks = np.cumsum(weights[order])
+        idx = np.searchsorted(ranks, np.asarray(q) * ranks[-1], side="left")
+        return values[np.clip(idx, 0, len(values) - 1)]
+
+
+class StreamingStats:
+    """Mergeable one-pass statistics of a numeric column"""
+
+    def __init__(self, edges=None, k: int = SKETCH_SIZE):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # sum of squared deviations from the mean
+        self.min = np.inf
+        self.max = -np.inf
+        self.sketch = QuantileSketch(k)
+        self.edges = None if edges is None else np.asarray(edges, dtype=float)
+        self.counts = None if edges is None else np.zeros(len(self.edges) - 1, dtype=np.int64)
+
+    def update(self, values):
+        """Add one chunk of values (NaN values are ignored, like describe())"""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return self
+
+        mean = values.mean()
+        self._merge_moments(values.size, mean, np.square(values - mean).sum())
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.sketch.update(values)
+        if self.edges is not None:
+            self.counts += np.histogram(values, bins=self.edges)[0]
+        return self
+
+    def merge(self, other: "StreamingStats"):
+        """Merge the statistics of another accumulator into this one"""
+        if other.count == 0:
+            return self
+        self._merge_moments(other.count, other.mean, other.m2)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+        if self.edges is not None:
+            if other.edges is None or not np.array_equal(self.edges, other.edges):
+                raise ValueError("Cannot merge histograms with different bin edges")
+            self.counts += other.counts
+        return self
+
+    def _merge_moments(self, count, mean, m2):
+        """Combine count, mean and m2 (Chan et al. parallel variance)"""
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta ** 2 * self.count * count / total
+        self.count = total
+
+    @property
+    def variance(self) -> float:
+        """Sample variance (ddof=1, as in pandas)"""
+        return self.m2 / (self.count - 1) if self.count > 1 else np.nan
+
+    @property
+    def std(self) -> float:
+        return np.sqrt(self.variance)
+
+    def quantile(self, q):
+        return self.sketch.quantile(q)
+
+    def histogram(self):
+        """Histogram counts and bin edges (only when edges were given)"""
+        if self.edges is None:
+            raise ValueError("No histogram bins were configured")
+        return self.counts, self.edges
+
+    def describe(self) -> pd.Series:
+        """Summary in the layout of pandas describe()"""
+        empty = self.count == 0
+        quartiles = self.quantile([0.25, 0.5, 0.75])
+        return pd.Series(
+            [self.count, np.nan if empty else self.mean, self.std,
+             np.nan if empty else self.min, *quartiles, np.nan if empty else self.max],
+            index=["count", "mean", "std", "min", "25%", "50%", "75%", "max"],
+        )
+
+
+def histogram_edges(stats: StreamingStats, bins: int = 30) -> np.ndarray:
+    """Bin edges spanning the observed range, as np.histogram would choose them"""
+    if stats.count == 0:
+        return np.linspace(0.0, 1.0, bins + 1)
+    return np.histogram_bin_edges([], bins=bins, range=(stats.min, stats.max))
+
+
+def iter_array_chunks(values, chunk_rows: int = 1_000_000, transform=None):
+    """Yield slices of an array (or memory map), optionally passed through transform"""
+    for start in range(0, len(values), chunk_rows):
+        chunk = values[start:start + chunk_rows]
+        yield transform(np.asarray(chunk)) if transform is not None else chunk
+
+
+def stats_from_chunks(chunks, edges=None, workers: int = 1, k: int = SKETCH_SIZE) -> StreamingStats:
+    """
+    Reduce an iterable of chunks into one StreamingStats.
+
+    With workers > 1 the chunks are reduced on a thread pool and merged; at
+    most 2 * workers chunks are in flight, so memory stays bounded.
+    """
+    def reduce_chunk(chunk):
+        return StreamingStats(edges, k).update(chunk)
+
+    total = StreamingStats(edges, k)
+    if workers <= 1:
+        for chunk in chunks:
+            total.update(chunk)
+        return total
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(reduce_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                total.merge(pending.popleft().result())
+        while pending:
+            total.merge(pending.popleft().result())
+    return total
@@ -0,0 +1,320 @@
+"""
+Multi-resolution min/max/mean tiles for long crack meter time series.
+
+Plotting weeks of 30 kHz samples means drawing a few thousand points, not
+billions. The pyramid stores, per series, level 0 tiles of FACTOR samples
+and every further level FACTOR times coarser, each tile holding min, max,
+sum and count (mean = sum / count). A plot of any sample range reads the
+finest level that still fits in max_points tiles, so the work per query is
+bounded by max_points at every zoom level.
+
+Levels are raw float64 files opened as memory maps, with a JSON header, in a
+``<name>.pyramid`` directory next to the CSV (or any directory for live
+ingest). Appending samples updates the last, partial tile of every level and
+adds new tiles; nothing already complete is recomputed.
+
+Usage:
+    python src/tile_pyramid.py CSV [--factor 16]                 (build, print the levels)
+    python src/tile_pyramid.py CSV --range START STOP [--points 2000]
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from crack_meter import CRACK_METER_NAMES, CRACK_METER_SCALING
+
+FACTOR = 16  # samples per level 0 tile; each further level is FACTOR times coarser
+MAX_POINTS = 2000  # tiles per query
+CHUNK_ROWS = 1_000_000  # rows read per step when building from a CSV
+META_FILE = "pyramid.json"
+PYRAMID_DIR = os.getenv("PYRAMID_DIR", "pyramids")  # pyramids of ingested data
+
+# Calibrated series kept in the pyramid: display name -> raw crack meter column
+PYRAMID_SERIES = {
+    CRACK_METER_NAMES["Crack size"]: "Crack size",
+    CRACK_METER_NAMES["Voltage Drop"]: "Voltage Drop",
+}
+
+MIN, MAX, SUM, COUNT = range(4)  # columns of a tile
+
+
+def reduce_samples(values: np.ndarray, factor: int) -> np.ndarray:
+    """Tiles (min, max, sum, count) of consecutive groups of factor samples; NaN is skipped"""
+    values = np.asarray(values, dtype=np.float64)
+    tiles = -(-len(values) // factor)
+    padded = np.full(tiles * factor, np.nan)
+    padded[:len(values)] = values
+    blocks = padded.reshape(tiles, factor)
+    valid = ~np.isnan(blocks)
+    return np.column_stack([
+        np.fmin.reduce(blocks, axis=1),  # fmin/fmax ignore NaN (NaN only if all are)
+        np.fmax.reduce(blocks, axis=1),
+        np.where(valid, blocks, 0.0).sum(axis=1),
+        valid.sum(axis=1),
+    ])
+
+
+def reduce_tiles(tiles: np.ndarray, factor: int) -> np.ndarray:
+    """Tiles of the next level: consecutive groups of factor tiles combined"""
+    count = -(-len(tiles) // factor)
+    padded = np.empty((count * factor, 4))
+    padded[:len(tiles)] = tiles
+    padded[len(tiles):] = (np.nan, np.nan, 0.0, 0.0)
+    blocks = padded.reshape(count, factor, 4)
+    return np.column_stack([
+        np.fmin.reduce(blocks[:, :, MIN], axis=1),
+        np.fmax.reduce(blocks[:, :, MAX], axis=1),
+        blocks[:, :, SUM].sum(axis=1),
+        blocks[:, :, COUNT].sum(axis=1),
+    ])
+
+
+def _combine(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """One tile covering the samples of tiles a and b"""
+    return np.array([np.fmin(a[MIN], b[MIN]), np.fmax(a[MAX], b[MAX]), a[SUM] + b[SUM], a[COUNT] + b[COUNT]])
+
+
+class TilePyramid:
+    """Memory-mapped min/max/sum/count levels of one or more sample series"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, META_FILE), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.factor = self.meta["factor"]
+        self._maps = {}  # (series, level) -> memmap
+
+    @classmethod
+    def create(cls, directory: str, series, factor: int = FACTOR, **meta) -> "TilePyramid":
+        """Empty pyramid for the given series names (an existing one is replaced)"""
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            if name.endswith(".bin"):
+                os.remove(os.path.join(directory, name))
+        meta = {
+            **meta,
+            "factor": factor,
+            "series": {name: {"file": f"s{i}", "samples": 0, "levels": []} for i, name in enumerate(series)},
+        }
+        _write_meta(directory, meta)
+        return cls(directory)
+
+    @classmethod
+    def open(cls, directory: str, series=tuple(PYRAMID_SERIES), factor: int = FACTOR) -> "TilePyramid":
+        """Existing pyramid of a directory, or a new empty one"""
+        if os.path.exists(os.path.join(directory, META_FILE)):
+            return cls(directory)
+        return cls.create(directory, series, factor)
+
+    @classmethod
+    def from_csv(cls, csv_path: str, directory: str = None, factor: int = FACTOR,
+                 chunk_rows: int = CHUNK_ROWS) -> "TilePyramid":
+        """
+        Pyramid of the calibrated crack size and voltage drop of a crack meter
+        capture, built chunk by chunk and reused while the CSV is unchanged.
+
+        Raises:
+            ValueError: if the file has none of the PYRAMID_SERIES columns
+        """
+        from column_store import detect_separator
+
+        directory = directory or csv_path + ".pyramid"
+        stat = os.stat(csv_path)
+        meta_path = os.path.join(directory, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if (meta.get("source_size") == stat.st_size and meta.get("source_mtime") == stat.st_mtime
+                    and meta.get("factor") == factor):
+                return cls(directory)
+
+        sep = detect_separator(csv_path)
+        header = pd.read_csv(csv_path, sep=sep, nrows=0, encoding="utf-8-sig").columns
+        sources = {name: raw for name, raw in PYRAMID_SERIES.items() if raw in header}
+        if not sources:
+            raise ValueError(f"{csv_path} has no {' or '.join(PYRAMID_SERIES.values())} column")
+        pyramid = cls.create(directory, sources, factor)  # without source fields until complete
+        for chunk in pd.read_csv(csv_path, sep=sep, usecols=list(sources.values()),
+                                 chunksize=chunk_rows, encoding="utf-8-sig"):
+            pyramid.append_frame(chunk, save=False)
+        pyramid.meta.update(source=os.path.abspath(csv_path), source_size=stat.st_size,
+                            source_mtime=stat.st_mtime)
+        pyramid.save()
+        return pyramid
+
+    @property
+    def series(self):
+        return list(self.meta["series"])
+
+    def samples(self, name: str) -> int:
+        return self.meta["series"][name]["samples"]
+
+    def levels(self, name: str) -> int:
+        return len(self.meta["series"][name]["levels"])
+
+    def tile_size(self, level: int) -> int:
+        """Samples per tile of a level"""
+        return self.factor ** (level + 1)
+
+    def save(self):
+        _write_meta(self.directory, self.meta)
+
+    def _path(self, name: str, level: int) -> str:
+        return os.path.join(self.directory, f"{self.meta['series'][name]['file']}_L{level}.bin")
+
+    def level(self, name: str, level: int) -> np.ndarray:
+        """Tiles of one level, shape (tiles, 4), memory-mapped"""
+        key = (name, level)
+        if key not in self._maps:
+            tiles = self.meta["series"][name]["levels"][level]
+            if tiles == 0:
+                self._maps[key] = np.empty((0, 4))
+            else:
+                self._maps[key] = np.memmap(self._path(name, level), dtype=np.float64, mode="r",
+                                            shape=(tiles, 4))
+        return self._maps[key]
+
+    def _write(self, name: str, level: int, first_tile: int, tiles: np.ndarray):
+        """Overwrite the tiles of a level from first_tile on"""
+        self._maps.pop((name, level), None)
+        path = self._path(name, level)
+        with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+            f.seek(first_tile * 4 * 8)
+            f.write(np.ascontiguousarray(tiles, dtype=np.float64).tobytes())
+        levels = self.meta["series"][name]["levels"]
+        if level == len(levels):
+            levels.append(0)
+        levels[level] = first_tile + len(tiles)
+
+    def append(self, name: str, values, save: bool = True):
+        """
+        Append samples to a series and update every level incrementally.
+
+        Only the last (partial) tile of each level is rewritten, plus the
+        tiles covering the new samples.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return
+        info = self.meta["series"][name]
+        old = info["samples"]
+        factor = self.factor
+
+        # Level 0: fill the partial last tile first, then whole new tiles
+        first = old // factor
+        filled = old % factor
+        head = values[:factor - filled] if filled else values[:0]
+        tiles = reduce_samples(values[len(head):], factor)
+        if filled:
+            partial = _combine(np.array(self.level(name, 0)[first]), reduce_samples(head, factor)[0])
+            tiles = np.vstack([partial, tiles]) if len(tiles) else partial[np.newaxis]
+        self._write(name, 0, first, tiles)
+        info["samples"] = old + len(values)
+
+        # Coarser levels are recomputed from their children, from the first changed tile on
+        level = 1
+        while info["levels"][level - 1] > 1 or level < len(info["levels"]):
+            first //= factor
+            children = np.array(self.level(name, level - 1)[first * factor:])
+            self._write(name, level, first, reduce_tiles(children, factor))
+            level += 1
+        if save:
+            self.save()
+
+    def append_frame(self, df: pd.DataFrame, save: bool = True):
+        """Append the pyramid series of a frame with calibrated or raw crack meter columns"""
+        for name, raw in PYRAMID_SERIES.items():
+            if name not in self.meta["series"]:
+                continue
+            if name in df.columns:
+                values = df[name].to_numpy(dtype=np.float64)
+            elif raw in df.columns:
+                values = df[raw].to_numpy(dtype=np.float64)
+                scale = CRACK_METER_SCALING.get(raw)
+                values = scale(values) if scale is not None else values
+            else:
+                continue
+            self.append(name, values, save=False)
+        if save:
+            self.save()
+
+    def level_for(self, name: str, start: int, stop: int, max_points: int = MAX_POINTS) -> int:
+        """Finest level with at most max_points tiles in start..stop, -1 if raw samples fit"""
+        span = max(0, min(stop, self.samples(name)) - max(0, start))
+        if span <= max_points:
+            return -1
+        for level in range(self.levels(name)):
+            if span / self.tile_size(level) <= max_points:
+                return level
+        return self.levels(name) - 1
+
+    def tiles(self, name: str, level: int, start: int = 0, stop: int = None) -> pd.DataFrame:
+        """
+        Tiles of a level overlapping samples start..stop-1.
+
+        Returns:
+            DataFrame with the first sample of every tile ("sample") and its
+            "min", "max" and "mean"
+        """
+        stop = self.samples(name) if stop is None else min(stop, self.samples(name))
+        size = self.tile_size(level)
+        first, last = max(0, start) // size, -(-stop // size)
+        tiles = np.asarray(self.level(name, level)[first:last])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = tiles[:, SUM] / tiles[:, COUNT]
+        return pd.DataFrame({
+            "sample": (first + np.arange(len(tiles))) * size,
+            "min": tiles[:, MIN],
+            "max": tiles[:, MAX],
+            "mean": mean,
+        })
+
+    def query(self, name: str, start: int = 0, stop: int = None, max_points: int = MAX_POINTS):
+        """
+        (level, tiles) for plotting samples start..stop-1 of a series.
+
+        Level -1 (tiles None) means the range is short enough to plot the raw
+        samples, which the pyramid does not keep.
+        """
+        stop = self.samples(name) if stop is None else stop
+        level = self.level_for(name, start, stop, max_points)
+        if level < 0:
+            return level, None
+        return level, self.tiles(name, level, start, stop)
+
+
+def _write_meta(directory: str, meta: dict):
+    path = os.path.join(directory, META_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(path + ".tmp", path)  # the header always matches complete level files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Min/max/mean tile pyramid of a crack meter capture")
+    parser.add_argument("csv")
+    parser.add_argument("--factor", type=int, default=FACTOR)
+    parser.add_argument("--range", nargs=2, type=int, metavar=("START", "STOP"), help="query a sample range")
+    parser.add_argument("--points", type=int, default=MAX_POINTS, help="maximum tiles per query")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    pyramid = TilePyramid.from_csv(args.csv, factor=args.factor)
+    print(f"Opened {pyramid.directory} in {1000 * (time.perf_counter() - started):.1f} ms")
+    for name in pyramid.series:
+        levels = ", ".join(f"L{level}: {len(pyramid.level(name, level)):,}" for level in range(pyramid.levels(name)))
+        print(f"{name}: {pyramid.samples(name):,} samples; tiles {levels}")
+    if args.range:
+        for name in pyramid.series:
+            started = time.perf_counter()
+            level, tiles = pyramid.query(name, *args.range, max_points=args.points)
+            elapsed = 1000 * (time.perf_counter() - started)
+            print(f"{name}: level {level}, {0 if tiles is None else len(tiles)} tiles in {elapsed:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+"""
+Puts src/ on the import path of the scripts in the repository root.
+
+The crack meter modules live in src/, next to the container scripts that
+use them (the image only copies src/). Root scripts import this module
+before them:
+
+    import src_path  # noqa: F401
+    from crack_meter import read_crack_meter_csv
+"""
+import os
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "src")
+
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
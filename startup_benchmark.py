@@ -0,0 +1,114 @@
+# startup_benchmark.py
+# Cold start guard for the command line scripts, based on python -X importtime
+#
+# Every scenario is started in a fresh interpreter several times. The import
+# time (sum of the top level imports reported by -X importtime, best run)
+# must stay within its budget, and heavy modules that the scenario does not
+# need (plotting stack, HTTP cache, MongoDB driver) must not be imported at
+# all. Exits with status 1 if a scenario fails, so it can run in CI or before
+# building the container.
+#
+# Usage: python startup_benchmark.py [--runs 5] [--scale 1.0] [--top 5]
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+PLOTTING = ["matplotlib", "seaborn", "plotly", "dash"]
+HTTP_CACHE = ["requests_cache", "openmeteo_requests"]
+
+# name: (arguments after "python -X importtime", import budget [ms], modules that must not be imported)
+SCENARIOS = {
+    "cli --help": (["cli.py", "--help"], 100, PLOTTING + HTTP_CACHE + ["pandas", "numpy", "pymongo"]),
+    "fetch imports (Homework-2)": (
+        ["-c", "import importlib; importlib.import_module('Homework-2')"],
+        1000,
+        PLOTTING + HTTP_CACHE,
+    ),
+    "analyze imports (Homework-2-print_data)": (
+        ["-c", "import importlib; importlib.import_module('Homework-2-print_data')"],
+        1000,
+        PLOTTING + HTTP_CACHE,
+    ),
+    "ingest imports (CSV_reader)": (
+        ["-c", "import sys; sys.path.insert(0, 'src'); import CSV_reader"],
+        1000,
+        PLOTTING + HTTP_CACHE,
+    ),
+}
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def parse_importtime(stderr: str):
+    """(total import time in us, {module: cumulative us}) from -X importtime output."""
+    total = 0
+    modules = {}
+    for line in stderr.splitlines():
+        match = LINE.match(line)
+        if not match:
+            continue
+        cumulative, indent, name = int(match.group(2)), match.group(3), match.group(4)
+        modules[name] = cumulative
+        if not indent:
+            total += cumulative
+    return total, modules
+
+
+def run_scenario(args, runs: int):
+    """Best import time, best wall time and the import table of the best run."""
+    best = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", *args],
+            cwd=ROOT, capture_output=True, text=True,
+            env={**os.environ, "MPLBACKEND": "Agg"},
+        )
+        wall = time.perf_counter() - started
+        if process.returncode != 0:
+            raise RuntimeError(process.stderr.strip().splitlines()[-1])
+        total, modules = parse_importtime(process.stderr)
+        if best is None or total < best[0]:
+            best = (total, wall, modules)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time guard (python -X importtime)")
+    parser.add_argument("--runs", type=int, default=5, help="interpreter starts per scenario")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply all budgets (slow machines)")
+    parser.add_argument("--top", type=int, default=5, help="slowest top level imports to show")
+    args = parser.parse_args()
+
+    failed = False
+    for name, (command, budget_ms, forbidden) in SCENARIOS.items():
+        try:
+            total, wall, modules = run_scenario(command, args.runs)
+        except RuntimeError as e:
+            print(f"FAIL {name}: {e}")
+            failed = True
+            continue
+        budget = budget_ms * args.scale
+        loaded = [module for module in forbidden if module in modules]
+        ok = total / 1000 <= budget and not loaded
+        failed |= not ok
+        print(f"{'OK  ' if ok else 'FAIL'} {name}: imports {total / 1000:.0f} ms "
+              f"(budget {budget:.0f} ms), process {wall * 1000:.0f} ms")
+        if loaded:
+            print(f"     imports heavy modules it does not need: {', '.join(loaded)}")
+        top = sorted(
+            ((us, module) for module, us in modules.items() if "." not in module),
+            reverse=True,
+        )[:args.top]
+        print("     slowest: " + ", ".join(f"{module} {us / 1000:.0f} ms" for us, module in top))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+"""
+Virtualized table view for the CSV visualizer.
+
+A Tk Treeview cannot hold millions of rows, so the table keeps a fixed set
+of row items (one screenful) and only rewrites their values when
+the view scrolls. TableModel maps the visible window to rows of the data
+source, a DataFrame or memory-mapped ColumnStore columns, which are only
+read for the rows shown. Sorting by a column computes its argsort once; the
+view then reads rows through that permutation instead of re-sorting the data.
+"""
+import tkinter as tk
+from tkinter import ttk
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_VISIBLE_ROWS = 30
+WHEEL_ROWS = 3  # rows scrolled per mouse wheel step
+COLUMN_WIDTH = 120
+ROW_COLUMN = "__row__"  # Treeview id of the file row number column
+
+
+def _format_value(value) -> str:
+    if isinstance(value, (float, np.floating)):
+        return "" if np.isnan(value) else f"{value:.6g}"
+    return "" if value is None or value is pd.NA else str(value)
+
+
+class TableModel:
+    """Rows of a DataFrame or ColumnStore in display order (no Tk required)"""
+
+    def __init__(self, frame: pd.DataFrame = None, store=None, store_columns: dict = None):
+        """
+        Args:
+            frame: DataFrame to show, or
+            store: ColumnStore to show, with store_columns mapping display
+                name -> (store column, transform or None) like the app's
+        """
+        if (frame is None) == (store is None):
+            raise ValueError("Pass either a DataFrame or a ColumnStore")
+        self.frame = frame
+        self.store = store
+        if frame is not None:
+            self.columns = [str(column) for column in frame.columns]
+            self._rows = len(frame)
+        else:
+            self.store_columns = store_columns or {name: (name, None) for name in store.columns}
+            self.columns = list(self.store_columns)
+            self._rows = len(store)
+        self._orders = {}  # column -> ascending argsort, computed on first use
+        self.sort_column = None
+        self.descending = False
+        self._order = None  # current permutation (None: file order)
+        self._positions = None  # inverse of the current permutation, for jumps
+
+    def __len__(self):
+        return self._rows
+
+    def column_values(self, column: str, rows=slice(None)) -> np.ndarray:
+        """Values of one column for the given rows (array of row numbers or slice)"""
+        if self.frame is not None:
+            return self.frame[column].iloc[rows].to_numpy()
+        name, transform = self.store_columns[column]
+        values = np.asarray(self.store.column(name)[rows])
+        return transform(values) if transform is not None else values
+
+    def row_numbers(self, start: int, stop: int) -> np.ndarray:
+        """File row numbers shown at view positions start..stop-1"""
+        start, stop = max(0, start), min(stop, len(self))
+        if self._order is None:
+            return np.arange(start, stop)
+        return self._order[start:stop]
+
+    def window(self, start: int, stop: int):
+        """(file row numbers, list of rows of display strings) for view positions start..stop-1"""
+        rows = self.row_numbers(start, stop)
+        if len(rows) and self._order is None:
+            # Contiguous rows: a slice reads the memory map sequentially
+            selection = slice(int(rows[0]), int(rows[-1]) + 1)
+        else:
+            selection = rows
+        columns = [self.column_values(column, selection) for column in self.columns]
+        return rows, [[_format_value(values[i]) for values in columns] for i in range(len(rows))]
+
+    def sort(self, column: str = None, descending: bool = False):
+        """Show rows ordered by column (None: file order); the argsort is cached per column"""
+        self.sort_column = column
+        self.descending = descending
+        self._positions = None
+        if column is None:
+            self._order = None
+            return
+        if column not in self._orders:
+            values = self.column_values(column)
+            if values.dtype.kind in "biuf":
+                # Radix/merge sort of the raw numbers; NaN sorts last
+                self._orders[column] = np.argsort(values, kind="stable")
+            else:
+                # Text and mixed columns: positions (not labels) of the rows, missing values last
+                self._orders[column] = pd.Series(values).sort_values(
+                    kind="stable", na_position="last").index.to_numpy()
+        # Descending order is a reversed view of the same argsort
+        self._order = self._orders[column][::-1] if descending else self._orders[column]
+
+    def position_of(self, row: int) -> int:
+        """View position of a file row number"""
+        if self._order is None:
+            return row
+        if self._positions is None:
+            self._positions = np.empty(len(self._order), dtype=np.int64)
+            self._positions[self._order] = np.arange(len(self._order))
+        return int(self._positions[row])
+
+
+class VirtualTable(ttk.Frame):
+    """Treeview showing a window of a TableModel, with jump-to-row and sortable headings"""
+
+    def __init__(self, parent, model: TableModel, visible_rows: int = DEFAULT_VISIBLE_ROWS):
+        super().__init__(parent)
+        self.model = model
+        self.offset = 0  # view position of the first visible row
+
+        controls = ttk.Frame(self)
+        controls.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 5))
+        ttk.Label(controls, text="Go to row:").pack(side=tk.LEFT)
+        self.jump_var = tk.StringVar()
+        jump_entry = ttk.Entry(controls, textvariable=self.jump_var, width=12)
+        jump_entry.pack(side=tk.LEFT, padx=(5, 5))
+        jump_entry.bind("<Return>", lambda event: self.jump())
+        ttk.Button(controls, text="Go", command=self.jump).pack(side=tk.LEFT)
+        self.status = ttk.Label(controls, text="")
+        self.status.pack(side=tk.LEFT, padx=(10, 0))
+
+        # Columns are addressed by position, data columns may have any name
+        self.tree = ttk.Treeview(self, columns=[ROW_COLUMN] + [f"c{i}" for i in range(len(model.columns))],
+                                 show="headings", height=visible_rows, selectmode="browse")
+        self.tree.heading(ROW_COLUMN, text="Row", command=lambda: self.on_heading(None))
+        self.tree.column(ROW_COLUMN, width=90, anchor=tk.E, stretch=False)
+        for i, column in enumerate(model.columns):
+            self.tree.heading(f"c{i}", text=column, command=lambda c=column: self.on_heading(c))
+            self.tree.column(f"c{i}", width=COLUMN_WIDTH, anchor=tk.E)
+        self.tree.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+
+        # The scrollbar moves the window over the model, not the Treeview itself
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.on_scroll)
+        self.scrollbar.grid(row=1, column=1, sticky=(tk.N, tk.S))
+        x_scrollbar = ttk.Scrollbar(self, orient="horizontal", command=self.tree.xview)
+        x_scrollbar.grid(row=2, column=0, sticky=(tk.W, tk.E))
+        self.tree.configure(xscrollcommand=x_scrollbar.set)
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(1, weight=1)
+
+        self.items = []
+        self.set_visible_rows(visible_rows)
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.tree.bind(sequence, self.on_wheel)
+        for key, rows in (("<Prior>", -1), ("<Next>", 1)):
+            self.tree.bind(key, lambda event, pages=rows: self.scroll_to(self.offset + pages * len(self.items)))
+        self.tree.bind("<Home>", lambda event: self.scroll_to(0))
+        self.tree.bind("<End>", lambda event: self.scroll_to(len(self.model)))
+
+    @property
+    def max_offset(self) -> int:
+        return max(0, len(self.model) - len(self.items))
+
+    def set_visible_rows(self, count: int):
+        """Keep exactly count row items; they are reused for every window"""
+        count = max(1, min(count, len(self.model)) if len(self.model) else 1)
+        while len(self.items) < count:
+            self.items.append(self.tree.insert("", tk.END, values=()))
+        while len(self.items) > count:
+            self.tree.delete(self.items.pop())
+        self.tree.configure(height=count)
+        self.refresh()
+
+    def refresh(self):
+        """Rewrite the visible items from the model"""
+        self.offset = min(max(0, self.offset), self.max_offset)
+        rows, values = self.model.window(self.offset, self.offset + len(self.items))
+        for i, item in enumerate(self.items):
+            self.tree.item(item, values=[int(rows[i])] + values[i] if i < len(rows) else ())
+        total = max(1, len(self.model))
+        self.scrollbar.set(self.offset / total, (self.offset + len(rows)) / total)
+        order = ""
+        if self.model.sort_column is not None:
+            order = f", sorted by {self.model.sort_column} ({'desc' if self.model.descending else 'asc'})"
+        self.status.config(text=f"Rows {self.offset + 1:,}-{self.offset + len(rows):,} of {len(self.model):,}{order}")
+
+    def scroll_to(self, offset: int):
+        offset = min(max(0, int(offset)), self.max_offset)
+        if offset != self.offset:
+            self.offset = offset
+            self.refresh()
+        return "break"
+
+    def on_scroll(self, action, amount, unit=None):
+        """Scrollbar command: ("moveto", fraction) or ("scroll", n, "units"/"pages")"""
+        if action == "moveto":
+            self.scroll_to(float(amount) * len(self.model))
+        elif action == "scroll":
+            step = len(self.items) if unit == "pages" else 1
+            self.scroll_to(self.offset + int(amount) * step)
+
+    def on_wheel(self, event):
+        if event.num == 4 or getattr(event, "delta", 0) > 0:
+            return self.scroll_to(self.offset - WHEEL_ROWS)
+        return self.scroll_to(self.offset + WHEEL_ROWS)
+
+    def on_heading(self, column: str):
+        """
+        Sort by column; clicking the same heading again reverses, a third time
+        (or clicking Row) restores file order.
+        """
+        if column is None or (column == self.model.sort_column and self.model.descending):
+            self.model.sort(None)
+        elif column == self.model.sort_column:
+            self.model.sort(column, descending=True)
+        else:
+            self.model.sort(column)
+        self.offset = 0
+        self.refresh()
+
+    def jump(self):
+        """Scroll so that the file row typed in the entry is the first visible row"""
+        try:
+            row = int(self.jump_var.get().replace(",", "").replace("_", ""))
+        except ValueError:
+            return
+        if len(self.model) == 0:
+            return
+        row = min(max(0, row), len(self.model) - 1)
+        self.offset = self.model.position_of(row)
+        self.refresh()  # clamps the offset near the end
+        position = self.model.position_of(row) - self.offset
+        if 0 <= position < len(self.items):
+            self.tree.selection_set(self.items[position])
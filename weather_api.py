@@ -0,0 +1,215 @@
+# weather_api.py
+# Open-Meteo forecast fetching shared by the Homework-2 scripts
+# https://open-meteo.com/en/docs?hourly=rain&forecast_days=16
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from openmeteo_sdk.Unit import Unit
+
+FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
+MAX_CONNECTIONS = 4  # concurrent connections (and bulk requests) to the API
+MAX_LOCATIONS_PER_REQUEST = 100  # coordinates packed into one bulk request
+REQUEST_TIMEOUT = 5  # seconds per request attempt
+
+_client = None
+
+
+def get_client():
+    """
+    Open-Meteo API client with cache, retry on error and a request timeout,
+    created on first use.
+
+    The HTTP stack (openmeteo_requests, requests_cache, retry_requests) is
+    only imported here, so importing this module stays cheap for scripts
+    that never fetch.
+    """
+    global _client
+    if _client is None:
+        import openmeteo_requests
+        from requests.adapters import HTTPAdapter
+        from retry_requests import retry
+
+        import http_cache
+
+        # The managed cache applies per-endpoint expiry and keeps .cache.sqlite bounded
+        cache_session = http_cache.get_session(expire_after=3600, timeout=REQUEST_TIMEOUT)
+        retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
+
+        # Keep the retry policy but bound the connection pool, so bulk fetches
+        # reuse at most MAX_CONNECTIONS keep-alive connections
+        for prefix, adapter in list(retry_session.adapters.items()):
+            retry_session.mount(
+                prefix,
+                HTTPAdapter(
+                    max_retries=adapter.max_retries,
+                    pool_maxsize=MAX_CONNECTIONS,
+                    pool_block=True,
+                ),
+            )
+
+        _client = openmeteo_requests.Client(session=retry_session)
+    return _client
+
+
+# Open-Meteo unit enum value -> unit name (e.g. "millimetre")
+UNIT_NAMES = {value: name for name, value in vars(Unit).items() if not name.startswith("_")}
+
+
+def hourly_variable_names(WeatherVariable) -> list:
+    """Hourly variable names from a comma separated string or a list."""
+    if isinstance(WeatherVariable, str):
+        return [name.strip() for name in WeatherVariable.split(",") if name.strip()]
+    return list(WeatherVariable)
+
+
+def get_weather_data(lat: float, lon: float, WeatherVariable, forecastDays: int, url: str = FORECAST_URL):
+    """
+    Fetch weather data for given latitude and longitude.
+
+    The request goes through the cached, retrying Open-Meteo client and
+    returns its FlatBuffers response (WeatherApiResponse), or None on error.
+    """
+    params = {
+        "latitude": lat,
+        "longitude": lon,
+        "hourly": ",".join(hourly_variable_names(WeatherVariable)),
+        "forecast_days": forecastDays,
+    }
+    from openmeteo_requests import OpenMeteoRequestsError
+
+    try:
+        responses = get_client().weather_api(url, params=params)
+        return responses[0]
+    except OpenMeteoRequestsError as e:
+        print(f"Request failed: {e}")
+        return None
+
+
+def create_weather_dataframe(weather_response, WeatherVariable="rain"):
+    """
+    Convert an Open-Meteo FlatBuffers response to a pandas DataFrame.
+
+    Args:
+        weather_response: WeatherApiResponse returned by get_weather_data
+        WeatherVariable (str | list): hourly variables, in the order they were requested
+
+    Returns:
+        pandas.DataFrame: DataFrame with time as index and weather variables as columns
+    """
+    if weather_response is None or weather_response.Hourly() is None:
+        print("Invalid weather data")
+        return None
+
+    hourly = weather_response.Hourly()
+    names = hourly_variable_names(WeatherVariable)
+
+    # Hourly timestamps in local time of the location, like the JSON "time" field
+    utc_offset = weather_response.UtcOffsetSeconds()
+    time_index = pd.date_range(
+        start=pd.to_datetime(hourly.Time() + utc_offset, unit="s"),
+        end=pd.to_datetime(hourly.TimeEnd() + utc_offset, unit="s"),
+        freq=pd.Timedelta(seconds=hourly.Interval()),
+        inclusive="left",
+        name="time",
+    )
+
+    # ValuesAsNumpy returns views on the response buffer, no JSON parsing involved
+    data = {name: hourly.Variables(i).ValuesAsNumpy() for i, name in enumerate(names)}
+    df = pd.DataFrame(data, index=time_index, copy=False)
+
+    # Store metadata as DataFrame attributes
+    timezone = weather_response.Timezone()
+    df.attrs["elevation"] = weather_response.Elevation()
+    df.attrs["latitude"] = weather_response.Latitude()
+    df.attrs["longitude"] = weather_response.Longitude()
+    df.attrs["timezone"] = timezone.decode() if timezone else None
+    df.attrs["generation_time_ms"] = weather_response.GenerationTimeMilliseconds()
+
+    # Store units information
+    units = {"time": "iso8601"}
+    for i, name in enumerate(names):
+        units[name] = UNIT_NAMES.get(hourly.Variables(i).Unit(), "undefined")
+    df.attrs["units"] = units
+
+    return df
+
+
+def _site_list(sites) -> list:
+    """Normalize sites to a list of (name, lat, lon) tuples."""
+    if isinstance(sites, pd.DataFrame):
+        return list(sites[["site", "lat", "lon"]].itertuples(index=False, name=None))
+    if isinstance(sites, dict):
+        return [(name, lat, lon) for name, (lat, lon) in sites.items()]
+    return [tuple(site) for site in sites]
+
+
+def get_weather_data_bulk(
+    sites,
+    WeatherVariable,
+    forecastDays: int,
+    max_locations: int = MAX_LOCATIONS_PER_REQUEST,
+    max_workers: int = MAX_CONNECTIONS,
+):
+    """
+    Fetch hourly forecasts for many sites and variables at once.
+
+    Coordinates are packed into comma separated latitude/longitude lists, so
+    one request covers up to max_locations sites; the requests run
+    concurrently on at most max_workers threads sharing the cached session.
+
+    Args:
+        sites: dict {name: (lat, lon)}, list of (name, lat, lon) or a
+            DataFrame with site, lat and lon columns
+        WeatherVariable (str | list): hourly variables to fetch
+        forecastDays (int): number of forecast days
+
+    Returns:
+        pandas.DataFrame: one "value" column indexed by (site, time, variable),
+        or None if no request succeeded
+    """
+    from openmeteo_requests import OpenMeteoRequestsError
+
+    openmeteo = get_client()  # created before the worker threads share it
+    sites = _site_list(sites)
+    variables = hourly_variable_names(WeatherVariable)
+    batches = [sites[i:i + max_locations] for i in range(0, len(sites), max_locations)]
+
+    def fetch(batch):
+        params = {
+            "latitude": ",".join(str(lat) for _, lat, _ in batch),
+            "longitude": ",".join(str(lon) for _, _, lon in batch),
+            "hourly": ",".join(variables),
+            "forecast_days": forecastDays,
+        }
+        try:
+            # One response per location, in the order of the coordinates
+            return openmeteo.weather_api(FORECAST_URL, params=params)
+        except OpenMeteoRequestsError as e:
+            print(f"Request failed for {len(batch)} sites: {e}")
+            return None
+
+    frames = {}
+    site_info = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches)))) as pool:
+        for batch, responses in zip(batches, pool.map(fetch, batches)):
+            if responses is None:
+                continue
+            for (name, _, _), response in zip(batch, responses):
+                df = create_weather_dataframe(response, variables)
+                if df is None:
+                    continue
+                frames[name] = df
+                site_info[name] = {
+                    key: df.attrs[key] for key in ("latitude", "longitude", "elevation", "timezone")
+                }
+
+    if not frames:
+        return None
+
+    # Wide per-site frames -> one tidy (site, time, variable) frame
+    wide = pd.concat(frames, names=["site"])
+    tidy = wide.rename_axis(columns="variable").stack().to_frame("value")
+    tidy.attrs["sites"] = site_info
+    tidy.attrs["units"] = next(iter(frames.values())).attrs["units"]
+    return tidy
@@ -0,0 +1,245 @@
+"""
+Forecast-vs-observation join of hourly rain and crack meter data.
+
+Crack meter captures are uniformly sampled at a high rate (e.g. 30 kHz) and
+carry no timestamps, so sample times are derived from the capture start and
+the sample rate. The samples are aggregated chunk by chunk into fixed time
+windows (count, mean, min, max, first and last value per column), so months
+of data never have to fit in memory. The windowed crack data is then joined
+with the hourly rain from ``weather_api.create_weather_dataframe`` (or a
+saved weather CSV) by a vectorized ``merge_asof`` with a tolerance.
+
+Usage:
+    python weather_crack_join.py CRACK.csv --start "2025-10-18 00:00" --rate 30000 --weather WEATHER.csv
+    python weather_crack_join.py --benchmark [--hours 1] [--rate 30000]
+"""
+import argparse
+import math
+import time
+from fractions import Fraction
+
+import numpy as np
+import pandas as pd
+
+from column_store import detect_separator
+
+CHUNK_ROWS = 1_000_000   # samples processed per step
+# How partial windows of consecutive chunks are combined
+COMBINE = {"count": "sum", "sum": "sum", "min": "min", "max": "max", "first": "first", "last": "last"}
+
+
+class CrackWindowAggregator:
+    """
+    Streaming per-window aggregation of uniformly sampled data.
+
+    Windows are aligned to the epoch (like DataFrame.resample), and window
+    boundaries are computed as exact sample indices, so no per-sample
+    timestamps are ever created.
+    """
+
+    def __init__(self, start, rate_hz: float, freq: str = "1h"):
+        self.start_ns = pd.Timestamp(start).as_unit("ns").value
+        self.rate = Fraction(rate_hz).limit_denominator(10**6)  # samples per second
+        self.window_ns = pd.Timedelta(freq).value
+        self.offset = 0  # global index of the next sample
+        self._partials = []
+
+    def _sample_time(self, index: int) -> Fraction:
+        """Time of a sample in ns since the epoch."""
+        return self.start_ns + Fraction(index * 10**9) / self.rate
+
+    def _first_sample(self, window: int) -> int:
+        """Index of the first sample at or after the start of a window."""
+        return math.ceil((window * self.window_ns - self.start_ns) * self.rate / 10**9)
+
+    def update(self, chunk):
+        """Add the next chunk of samples (DataFrame or dict of equally long arrays)."""
+        columns = {name: np.asarray(values, dtype=np.float64) for name, values in chunk.items()}
+        n = len(next(iter(columns.values()))) if columns else 0
+        if n == 0:
+            return
+
+        first_window = math.floor(self._sample_time(self.offset) / self.window_ns)
+        last_window = math.floor(self._sample_time(self.offset + n - 1) / self.window_ns)
+        windows = np.arange(first_window, last_window + 1)
+        starts = np.array(
+            [0] + [self._first_sample(w) - self.offset for w in windows[1:]], dtype=np.int64
+        )
+        ends = np.append(starts[1:], n)
+
+        data = {}
+        for name, values in columns.items():
+            valid = ~np.isnan(values)
+            data[(name, "count")] = np.add.reduceat(valid.astype(np.int64), starts)
+            data[(name, "sum")] = np.add.reduceat(np.where(valid, values, 0.0), starts)
+            # fmin/fmax ignore NaN unless the whole window is NaN
+            data[(name, "min")] = np.fmin.reduceat(values, starts)
+            data[(name, "max")] = np.fmax.reduceat(values, starts)
+            data[(name, "first")] = values[starts]
+            data[(name, "last")] = values[ends - 1]
+
+        index = pd.to_datetime(windows * self.window_ns, unit="ns")
+        self._partials.append(pd.DataFrame(data, index=index))
+        self.offset += n
+
+    def result(self) -> pd.DataFrame:
+        """
+        Aggregated windows.
+
+        Returns:
+            pandas.DataFrame: "time" index (window start) and columns
+            "<column>_<stat>" for count, mean, min, max, first and last
+        """
+        if not self._partials:
+            return pd.DataFrame(index=pd.DatetimeIndex([], name="time"))
+        combined = pd.concat(self._partials)
+        # Only windows split across chunk boundaries have more than one row
+        combined = combined.groupby(level=0).agg({key: COMBINE[key[1]] for key in combined.columns})
+
+        result = {}
+        for name in dict.fromkeys(key[0] for key in combined.columns):
+            count = combined[(name, "count")]
+            result[f"{name}_count"] = count
+            result[f"{name}_mean"] = combined[(name, "sum")] / count.where(count > 0)
+            for stat in ("min", "max", "first", "last"):
+                result[f"{name}_{stat}"] = combined[(name, stat)]
+        df = pd.DataFrame(result)
+        df.index.name = "time"
+        return df
+
+
+def iter_csv_chunks(csv_path: str, columns=None, transforms=None, chunk_rows: int = CHUNK_ROWS):
+    """Yield numeric columns of a CSV file chunk by chunk, optionally transformed."""
+    transforms = transforms or {}
+    sep = detect_separator(csv_path)
+    for chunk in pd.read_csv(csv_path, sep=sep, usecols=columns, chunksize=chunk_rows,
+                             encoding="utf-8-sig"):
+        chunk = chunk.select_dtypes(include=[np.number])
+        yield {
+            name: transforms[name](chunk[name].to_numpy(dtype=np.float64))
+            if name in transforms else chunk[name].to_numpy(dtype=np.float64)
+            for name in chunk.columns
+        }
+
+
+def crack_windows(chunks, start, rate_hz: float, freq: str = "1h") -> pd.DataFrame:
+    """Aggregate chunks of crack meter samples into time windows."""
+    aggregator = CrackWindowAggregator(start, rate_hz, freq)
+    for chunk in chunks:
+        aggregator.update(chunk)
+    return aggregator.result()
+
+
+def read_weather_csv(paths) -> pd.DataFrame:
+    """Hourly weather from saved CSV files (e.g. weather_data_for_Prague_*.csv), newest row wins."""
+    if isinstance(paths, str):
+        paths = [paths]
+    frames = [pd.read_csv(path, index_col="time", parse_dates=["time"]) for path in paths]
+    weather = pd.concat(frames)
+    return weather[~weather.index.duplicated(keep="last")].sort_index()
+
+
+def join_weather(windows: pd.DataFrame, weather: pd.DataFrame, tolerance: str = "1h",
+                 direction: str = "backward", columns=None) -> pd.DataFrame:
+    """
+    As-of join of windowed crack data with weather data.
+
+    Every window gets the weather row at or before its start (direction
+    "backward"), if one exists within tolerance; otherwise NaN.
+
+    Args:
+        windows (pandas.DataFrame): result of crack_windows
+        weather (pandas.DataFrame): time indexed weather data (e.g. create_weather_dataframe)
+        tolerance (str): maximum time distance of the matched weather row
+        direction (str): "backward", "forward" or "nearest"
+        columns (list): weather columns to join (default: all)
+
+    Returns:
+        pandas.DataFrame: windows with the weather columns added
+    """
+    weather = weather[list(columns)] if columns is not None else weather
+    left = windows.sort_index()
+    right = weather.sort_index()
+    # Both sides need the same datetime resolution for merge_asof
+    left.index = left.index.as_unit("ns")
+    right.index = pd.DatetimeIndex(right.index).as_unit("ns")
+    joined = pd.merge_asof(
+        left, right, left_index=True, right_index=True,
+        tolerance=pd.Timedelta(tolerance), direction=direction,
+    )
+    joined.index.name = "time"
+    return joined
+
+
+def synthetic_chunks(total_rows: int, chunk_rows: int = CHUNK_ROWS, seed: int = 0):
+    """Synthetic crack meter samples: slowly growing crack with noise, generated per chunk."""
+    rng = np.random.default_rng(seed)
+    for start in range(0, total_rows, chunk_rows):
+        n = min(chunk_rows, total_rows - start)
+        growth = (start + np.arange(n)) * 1e-9
+        yield {
+            "Voltage Drop": 700.0 + growth * 1e3 + rng.normal(0.0, 5.0, n),
+            "Crack size": growth + rng.normal(0.0, 1e-4, n),
+        }
+
+
+def run_benchmark(hours: float, rate_hz: float, chunk_rows: int = CHUNK_ROWS, check_rows: int = 2_000_000):
+    """Time the chunked engine on synthetic data and check it against pandas resample."""
+    start = pd.Timestamp("2025-10-18 00:17:03")
+    total = int(hours * 3600 * rate_hz)
+    weather = pd.DataFrame(
+        {"rain": np.random.default_rng(1).gamma(0.3, 0.5, int(hours) + 48)},
+        index=pd.date_range(start.floor("D"), periods=int(hours) + 48, freq="h", name="time"),
+    )
+
+    # Correctness on a subset that fits in memory, against plain pandas
+    subset = next(synthetic_chunks(min(check_rows, total), chunk_rows=check_rows))
+    times = start + pd.to_timedelta(np.arange(len(subset["Crack size"])) / rate_hz, unit="s")
+    expected = pd.DataFrame(subset, index=times).resample("1min").agg(["mean", "min", "max"])
+    step = max(1, chunk_rows // 7)  # odd chunk size, so windows span chunk boundaries
+    slices = ({name: values[i:i + step] for name, values in subset.items()}
+              for i in range(0, len(times), step))
+    got = crack_windows(slices, start, rate_hz, "1min")
+    for name in subset:
+        for stat in ("mean", "min", "max"):
+            np.testing.assert_allclose(got[f"{name}_{stat}"].to_numpy(), expected[(name, stat)].to_numpy())
+    print(f"Check against pandas resample on {len(times):,} samples: OK")
+
+    started = time.perf_counter()
+    windows = crack_windows(synthetic_chunks(total, chunk_rows), start, rate_hz, "1h")
+    aggregated = time.perf_counter() - started
+    started = time.perf_counter()
+    joined = join_weather(windows, weather)
+    joined_time = time.perf_counter() - started
+
+    print(f"Samples: {total:,} ({hours} h at {rate_hz:,.0f} Hz), chunk size {chunk_rows:,}")
+    print(f"Windowing: {aggregated:.2f} s ({total / aggregated / 1e6:.1f} M samples/s)")
+    print(f"As-of join of {len(windows)} windows: {joined_time * 1000:.1f} ms")
+    print(joined[["Crack size_mean", "Crack size_last", "rain"]].head())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Join crack meter data with hourly rain")
+    parser.add_argument("crack_csv", nargs="?", help="crack meter CSV file")
+    parser.add_argument("--start", help="time of the first sample (local time of the weather data)")
+    parser.add_argument("--rate", type=float, default=30000, help="sample rate [Hz]")
+    parser.add_argument("--freq", default="1h", help="window length")
+    parser.add_argument("--weather", nargs="+", help="weather CSV file(s) with a time index")
+    parser.add_argument("--tolerance", default="1h", help="as-of join tolerance")
+    parser.add_argument("--benchmark", action="store_true", help="run the synthetic benchmark")
+    parser.add_argument("--hours", type=float, default=1, help="benchmark length [h]")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        run_benchmark(args.hours, args.rate)
+        return
+    if not (args.crack_csv and args.start and args.weather):
+        parser.error("crack_csv, --start and --weather are required (or use --benchmark)")
+
+    windows = crack_windows(iter_csv_chunks(args.crack_csv), args.start, args.rate, args.freq)
+    joined = join_weather(windows, read_weather_csv(args.weather), tolerance=args.tolerance)
+    print(joined)
+
+
+if __name__ == "__main__":
+    main()
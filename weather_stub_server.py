@@ -0,0 +1,262 @@
+# weather_stub_server.py
+# Local stub of the ipify, ip-api, Open-Meteo and Tomorrow.io endpoints,
+# so the weather clients can be exercised without network access.
+#
+# Usage: python weather_stub_server.py            (checks the async client against it)
+#        python weather_stub_server.py --serve    (only serve, port 8765)
+
+import argparse
+import asyncio
+import hashlib
+import json
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import flatbuffers
+import numpy as np
+from openmeteo_sdk.Unit import Unit
+
+STUB_IP = "203.0.113.7"
+STUB_LOCATION = {
+    "status": "success",
+    "country": "Czechia",
+    "city": "Prague",
+    "lat": 50.0880,
+    "lon": 14.4208,
+    "timezone": "Europe/Prague",
+    "query": STUB_IP,
+}
+
+# Units reported for the hourly variables the scripts request
+VARIABLE_UNITS = {"rain": Unit.millimetre, "temperature_2m": Unit.celsius}
+
+
+def build_forecast(lat: float, lon: float, variables, hours: int, start: int, values: dict = None) -> bytes:
+    """
+    One size-prefixed Open-Meteo FlatBuffers message with synthetic hourly data.
+
+    values optionally maps variable names to the hourly values to send
+    (hours long); other variables get random values.
+    """
+    rng = np.random.default_rng(int(abs(lat * 1000 + lon)))
+    builder = flatbuffers.Builder(1024)
+
+    variable_offsets = []
+    for name in variables:
+        if values is not None and name in values:
+            data = np.asarray(values[name], dtype=np.float32)
+        else:
+            data = rng.gamma(0.3, 0.5, hours).astype(np.float32)
+        values_vector = builder.CreateNumpyVector(data)
+        builder.StartObject(14)
+        builder.PrependUint8Slot(1, VARIABLE_UNITS.get(name, Unit.undefined), 0)
+        builder.PrependUOffsetTRelativeSlot(3, values_vector, 0)
+        variable_offsets.append(builder.EndObject())
+    builder.StartVector(4, len(variable_offsets), 4)
+    for offset in reversed(variable_offsets):
+        builder.PrependUOffsetTRelative(offset)
+    variables_vector = builder.EndVector()
+
+    builder.StartObject(4)  # VariablesWithTime
+    builder.PrependInt64Slot(0, start, 0)
+    builder.PrependInt64Slot(1, start + hours * 3600, 0)
+    builder.PrependInt32Slot(2, 3600, 0)
+    builder.PrependUOffsetTRelativeSlot(3, variables_vector, 0)
+    hourly = builder.EndObject()
+
+    timezone = builder.CreateString("GMT")
+    builder.StartObject(16)  # WeatherApiResponse
+    builder.PrependFloat32Slot(0, lat, 0)
+    builder.PrependFloat32Slot(1, lon, 0)
+    builder.PrependFloat32Slot(2, 235.0, 0)
+    builder.PrependFloat32Slot(3, 0.1, 0)
+    builder.PrependUOffsetTRelativeSlot(7, timezone, 0)
+    builder.PrependUOffsetTRelativeSlot(11, hourly, 0)
+    builder.Finish(builder.EndObject())
+
+    message = bytes(builder.Output())
+    return len(message).to_bytes(4, byteorder="little") + message
+
+
+def endpoint_name(path: str) -> str:
+    """Short endpoint name used in the request counters."""
+    if path == "/":
+        return "ip"
+    if path.startswith("/json/"):
+        return "location"
+    return {"/v1/forecast": "forecast", "/v4/weather/realtime": "realtime"}.get(path, "other")
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        self.server.requests[endpoint_name(url.path)] += 1
+        time.sleep(self.server.delay)
+
+        if url.path == "/":
+            self._send(200, STUB_IP.encode(), "text/plain")
+        elif url.path.startswith("/json/"):
+            self._send(200, json.dumps(STUB_LOCATION).encode(), "application/json")
+        elif url.path == "/v1/forecast":
+            variables = [v for v in query.get("hourly", "rain").split(",") if v]
+            hours = 24 * int(query.get("forecast_days", 7))
+            start = int(time.time()) // 86400 * 86400
+            lats = query.get("latitude", "0").split(",")
+            lons = query.get("longitude", "0").split(",")
+            body = b"".join(
+                build_forecast(float(lat), float(lon), variables, hours, start)
+                for lat, lon in zip(lats, lons)
+            )
+            self._send(200, body, "application/octet-stream")
+        elif url.path == "/v4/weather/realtime":
+            payload = {
+                "data": {
+                    "time": time.strftime("%Y-%m-%dT%H:%M:00Z", time.gmtime()),
+                    "values": dict(self.server.realtime_values),
+                },
+                "location": {"lat": STUB_LOCATION["lat"], "lon": STUB_LOCATION["lon"]},
+            }
+            body = json.dumps(payload).encode()
+            # Conditional requests: same payload -> 304 Not Modified
+            etag = f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+            headers = {"ETag": etag, "Cache-Control": f"max-age={self.server.max_age}"}
+            if self.headers.get("If-None-Match") == etag:
+                self.server.requests["realtime_not_modified"] += 1
+                self._send(304, b"", None, headers)
+            else:
+                self._send(200, body, "application/json", headers)
+        else:
+            self._send(404, b"not found", "text/plain")
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: dict = None):
+        self.send_response(status)
+        if content_type:
+            self.send_header("Content-Type", content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # keep the console quiet
+
+
+class StubServer:
+    """Stub API server on a background thread; use as a context manager."""
+
+    def __init__(self, port: int = 0, delay: float = 0.0):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+        self.httpd.delay = delay  # simulated latency per request in seconds
+        self.httpd.requests = Counter()  # requests per endpoint
+        self.httpd.max_age = 0  # Cache-Control max-age of realtime responses
+        self.httpd.realtime_values = {"temperature": 11.5, "humidity": 78, "windSpeed": 3.2, "visibility": 16}
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def requests(self) -> Counter:
+        return self.httpd.requests
+
+    def client_options(self) -> dict:
+        """URL overrides that point the weather clients at this server."""
+        return {
+            "ip_url": f"{self.url}/",
+            "location_url": self.url,
+            "forecast_url": f"{self.url}/v1/forecast",
+            "realtime_url": f"{self.url}/v4/weather/realtime",
+        }
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+async def run_checks(server: StubServer) -> bool:
+    """Run the async client against the stub; print and check the request counts."""
+    from async_weather import AsyncWeatherClient
+
+    failures = []
+
+    def check(ok: bool, message: str):
+        print(f"{'OK  ' if ok else 'FAIL'} {message}")
+        if not ok:
+            failures.append(message)
+
+    async with AsyncWeatherClient(api_key="stub", **server.client_options()) as client:
+        started = time.perf_counter()
+        before = server.requests.copy()
+        result = await client.get_location_and_weather("rain,temperature_2m", 2, realtime=True)
+        elapsed = time.perf_counter() - started
+        hourly = result["forecast"].Hourly()
+        print(f"Chain finished in {elapsed * 1000:.0f} ms "
+              f"(server delay {server.httpd.delay * 1000:.0f} ms per request)")
+        print(f"Location: {result['location']['city']}, forecast hours: "
+              f"{hourly.Variables(0).ValuesLength()}, realtime: {result['realtime']['data']['values']}")
+        sent = server.requests - before
+        check(sent["ip"] == 1 and sent["location"] == 1 and sent["realtime"] == 1,
+              f"chain: one IP, location and realtime request each ({dict(sent)})")
+        # The forecast may come from the HTTP cache of an earlier run
+        check(sent["forecast"] <= 1, f"chain: at most one forecast request ({sent['forecast']})")
+
+        # A known location skips the IP and location lookups
+        before = server.requests.copy()
+        result = await client.get_location_and_weather("rain", 2, location=result["location"])
+        sent = server.requests - before
+        check(result["forecast"] is not None and sent["ip"] == 0 and sent["location"] == 0,
+              f"chain with location=: no IP or location request ({dict(sent)})")
+
+        # Identical concurrent requests are coalesced into one
+        before = server.requests["ip"]
+        await asyncio.gather(*(client.get_ip() for _ in range(10)))
+        sent = server.requests["ip"] - before
+        check(sent == 1, f"10 concurrent get_ip calls -> {sent} request(s)")
+
+        # Coordinates unique to this run, so the HTTP cache cannot answer
+        lat = STUB_LOCATION["lat"] + (time.time_ns() % 10**6) / 10**9
+        before = server.requests["forecast"]
+        responses = await asyncio.gather(*(
+            client.get_weather_data(lat, STUB_LOCATION["lon"], "rain", 2) for _ in range(10)
+        ))
+        sent = server.requests["forecast"] - before
+        check(sent == 1 and all(responses), f"10 concurrent get_weather_data calls -> {sent} request(s)")
+    print(f"Requests per endpoint: {dict(server.requests)}")
+    return not failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stub of the weather APIs")
+    parser.add_argument("--serve", action="store_true", help="only run the server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.2, help="latency per request [s]")
+    args = parser.parse_args()
+
+    with StubServer(args.port, args.delay) as server:
+        if args.serve:
+            print(f"Serving weather API stubs on {server.url} (Ctrl+C to stop)")
+            try:
+                threading.Event().wait()
+            except KeyboardInterrupt:
+                pass
+        elif not asyncio.run(run_checks(server)):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())